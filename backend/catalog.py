@@ -0,0 +1,433 @@
+"""
+Satellite Catalog Store
+
+In-memory catalog of TLE mean elements with SQLite persistence (satellites
+table in wa_map.db). Replaces the module-level SATELLITES list.
+
+COLUMNAR STORAGE:
+- mean elements live in struct-of-arrays NumPy columns (ELEMENT_COLUMNS),
+  one row per satellite; strings (name, designator, TLE lines) in parallel lists
+- a satellite keeps its row for as long as it is in the catalog; deleted
+  rows are masked out (valid=False) and reused by later inserts
+- columns() exposes the live rows so propagation, filtering and statistics
+  run as whole-array operations; API records are built per row on demand
+
+INDEXES:
+- noradId -> row hash index: O(1) lookup per id
+- query indexes, rebuilt lazily on the first query after a write (so a
+  bulk upsert pays for one sort):
+  - rows in noradId order (unfiltered pages are a slice)
+  - per-regime row arrays, in noradId order
+  - an epoch-sorted permutation, so an epoch range is two searchsorted calls
+    plus the slice between them
+  - name and international designator: sorted (key, row) lists, so prefix
+    filters are a bisect plus the matching slice
+- a query intersects only the candidate row sets its filters select,
+  smallest first, so its cost follows the matches rather than the catalog
+
+PERSISTENCE:
+- upsert()/delete() write through the given connection (the pool writer),
+  then apply the change in memory; init() loads the table on startup
+- listeners registered with add_listener() get the changed NORAD ids after
+  each write, so derived caches can drop stale entries
+"""
+
+import bisect
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ephemeris_cache import naive_utc
+
+
+CATALOG_TABLE = "satellites"
+
+CATALOG_SCHEMA = f"""CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+    norad_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    intl_designator TEXT,
+    tle_line1 TEXT NOT NULL,
+    tle_line2 TEXT NOT NULL,
+    epoch TEXT NOT NULL,
+    regime TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)"""
+
+# TLE/OMM units: angles in degrees, mean motion in rev/day (derivatives as in the TLE).
+# Epochs are days since J2000 (2000-01-01T12:00 UTC): full microsecond precision in a float64.
+ELEMENT_COLUMNS = {
+    "norad_id": np.int32,
+    "epoch": np.float64,
+    "mean_motion": np.float64,
+    "mean_motion_dot": np.float64,
+    "mean_motion_ddot": np.float64,
+    "eccentricity": np.float64,
+    "inclination": np.float64,
+    "raan": np.float64,
+    "arg_perigee": np.float64,
+    "mean_anomaly": np.float64,
+    "bstar": np.float64,
+    "regime": np.int8,
+}
+
+# API field -> element column for the per-row record view
+RECORD_ELEMENTS = {
+    "meanMotion": "mean_motion",
+    "eccentricity": "eccentricity",
+    "inclination": "inclination",
+    "raan": "raan",
+    "argPerigee": "arg_perigee",
+    "meanAnomaly": "mean_anomaly",
+    "bstar": "bstar",
+}
+
+INITIAL_CAPACITY = 1024
+
+REGIMES = ("LEO", "MEO", "GEO", "HEO", "OTHER")
+
+# Mean motion (rev/day) thresholds: LEO period <= 128 min, GEO ~1 rev/sidereal day
+LEO_MIN_MEAN_MOTION = 11.25
+GEO_MEAN_MOTION_RANGE = (0.99, 1.01)
+GEO_MAX_ECCENTRICITY = 0.01
+HEO_MIN_ECCENTRICITY = 0.25
+
+J2000 = datetime(2000, 1, 1, 12)
+J2000_JD = 2451545.0
+
+
+def orbit_regimes(mean_motion: np.ndarray, eccentricity: np.ndarray) -> np.ndarray:
+    """Regime code (index into REGIMES) for each element set."""
+    geo = ((mean_motion >= GEO_MEAN_MOTION_RANGE[0]) & (mean_motion <= GEO_MEAN_MOTION_RANGE[1])
+           & (eccentricity < GEO_MAX_ECCENTRICITY))
+    return np.select(
+        [eccentricity >= HEO_MIN_ECCENTRICITY, mean_motion >= LEO_MIN_MEAN_MOTION, geo,
+         mean_motion > GEO_MEAN_MOTION_RANGE[1]],
+        [REGIMES.index("HEO"), REGIMES.index("LEO"), REGIMES.index("GEO"), REGIMES.index("MEO")],
+        REGIMES.index("OTHER")).astype(np.int8)
+
+
+def days_since_j2000(dt: datetime) -> float:
+    return (dt - J2000).total_seconds() / 86400.0
+
+
+def epoch_to_iso(days: float) -> str:
+    return (J2000 + timedelta(microseconds=round(days * 86400e6))).isoformat(timespec="microseconds")
+
+
+def tle_epoch(line1: str) -> datetime:
+    """Epoch from TLE line 1 columns 19-32 (YYDDD.DDDDDDDD)."""
+    year = int(line1[18:20])
+    year += 2000 if year < 57 else 1900
+    return datetime(year, 1, 1) + timedelta(days=float(line1[20:32]) - 1)
+
+
+def intl_designator(line1: str) -> Optional[str]:
+    """COSPAR id (e.g. 1998-067A) from TLE line 1 columns 10-17, or None if blank."""
+    raw = line1[9:17].strip()
+    if len(raw) < 5 or not raw[:5].isdigit():
+        return None
+    year = int(raw[:2])
+    year += 2000 if year < 57 else 1900
+    return f"{year}-{raw[2:5]}{raw[5:]}"
+
+
+def _implied_decimal(field: str) -> float:
+    """TLE ' 12345-3' style field: mantissa with an implied leading decimal point, then exponent."""
+    field = field.strip()
+    if not field or field.strip("+-0") == "":
+        return 0.0
+    sign = -1.0 if field[0] == "-" else 1.0
+    field = field.lstrip("+-")
+    return sign * float("0." + field[:-2]) * 10 ** int(field[-2:])
+
+
+def make_record(name: str, line1: str, line2: str) -> dict:
+    """Validate a TLE pair and parse it into a catalog record with its element values."""
+    line1, line2 = line1.rstrip(), line2.rstrip()
+    if len(line1) != 69 or not line1.startswith("1 "):
+        raise ValueError("TLE line 1 must be 69 characters starting with '1 '")
+    if len(line2) != 69 or not line2.startswith("2 "):
+        raise ValueError("TLE line 2 must be 69 characters starting with '2 '")
+    try:
+        norad_id = int(line1[2:7])
+        elements = {
+            "norad_id": norad_id,
+            "epoch": days_since_j2000(tle_epoch(line1)),
+            "mean_motion": float(line2[52:63]),
+            "mean_motion_dot": float(line1[33:43]),
+            "mean_motion_ddot": _implied_decimal(line1[44:52]),
+            "eccentricity": float("0." + line2[26:33].strip()),
+            "inclination": float(line2[8:16]),
+            "raan": float(line2[17:25]),
+            "arg_perigee": float(line2[34:42]),
+            "mean_anomaly": float(line2[43:51]),
+            "bstar": _implied_decimal(line1[53:61]),
+        }
+        line2_norad_id = int(line2[2:7])
+    except ValueError:
+        raise ValueError("TLE contains malformed numeric fields")
+    if norad_id != line2_norad_id:
+        raise ValueError("TLE line 1 and line 2 NORAD ids differ")
+    return {
+        "noradId": norad_id,
+        "name": name.strip() or str(norad_id),
+        "intlDesignator": intl_designator(line1),
+        "tleLine1": line1,
+        "tleLine2": line2,
+        "elements": elements,
+    }
+
+
+class SatelliteCatalog:
+    """NORAD-indexed catalog of mean elements in NumPy columns, persisted to SQLite."""
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._columns: Dict[str, np.ndarray] = {name: np.zeros(capacity, dtype)
+                                                for name, dtype in ELEMENT_COLUMNS.items()}
+        self._valid = np.zeros(capacity, bool)
+        self._names: List[Optional[str]] = [None] * capacity
+        self._intl: List[Optional[str]] = [None] * capacity
+        self._lines: List[Optional[Tuple[str, str]]] = [None] * capacity
+        self._row_of: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._size = 0  # rows ever used (high-water mark)
+        self._sorted: Optional[dict] = None  # query indexes, rebuilt lazily after writes
+        self._lock = threading.RLock()
+        self.version = 0  # bumped on every write, for caches derived from the catalog
+        self._listeners: List[Callable[[List[int]], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def add_listener(self, callback: Callable[[List[int]], None]):
+        """Call `callback(norad_ids)` after every upsert or delete."""
+        self._listeners.append(callback)
+
+    def _notify(self, norad_ids: List[int]):
+        for callback in self._listeners:
+            callback(norad_ids)
+
+    # -- Persistence --------------------------------------------------------
+
+    def init(self, conn):
+        conn.execute(CATALOG_SCHEMA)
+        rows = conn.execute(f"SELECT name, tle_line1, tle_line2 FROM {CATALOG_TABLE}").fetchall()
+        self._apply([make_record(name, line1, line2) for name, line1, line2 in rows])
+
+    def upsert(self, conn, records: Iterable[dict]) -> int:
+        """Insert or replace records built by make_record(); returns the count written."""
+        records = list(records)
+        if not records:
+            return 0
+        now = datetime.utcnow().isoformat()
+        regimes = orbit_regimes(np.array([r["elements"]["mean_motion"] for r in records]),
+                                np.array([r["elements"]["eccentricity"] for r in records]))
+        conn.executemany(
+            f"INSERT INTO {CATALOG_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            f"ON CONFLICT(norad_id) DO UPDATE SET name = excluded.name, "
+            f"intl_designator = excluded.intl_designator, tle_line1 = excluded.tle_line1, "
+            f"tle_line2 = excluded.tle_line2, epoch = excluded.epoch, regime = excluded.regime, "
+            f"updated_at = excluded.updated_at",
+            [(r["noradId"], r["name"], r["intlDesignator"], r["tleLine1"], r["tleLine2"],
+              epoch_to_iso(r["elements"]["epoch"]), REGIMES[code], now) for r, code in zip(records, regimes)])
+        self._apply(records)
+        return len(records)
+
+    def delete(self, conn, norad_ids: Iterable[int]) -> int:
+        norad_ids = [n for n in norad_ids if n in self._row_of]
+        conn.executemany(f"DELETE FROM {CATALOG_TABLE} WHERE norad_id = ?", [(n,) for n in norad_ids])
+        with self._lock:
+            for norad_id in norad_ids:
+                row = self._row_of.pop(norad_id, None)
+                if row is not None:
+                    self._valid[row] = False
+                    self._names[row] = self._intl[row] = self._lines[row] = None
+                    self._free.append(row)
+            self._sorted = None
+            self.version += 1
+        self._notify(norad_ids)
+        return len(norad_ids)
+
+    def _apply(self, records: List[dict]):
+        if not records:
+            return
+        with self._lock:
+            rows = np.empty(len(records), np.intp)
+            for i, record in enumerate(records):
+                row = self._row_of.get(record["noradId"])
+                if row is None:
+                    row = self._allocate()
+                    self._row_of[record["noradId"]] = row
+                rows[i] = row
+                self._names[row] = record["name"]
+                self._intl[row] = record["intlDesignator"]
+                self._lines[row] = (record["tleLine1"], record["tleLine2"])
+            for name, column in self._columns.items():
+                if name != "regime":
+                    column[rows] = [r["elements"][name] for r in records]
+            self._columns["regime"][rows] = orbit_regimes(self._columns["mean_motion"][rows],
+                                                          self._columns["eccentricity"][rows])
+            self._valid[rows] = True
+            self._sorted = None
+            self.version += 1
+        self._notify([r["noradId"] for r in records])
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._valid):
+            self._grow(max(INITIAL_CAPACITY, 2 * self._size))
+        self._size += 1
+        return self._size - 1
+
+    def _grow(self, capacity: int):
+        extra = capacity - len(self._valid)
+        for name, column in self._columns.items():
+            self._columns[name] = np.concatenate([column, np.zeros(extra, column.dtype)])
+        self._valid = np.concatenate([self._valid, np.zeros(extra, bool)])
+        self._names.extend([None] * extra)
+        self._intl.extend([None] * extra)
+        self._lines.extend([None] * extra)
+
+    # -- Columnar access ----------------------------------------------------
+
+    def rows(self) -> np.ndarray:
+        """Row indexes of every satellite in the catalog, ordered by noradId."""
+        with self._lock:
+            rows = np.flatnonzero(self._valid[:self._size])
+            return rows[np.argsort(self._columns["norad_id"][rows], kind="stable")]
+
+    def rows_for(self, norad_ids: Iterable[int]) -> np.ndarray:
+        """Row indexes for the given ids in request order; unknown ids are skipped."""
+        row_of = self._row_of
+        return np.array([row_of[n] for n in norad_ids if n in row_of], dtype=np.intp)
+
+    def columns(self, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Element columns gathered for `rows` (default: every satellite, by noradId)."""
+        if rows is None:
+            rows = self.rows()
+        with self._lock:
+            return {name: column[rows] for name, column in self._columns.items()}
+
+    def tle_lines(self, rows: Iterable[int]) -> List[Tuple[str, str]]:
+        return [self._lines[row] for row in rows]
+
+    def names(self, rows: Iterable[int]) -> List[str]:
+        return [self._names[row] for row in rows]
+
+    # -- Record view --------------------------------------------------------
+
+    def _record(self, row: int) -> dict:
+        columns = self._columns
+        record = {
+            "noradId": int(columns["norad_id"][row]),
+            "name": self._names[row],
+            "intlDesignator": self._intl[row],
+            "tleLine1": self._lines[row][0],
+            "tleLine2": self._lines[row][1],
+            "epoch": epoch_to_iso(float(columns["epoch"][row])),
+            "regime": REGIMES[columns["regime"][row]],
+        }
+        for field, column in RECORD_ELEMENTS.items():
+            record[field] = float(columns[column][row])
+        return record
+
+    def records_for_rows(self, rows: Iterable[int]) -> List[dict]:
+        with self._lock:
+            return [self._record(row) for row in rows]
+
+    def get(self, norad_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._row_of.get(norad_id)
+            return self._record(row) if row is not None else None
+
+    def get_many(self, norad_ids: Iterable[int]) -> List[dict]:
+        """Records for the given ids in request order; unknown ids are skipped."""
+        return self.records_for_rows(self.rows_for(norad_ids))
+
+    def records(self) -> List[dict]:
+        return self.records_for_rows(self.rows())
+
+    # -- Query --------------------------------------------------------------
+
+    def _indexes(self) -> dict:
+        with self._lock:
+            if self._sorted is None:
+                by_norad = self.rows()
+                regimes = self._columns["regime"][by_norad]
+                epochs = self._columns["epoch"][by_norad]
+                by_epoch = np.argsort(epochs, kind="stable")
+                self._sorted = {
+                    "norad": by_norad,
+                    "regime": [by_norad[regimes == code] for code in range(len(REGIMES))],
+                    "epoch_rows": by_norad[by_epoch],
+                    "epochs": epochs[by_epoch],
+                    "name": sorted((self._names[row].lower(), row) for row in by_norad),
+                    "intl": sorted((self._intl[row], row) for row in by_norad if self._intl[row]),
+                }
+            return self._sorted
+
+    @staticmethod
+    def _prefix(index: List[Tuple[str, int]], prefix: str) -> np.ndarray:
+        start = bisect.bisect_left(index, (prefix,))
+        end = bisect.bisect_left(index, (prefix + "\uffff",))
+        return np.fromiter((row for _, row in index[start:end]), np.intp, end - start)
+
+    def query(self, name: Optional[str] = None, intl_designator: Optional[str] = None,
+              regime: Optional[str] = None, epoch_from: Optional[str] = None,
+              epoch_to: Optional[str] = None, limit: int = 100, offset: int = 0) -> Tuple[List[dict], int]:
+        """
+        (page of records ordered by noradId, total matches). name/intl_designator are prefixes.
+
+        Each filter contributes its candidate rows from an index; candidates are
+        intersected smallest first and only the result is sorted by noradId.
+        """
+        if regime is not None and regime.upper() not in REGIMES:
+            raise ValueError(f"regime must be one of {', '.join(REGIMES)}")
+        try:
+            days_from = days_since_j2000(naive_utc(datetime.fromisoformat(epoch_from))) if epoch_from else None
+            days_to = days_since_j2000(naive_utc(datetime.fromisoformat(epoch_to))) if epoch_to else None
+        except (ValueError, TypeError, OverflowError):
+            raise ValueError("epoch_from/epoch_to must be ISO-8601 timestamps")
+
+        with self._lock:
+            indexes = self._indexes()
+            candidates = []  # row arrays; the first one is in noradId order only if it comes from "regime"
+            if regime:
+                candidates.append(indexes["regime"][REGIMES.index(regime.upper())])
+            if days_from is not None or days_to is not None:
+                epochs = indexes["epochs"]
+                start = np.searchsorted(epochs, days_from, "left") if days_from is not None else 0
+                end = np.searchsorted(epochs, days_to, "right") if days_to is not None else len(epochs)
+                candidates.append(indexes["epoch_rows"][start:max(start, end)])
+            for index, prefix in ((indexes["name"], name and name.lower()),
+                                  (indexes["intl"], intl_designator and intl_designator.upper())):
+                if prefix:
+                    candidates.append(self._prefix(index, prefix))
+
+            if not candidates:
+                rows = indexes["norad"]
+            elif len(candidates) == 1 and regime:
+                rows = candidates[0]
+            else:
+                candidates.sort(key=len)
+                rows = candidates[0]
+                for other in candidates[1:]:
+                    if not len(rows):
+                        break
+                    rows = np.intersect1d(rows, other, assume_unique=True)
+                rows = rows[np.argsort(self._columns["norad_id"][rows], kind="stable")]
+            return self.records_for_rows(rows[offset:offset + limit]), len(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            live = self._valid[:self._size]
+            regimes = np.bincount(self._columns["regime"][:self._size][live], minlength=len(REGIMES))
+            return {
+                "satellites": len(self._row_of),
+                "capacity": len(self._valid),
+                "regimes": dict(zip(REGIMES, regimes.tolist())),
+                "column_bytes": sum(column.nbytes for column in self._columns.values()),
+            }
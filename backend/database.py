@@ -0,0 +1,216 @@
+"""
+Database Access Layer
+
+All blocking sqlite3 work runs on a dedicated, bounded thread pool so a slow
+query never stalls the asyncio event loop (and with it every /ws/realtime
+client). Endpoints wrap their SQL in a plain function and await run_db().
+
+POOL BOUNDS:
+- DB_MAX_WORKERS threads execute queries concurrently
+- up to DB_MAX_PENDING further calls may sit in the executor queue
+- callers beyond that wait on the event loop without occupying the pool
+
+Saturation metrics (active/queued/waiting calls, queue wait times) are
+exposed through db_executor.stats().
+
+CONNECTION POOL:
+- one writer connection, serialized by a lock; commits on success, rolls back on error
+- up to DB_MAX_WORKERS read-only connections (mode=ro) for GET endpoints
+- WAL journal so readers never block the writer (and vice versa)
+- synchronous=NORMAL, mmap_size, cache_size and busy_timeout applied per connection
+"""
+
+import asyncio
+import functools
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+
+DB_PATH = Path(__file__).parent / "wa_map.db"
+
+DB_MAX_WORKERS = 4
+DB_MAX_PENDING = 64
+
+# Per-connection pragmas (journal_mode=WAL is persistent and set once by the writer)
+DB_BUSY_TIMEOUT_MS = 5000
+DB_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -16000,      # negative = KiB, i.e. 16 MB page cache
+    "mmap_size": 268435456,    # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+    "busy_timeout": DB_BUSY_TIMEOUT_MS,
+}
+
+
+def _connect(readonly: bool = False) -> sqlite3.Connection:
+    if readonly:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True,
+                               timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(str(DB_PATH), timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for name, value in DB_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class ConnectionPool:
+    """Single writer connection plus a pool of read-only connections."""
+
+    def __init__(self, max_readers: int = DB_MAX_WORKERS):
+        self.max_readers = max_readers
+        self._readers: queue.LifoQueue = queue.LifoQueue()
+        self._reader_count = 0
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def writer(self):
+        """Exclusive access to the writer connection; commits when the block exits cleanly."""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = _connect()
+                self._writer.execute("PRAGMA journal_mode = WAL")
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection (opened lazily, returned to the pool afterwards)."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self._reader_count += 1
+            conn = _connect(readonly=True)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._readers.qsize() < self.max_readers:
+                self._readers.put(conn)
+            else:
+                conn.close()
+                with self._lock:
+                    self._reader_count -= 1
+
+    def close(self):
+        """Close every pooled connection (they are reopened on next use)."""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._reader_count = 0
+
+    def stats(self) -> dict:
+        return {
+            "max_readers": self.max_readers,
+            "open_readers": self._reader_count,
+            "idle_readers": self._readers.qsize(),
+            "writer_open": self._writer is not None,
+        }
+
+
+db_pool = ConnectionPool()
+
+
+class DatabaseExecutor:
+    """Bounded thread pool for blocking database calls, with saturation metrics."""
+
+    def __init__(self, max_workers: int = DB_MAX_WORKERS, max_pending: int = DB_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wa_map_db")
+        self._slots = asyncio.Semaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+
+        self.waiting = 0     # callers waiting for a slot (pool + queue full)
+        self.submitted = 0   # calls handed to the executor and not yet finished
+        self.active = 0      # calls currently running on a worker thread
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and await its result."""
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.submitted += 1
+        queued_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool, functools.partial(self._call, queued_at, fn, *args, **kwargs))
+        finally:
+            self.submitted -= 1
+            self._slots.release()
+
+    def _call(self, queued_at, fn, *args, **kwargs):
+        started = time.perf_counter()
+        wait_ms = (started - queued_at) * 1000
+        with self._lock:
+            self.active += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            run_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.active -= 1
+                self.total_run_ms += run_ms
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "active": self.active,
+            "queued": self.submitted - self.active,
+            "waiting": self.waiting,
+            "saturation": round(self.active / self.max_workers, 3),
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait_ms / finished, 3) if finished else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "avg_run_ms": round(self.total_run_ms / finished, 3) if finished else 0.0,
+        }
+
+
+db_executor = DatabaseExecutor()
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking database function off the event loop."""
+    return await db_executor.run(fn, *args, **kwargs)
@@ -0,0 +1,252 @@
+"""
+Delta-Encoded Position Frames
+
+Optional /ws/realtime encoding ({"type": "configure", "encoding": "delta"}):
+binary frames of fixed-point lat/lon/alt, absolute in keyframes and as
+int16 differences from an earlier frame otherwise. A satellite costs ~6
+bytes in a delta frame against ~90 for a JSON positions entry; one entering
+the client's set costs 16 bytes and one leaving it 4.
+
+FIXED POINT: lat and lon in 1e-5 deg, alt in meters (int32), the resolution
+the JSON frames round to. Satellites whose propagation failed are MISSING
+(int32 min) in all three. Satellites are always in ascending NORAD id order.
+
+STREAMS: every subscription group has one DeltaStream, encoded in the
+realtime producer thread once per tick: a keyframe, plus a delta against
+each earlier frame (`base`) some due client of the group is known to hold.
+Frames are numbered per stream, so a client on a slower rate than its
+group receives deltas against whatever frame it got last, and a client
+whose base is missing (dropped frames, new subscription) gets the keyframe.
+
+LAYOUT (little-endian):
+    offset  size        field
+    0       4           magic b"WARD"
+    4       1           version (uint8, DELTA_VERSION)
+    5       1           kind (uint8: 0 keyframe, 1 delta)
+    6       2           reserved
+    8       4           seq (uint32), the stream's frame number
+    12      4           base (uint32), seq of the frame a delta applies to (0 in keyframes)
+    16      4           n_sats (uint32), satellites in the frame
+    20      8           time, Unix seconds UTC (float64)
+    28      4           n_escapes (uint32)
+    32      4           n_removed (uint32)
+    36      4           n_added (uint32)
+  keyframe (no escapes, removals or additions):
+    40      4 * n_sats  NORAD ids (int32)
+    ...     4 * n_sats  lat, then lon, then alt (int32 each)
+  delta, with k = n_sats - n_added satellites kept from the base frame:
+    40      4 * r       removed indexes into the base frame (uint32, ascending)
+    ...     2 * k       dlat, then dlon, then dalt of the kept satellites (int16 each)
+    ...                 zero padding to a 4-byte boundary
+    ...     4 * m       escaped indexes among the kept satellites (uint32)
+    ...     12 * m      their absolute lat, lon, alt (int32, interleaved)
+    ...     4 * a       added NORAD ids (int32, ascending)
+    ...     12 * a      their absolute lat, lon, alt (int32, interleaved)
+
+Applying a delta to the base frame's state: drop the removed satellites,
+apply the deltas to the rest (order unchanged), then merge in the added
+ones by NORAD id. Longitude deltas are wrapped into +-180 deg (add, then
+wrap). A kept satellite whose change does not fit an int16, or that starts
+or stops failing, carries ESCAPE in all three delta slots and its absolute
+values in the escape table. A client holding a different frame than `base`
+asks for a keyframe with {"type": "resync"}.
+
+KEYFRAMES go to a client for its first frame in a stream, when its base is
+not among the encoded deltas, after a resync request, every
+keyframe_interval seconds, and when a keyframe would be smaller than the
+delta (most of the set replaced or escaping).
+"""
+
+import struct
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from propagation import PropagationResult
+
+
+DELTA_MAGIC = b"WARD"
+DELTA_VERSION = 2
+DELTA_HEADER = struct.Struct("<4sBBHIIIdIII")
+
+KEYFRAME = 0
+DELTA = 1
+
+# Frames a stream keeps as delta bases: 5 s at 5 Hz, enough for a 1 Hz client sharing a 5 Hz group
+DELTA_HISTORY = 25
+
+LATLON_SCALE = 1e5
+ALT_SCALE = 1e3
+MISSING = np.iinfo(np.int32).min
+ESCAPE = np.iinfo(np.int16).min
+DELTA_LIMIT = np.iinfo(np.int16).max
+LON_TURN = int(360 * LATLON_SCALE)
+
+
+def wrap_lon(lon: np.ndarray) -> np.ndarray:
+    """Fixed-point longitudes (or differences) wrapped into [-180, 180) deg."""
+    return (lon + LON_TURN // 2) % LON_TURN - LON_TURN // 2
+
+
+class PositionSnapshot:
+    """Fixed-point positions of one subscription group at one time, in NORAD id order."""
+
+    __slots__ = ("time", "norad_ids", "values")
+
+    def __init__(self, unix_time: float, norad_ids: np.ndarray, values: np.ndarray):
+        order = np.argsort(norad_ids, kind="stable")
+        self.time = unix_time
+        self.norad_ids = norad_ids[order]
+        self.values = values[order]  # (n, 3) int32: lat, lon, alt
+
+    @classmethod
+    def from_result(cls, result: PropagationResult, when: datetime) -> "PositionSnapshot":
+        failed = result.error[:, 0] != 0
+        scaled = np.stack([result.lat[:, 0] * LATLON_SCALE, result.lon[:, 0] * LATLON_SCALE,
+                           result.alt[:, 0] * ALT_SCALE], axis=1)
+        scaled[failed] = 0  # NaN for failed propagations; replaced by MISSING below
+        values = np.round(scaled).astype(np.int32)
+        values[failed] = MISSING
+        if when.tzinfo is None:  # naive datetimes are UTC throughout the backend
+            when = when.replace(tzinfo=timezone.utc)
+        return cls(when.timestamp(), result.norad_ids.astype(np.int32), values)
+
+
+class EncodedFrame:
+    """One stream frame: its keyframe bytes and deltas by base seq (with their escape counts)."""
+
+    __slots__ = ("stream", "seq", "keyframe", "deltas")
+
+    def __init__(self, stream: "DeltaStream", seq: int, keyframe: bytes, deltas: Dict[int, Tuple[bytes, int]]):
+        self.stream = stream
+        self.seq = seq
+        self.keyframe = keyframe
+        self.deltas = deltas
+
+
+class DeltaStream:
+    """Frame numbering and recent snapshots of one subscription group; encodes each frame once."""
+
+    def __init__(self, history: int = DELTA_HISTORY):
+        self.history = history
+        self.seq = 0
+        self._snapshots: "OrderedDict[int, PositionSnapshot]" = OrderedDict()
+
+    def encode(self, snapshot: PositionSnapshot, bases: Iterable[int] = ()) -> EncodedFrame:
+        """Keyframe plus deltas against each base still in the history (skipped where a keyframe is smaller)."""
+        self.seq = self.seq % 0xFFFFFFFF + 1  # never 0, which keyframes use as base
+        deltas = {}
+        for base in set(bases):
+            previous = self._snapshots.get(base)
+            if previous is not None:
+                delta = encode_delta(previous, snapshot, self.seq, base)
+                if delta is not None:
+                    deltas[base] = delta
+        frame = EncodedFrame(self, self.seq, encode_keyframe(snapshot, self.seq), deltas)
+        self._snapshots[self.seq] = snapshot
+        while len(self._snapshots) > self.history:
+            self._snapshots.popitem(last=False)
+        return frame
+
+
+def _header(kind: int, seq: int, base: int, snapshot: PositionSnapshot, n: int, escapes: int = 0,
+            removed: int = 0, added: int = 0) -> bytes:
+    return DELTA_HEADER.pack(DELTA_MAGIC, DELTA_VERSION, kind, 0, seq, base, n, snapshot.time,
+                             escapes, removed, added)
+
+
+def encode_keyframe(snapshot: PositionSnapshot, seq: int) -> bytes:
+    return b"".join((_header(KEYFRAME, seq, 0, snapshot, len(snapshot.norad_ids)),
+                     snapshot.norad_ids.astype("<i4").tobytes(),
+                     np.ascontiguousarray(snapshot.values.T).astype("<i4").tobytes()))
+
+
+def encode_delta(base: PositionSnapshot, snapshot: PositionSnapshot, seq: int,
+                 base_seq: int) -> Optional[Tuple[bytes, int]]:
+    """(delta frame bytes, escapes) from `base` to `snapshot`, or None when a keyframe would be smaller."""
+    _, kept_base, kept_current = np.intersect1d(base.norad_ids, snapshot.norad_ids,
+                                                assume_unique=True, return_indices=True)
+    removed = np.setdiff1d(np.arange(len(base.norad_ids)), kept_base, assume_unique=True)
+    added = np.setdiff1d(np.arange(len(snapshot.norad_ids)), kept_current, assume_unique=True)
+
+    current, previous = snapshot.values[kept_current].astype(np.int64), base.values[kept_base].astype(np.int64)
+    diff = current - previous
+    diff[:, 1] = wrap_lon(diff[:, 1])
+    missing = current[:, 0] == MISSING
+    escaped = (np.abs(diff).max(axis=1) > DELTA_LIMIT) | (missing != (previous[:, 0] == MISSING))
+    diff[missing & ~escaped] = 0
+    diff[escaped] = ESCAPE
+    escape_index = np.flatnonzero(escaped)
+
+    k, m, r, a = len(diff), len(escape_index), len(removed), len(added)
+    deltas_size = 6 * k + (-(DELTA_HEADER.size + 4 * r + 6 * k) % 4)
+    if 4 * r + deltas_size + 16 * m + 16 * a >= 16 * (k + a):
+        return None
+
+    deltas = np.ascontiguousarray(diff.T).astype("<i2").tobytes()
+    padding = b"\0" * (-(DELTA_HEADER.size + 4 * r + len(deltas)) % 4)
+    payload = b"".join((_header(DELTA, seq, base_seq, snapshot, k + a, m, r, a), removed.astype("<u4").tobytes(),
+                        deltas, padding, escape_index.astype("<u4").tobytes(),
+                        snapshot.values[kept_current[escape_index]].astype("<i4").tobytes(),
+                        snapshot.norad_ids[added].astype("<i4").tobytes(),
+                        snapshot.values[added].astype("<i4").tobytes()))
+    return payload, m
+
+
+class DeltaDecoder:
+    """Client-side state for decoding a frame stream (for scripts and checks; the browser reads typed arrays)."""
+
+    def __init__(self):
+        self.seq: Optional[int] = None
+        self.norad_ids: Optional[np.ndarray] = None
+        self.values: Optional[np.ndarray] = None
+
+    def decode(self, payload: bytes) -> Dict[str, object]:
+        """Apply one frame; raises ValueError when a delta's base is not the current frame (ask to resync)."""
+        magic, version, kind, _, seq, base, n, unix_time, m, r, a = DELTA_HEADER.unpack_from(payload)
+        if magic != DELTA_MAGIC or version != DELTA_VERSION:
+            raise ValueError(f"Not a version {DELTA_VERSION} delta frame")
+        offset = DELTA_HEADER.size
+        if kind == KEYFRAME:
+            self.norad_ids = np.frombuffer(payload, "<i4", n, offset).copy()
+            self.values = np.frombuffer(payload, "<i4", 3 * n, offset + 4 * n).reshape(3, n).T.copy()
+        else:
+            if self.seq is None or base != self.seq:
+                raise ValueError(f"Delta for frame {base} but holding frame {self.seq}")
+            kept = np.ones(len(self.norad_ids), bool)
+            kept[np.frombuffer(payload, "<u4", r, offset)] = False
+            offset += 4 * r
+            k = n - a
+            diff = np.frombuffer(payload, "<i2", 3 * k, offset).reshape(3, k).T.astype(np.int64)
+            offset += 6 * k
+            offset += -offset % 4
+            escape_index = np.frombuffer(payload, "<u4", m, offset)
+            offset += 4 * m
+            escaped = np.frombuffer(payload, "<i4", 3 * m, offset).reshape(m, 3)
+            offset += 12 * m
+            added_ids = np.frombuffer(payload, "<i4", a, offset)
+            added = np.frombuffer(payload, "<i4", 3 * a, offset + 4 * a).reshape(a, 3)
+            previous = self.values[kept]
+            values = previous.astype(np.int64) + diff
+            values[:, 1] = wrap_lon(values[:, 1])
+            values[previous[:, 0] == MISSING] = MISSING  # deltas of still-missing satellites are 0
+            values[escape_index] = escaped
+            norad_ids = np.concatenate([self.norad_ids[kept], added_ids])
+            order = np.argsort(norad_ids, kind="stable")
+            self.norad_ids = norad_ids[order]
+            self.values = np.concatenate([values.astype(np.int32), added])[order]
+        self.seq = seq
+        missing = self.values[:, 0] == MISSING
+        lat, lon = self.values[:, 0] / LATLON_SCALE, self.values[:, 1] / LATLON_SCALE
+        alt = self.values[:, 2] / ALT_SCALE
+        return {
+            "seq": seq,
+            "keyframe": kind == KEYFRAME,
+            "time": unix_time,
+            "norad_ids": self.norad_ids,
+            "lat": np.where(missing, np.nan, lat),
+            "lon": np.where(missing, np.nan, lon),
+            "alt": np.where(missing, np.nan, alt),
+        }
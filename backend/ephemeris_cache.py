@@ -0,0 +1,228 @@
+"""
+Ephemeris Cache
+
+Shared cache of propagated TEME states keyed by (NORAD id, TLE epoch, time
+bucket). Clients watching the same satellites at the same simulation time
+(/ws/realtime ticks, /api/satellites/positions) reuse one SGP4 evaluation
+instead of each running their own.
+
+STORAGE:
+- one block per time bucket (bucket_seconds wide, aligned to the Unix
+  epoch): sorted NORAD ids, the TLE epoch each state came from, SGP4 error
+  codes and r/v, all NumPy arrays
+- lookups are vectorized (searchsorted on the ids, epochs compared per
+  hit); misses are propagated in one call and merged into the block
+- a state computed from an older TLE epoch is a miss; catalog writes also
+  invalidate the written ids outright (same-epoch corrections, deletes)
+
+EVICTION: whole buckets, least recently used first, once the blocks exceed
+max_bytes; buckets older than ttl_seconds are dropped when next touched.
+
+INTERPOLATION: off, a request gets the state at the start of its bucket
+(up to bucket_seconds stale). On, the states at both bucket edges are
+blended with a cubic Hermite spline on position and velocity: smooth
+between ticks and within centimeters of SGP4 for 1 s buckets in LEO.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+# compute(mask, at) -> (error (k,), r (k, 3), v (k, 3)) for the masked satellites at `at`
+ComputeStates = Callable[[np.ndarray, datetime], Tuple[np.ndarray, np.ndarray, np.ndarray]]
+
+
+def naive_utc(when: datetime) -> datetime:
+    """`when` as a naive UTC datetime (naive datetimes are taken as UTC already)."""
+    if when.tzinfo is not None:
+        return when.astimezone(timezone.utc).replace(tzinfo=None)
+    return when
+
+
+def unix_seconds(when: datetime) -> float:
+    """Seconds since 1970 for a UTC datetime (naive datetimes are taken as UTC)."""
+    return (naive_utc(when) - UNIX_EPOCH).total_seconds()
+
+
+def hermite(r0: np.ndarray, v0: np.ndarray, r1: np.ndarray, v1: np.ndarray,
+            s: float, h: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Cubic Hermite position/velocity at fraction s of an interval of h seconds."""
+    s2, s3 = s * s, s * s * s
+    r = ((2 * s3 - 3 * s2 + 1) * r0 + (s3 - 2 * s2 + s) * h * v0
+         + (-2 * s3 + 3 * s2) * r1 + (s3 - s2) * h * v1)
+    v = ((6 * s2 - 6 * s) * r0 / h + (3 * s2 - 4 * s + 1) * v0
+         + (-6 * s2 + 6 * s) * r1 / h + (3 * s2 - 2 * s) * v1)
+    return r, v
+
+
+class _Bucket:
+    __slots__ = ("norad_ids", "epochs", "error", "r", "v", "created")
+
+    def __init__(self):
+        self.norad_ids = np.empty(0, np.int32)
+        self.epochs = np.empty(0)
+        self.error = np.empty(0, np.uint8)
+        self.r = np.empty((0, 3))
+        self.v = np.empty((0, 3))
+        self.created = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return self.norad_ids.nbytes + self.epochs.nbytes + self.error.nbytes + self.r.nbytes + self.v.nbytes
+
+    def find(self, norad_ids: np.ndarray, epochs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(hit mask, block index) for the requested ids at the given TLE epochs."""
+        if not len(self.norad_ids):
+            return np.zeros(len(norad_ids), bool), np.zeros(len(norad_ids), np.intp)
+        index = np.minimum(np.searchsorted(self.norad_ids, norad_ids), len(self.norad_ids) - 1)
+        hit = (self.norad_ids[index] == norad_ids) & (self.epochs[index] == epochs)
+        return hit, index
+
+    def merge(self, norad_ids, epochs, error, r, v):
+        keep = ~np.isin(self.norad_ids, norad_ids)
+        norad_ids, first = np.unique(norad_ids, return_index=True)
+        merged_ids = np.concatenate([self.norad_ids[keep], norad_ids])
+        order = np.argsort(merged_ids, kind="stable")
+        self.norad_ids = merged_ids[order]
+        self.epochs = np.concatenate([self.epochs[keep], epochs[first]])[order]
+        self.error = np.concatenate([self.error[keep], error[first]])[order]
+        self.r = np.concatenate([self.r[keep], r[first]])[order]
+        self.v = np.concatenate([self.v[keep], v[first]])[order]
+
+    def drop(self, norad_ids: np.ndarray) -> int:
+        keep = ~np.isin(self.norad_ids, norad_ids)
+        dropped = len(keep) - int(keep.sum())
+        if dropped:
+            self.norad_ids, self.epochs, self.error = self.norad_ids[keep], self.epochs[keep], self.error[keep]
+            self.r, self.v = self.r[keep], self.v[keep]
+        return dropped
+
+
+class EphemerisCache:
+    """Time-bucketed TEME states shared across requests, with a memory budget."""
+
+    def __init__(self, bucket_seconds: float = 1.0, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 600.0, interpolate: bool = True):
+        self.bucket_seconds = bucket_seconds
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.interpolate = interpolate
+        self._buckets: "OrderedDict[int, _Bucket]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def bucket_time(self, bucket: int) -> datetime:
+        return UNIX_EPOCH + timedelta(seconds=bucket * self.bucket_seconds)
+
+    def states(self, norad_ids: np.ndarray, epochs: np.ndarray, when: datetime,
+               compute: ComputeStates) -> Tuple[np.ndarray, np.ndarray, np.ndarray, datetime]:
+        """
+        (error, r, v, at) for each requested satellite, TEME km and km/s.
+
+        `at` is the time the states are valid for: `when` when interpolating
+        (or when it falls on a bucket edge), otherwise the start of its bucket.
+        """
+        position = unix_seconds(when) / self.bucket_seconds
+        bucket = math.floor(position)
+        fraction = position - bucket
+        error, r, v = self._bucket_states(bucket, norad_ids, epochs, compute)
+        if not self.interpolate or fraction == 0:
+            return error, r, v, (self.bucket_time(bucket) if fraction else when)
+        error1, r1, v1 = self._bucket_states(bucket + 1, norad_ids, epochs, compute)
+        r, v = hermite(r, v, r1, v1, fraction, self.bucket_seconds)
+        return np.maximum(error, error1), r, v, when
+
+    def _bucket_states(self, bucket: int, norad_ids: np.ndarray, epochs: np.ndarray,
+                       compute: ComputeStates) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = len(norad_ids)
+        error, r, v = np.zeros(n, np.uint8), np.empty((n, 3)), np.empty((n, 3))
+        with self._lock:
+            block = self._touch(bucket)
+            hit, index = block.find(norad_ids, epochs) if block is not None else (np.zeros(n, bool), None)
+            if hit.any():
+                found = index[hit]
+                error[hit], r[hit], v[hit] = block.error[found], block.r[found], block.v[found]
+            hits = int(hit.sum())
+            self.hits += hits
+            self.misses += n - hits
+
+        miss = ~hit
+        if hits < n:
+            error[miss], r[miss], v[miss] = compute(miss, self.bucket_time(bucket))
+            with self._lock:
+                block = self._buckets.get(bucket)
+                if block is None:
+                    block = self._buckets[bucket] = _Bucket()
+                self._bytes -= block.nbytes
+                block.merge(norad_ids[miss], epochs[miss], error[miss], r[miss], v[miss])
+                self._bytes += block.nbytes
+                self._evict(keep=bucket)
+        return error, r, v
+
+    def _touch(self, bucket: int) -> Optional[_Bucket]:
+        block = self._buckets.get(bucket)
+        if block is None:
+            return None
+        if time.monotonic() - block.created > self.ttl_seconds:
+            self._remove(bucket)
+            self.expirations += 1
+            return None
+        self._buckets.move_to_end(bucket)
+        return block
+
+    def _remove(self, bucket: int):
+        self._bytes -= self._buckets.pop(bucket).nbytes
+
+    def _evict(self, keep: int):
+        while self._bytes > self.max_bytes and len(self._buckets) > 1:
+            oldest = next(iter(self._buckets))
+            if oldest == keep:
+                self._buckets.move_to_end(keep)
+                continue
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, norad_ids: Iterable[int]):
+        """Drop cached states for these satellites (registered as a catalog listener)."""
+        norad_ids = np.fromiter(norad_ids, np.int64)
+        if not len(norad_ids):
+            return
+        with self._lock:
+            for block in self._buckets.values():
+                self._bytes -= block.nbytes
+                self.invalidations += block.drop(norad_ids)
+                self._bytes += block.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "bucket_seconds": self.bucket_seconds,
+            "interpolate": self.interpolate,
+            "buckets": len(self._buckets),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,286 @@
+"""
+Chebyshev Ephemeris Tables
+
+Precomputed piecewise Chebyshev fits of each satellite's TEME position over
+a sliding window (default now +/- 2 h). Positions are then served by
+polynomial evaluation instead of SGP4: one small matrix product for the whole
+catalog per tick, which suits high-rate WebSocket updates.
+
+FIT:
+- the window is split into segments of segment_minutes; each coordinate of
+  each segment is a degree-`degree` Chebyshev series, interpolated at the
+  Chebyshev-Gauss nodes (one pooled SGP4 call over all node times)
+- velocity is the derivative of the position series; SGP4's own velocity is
+  not exactly dr/dt, so the two differ by up to ~0.2 m/s (more for
+  eccentric orbits) even where positions agree to millimeters
+- all segments share the same edges, so one time maps to one segment and one
+  basis vector for every satellite
+
+ERROR BOUNDS: every build re-propagates VALIDATION_TAUS points per segment
+(between the nodes, and near the segment ends where interpolation error
+peaks) and records each satellite's worst position error against SGP4.
+Satellites above max_error_km, with SGP4 errors in the window, written
+since the build (catalog listener) or added since the build are served by
+direct SGP4 instead. stats() reports the bounds.
+
+WINDOW: the shared table is anchored to the current time (realtime ticks,
+the hot path). It is rebuilt in a background thread, centered on now, once
+now comes within refresh_margin_minutes of the window end or the catalog
+changed; requests never build inline. Times outside the window (time-bar
+scrubbing, historical queries) are not served and run SGP4, so they cannot
+thrash the window away from the realtime clients. Until the first build
+finishes everything runs SGP4.
+
+The defaults (30 min segments, degree 12) fit LEO and GPS orbits to well
+under a millimeter; see scripts/benchmark_ephemeris.py.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+
+from ephemeris_cache import UNIX_EPOCH, naive_utc, unix_seconds
+
+
+# Validation points per segment, in segment coordinates [-1, 1]
+VALIDATION_TAUS = (-0.98, 0.1, 0.98)
+
+
+def chebyshev_nodes(degree: int) -> np.ndarray:
+    """Chebyshev-Gauss nodes on [-1, 1], descending."""
+    n = degree + 1
+    return np.cos(np.pi * (np.arange(n) + 0.5) / n)
+
+
+def chebyshev_fit_matrix(taus: np.ndarray, degree: int) -> np.ndarray:
+    """(degree + 1, degree + 1) matrix taking values at `taus` to series coefficients."""
+    return np.linalg.inv(np.polynomial.chebyshev.chebvander(taus, degree))
+
+
+def chebyshev_basis(tau: float, degree: int) -> Tuple[np.ndarray, np.ndarray]:
+    """T_j(tau) and dT_j/dtau for j = 0..degree (three-term recurrences)."""
+    t = np.empty(degree + 1)
+    dt = np.empty(degree + 1)
+    t[0], dt[0] = 1.0, 0.0
+    if degree:
+        t[1], dt[1] = tau, 1.0
+    for j in range(2, degree + 1):
+        t[j] = 2 * tau * t[j - 1] - t[j - 2]
+        dt[j] = 2 * t[j - 1] + 2 * tau * dt[j - 1] - dt[j - 2]
+    return t, dt
+
+
+class ChebyshevTable:
+    """
+    Fitted coefficients for a fixed set of satellites over [start, end].
+
+    Times inside the window are offsets from `start` (naive UTC): float
+    Unix seconds only resolve ~0.2 us, which is millimeters in LEO.
+    """
+
+    def __init__(self, norad_ids: np.ndarray, epochs: np.ndarray, start: datetime,
+                 segment_seconds: float, coefficients: np.ndarray, valid: np.ndarray, max_error_km: np.ndarray):
+        self.norad_ids = norad_ids
+        self.epochs = epochs
+        self.start = start
+        self.segment_seconds = segment_seconds
+        self.coefficients = coefficients  # (segments, satellites, 3, degree + 1)
+        self.n_segments = coefficients.shape[0]
+        self.degree = coefficients.shape[-1] - 1
+        self.end = start + timedelta(seconds=self.n_segments * segment_seconds)
+        self.valid = valid
+        self.max_error_km = max_error_km
+        self.build_ms = 0.0
+
+    @property
+    def nbytes(self) -> int:
+        return self.coefficients.nbytes + self.norad_ids.nbytes + self.epochs.nbytes + self.max_error_km.nbytes
+
+    def covers(self, when: datetime) -> bool:
+        return self.start <= naive_utc(when) <= self.end
+
+    def locate(self, when: datetime) -> Tuple[int, float]:
+        """(segment, tau in [-1, 1]) for a time inside the window."""
+        offset = (naive_utc(when) - self.start).total_seconds()
+        position = min(offset / self.segment_seconds, self.n_segments - 1e-12)
+        segment = int(position)
+        return segment, 2 * (position - segment) - 1
+
+    def evaluate(self, norad_ids: np.ndarray, epochs: np.ndarray,
+                 when: datetime) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(served mask, r, v) in TEME km and km/s; unserved entries are left for SGP4."""
+        n = len(norad_ids)
+        r, v = np.zeros((n, 3)), np.zeros((n, 3))
+        if not len(self.norad_ids):
+            return np.zeros(n, bool), r, v
+        segment, tau = self.locate(when)
+        if n == len(self.norad_ids) and np.array_equal(norad_ids, self.norad_ids):
+            # The whole table in table order (a realtime tick): no gather
+            served = (self.epochs == epochs) & self.valid
+            if served.all():
+                return (served,) + self._series(self.coefficients[segment], tau)
+            index = np.arange(n)
+        else:
+            index = np.minimum(np.searchsorted(self.norad_ids, norad_ids), len(self.norad_ids) - 1)
+            served = (self.norad_ids[index] == norad_ids) & (self.epochs[index] == epochs) & self.valid[index]
+        if served.any():
+            r[served], v[served] = self._series(self.coefficients[segment][index[served]], tau)
+        return served, r, v
+
+    def _series(self, coefficients: np.ndarray, tau: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Position and velocity from (satellites, 3, degree + 1) coefficients in one matrix product."""
+        basis, dbasis = chebyshev_basis(tau, self.degree)
+        n = len(coefficients)
+        both = coefficients.reshape(n * 3, self.degree + 1) @ np.stack([basis, dbasis * (2.0 / self.segment_seconds)], axis=1)
+        return both[:, 0].reshape(n, 3), both[:, 1].reshape(n, 3)
+
+    def invalidate(self, norad_ids: np.ndarray):
+        self.valid[np.isin(self.norad_ids, norad_ids)] = False
+
+    @classmethod
+    def build(cls, rows: np.ndarray, norad_ids: np.ndarray, epochs: np.ndarray, start: datetime,
+              segment_seconds: float, n_segments: int, degree: int, max_error_km: float,
+              propagate: Callable) -> "ChebyshevTable":
+        """Fit `rows` (sorted by NORAD id) with propagate(rows, times) -> PropagationResult."""
+        def times_at(taus: np.ndarray):
+            offsets = (np.arange(n_segments)[:, None] + (taus[None, :] + 1) / 2) * segment_seconds
+            return [start + timedelta(seconds=s) for s in offsets.ravel().tolist()]
+
+        # Fit at the node times actually propagated: datetimes round to the microsecond,
+        # which would otherwise shift the nodes by up to ~4 mm of LEO motion
+        nodes = np.round((chebyshev_nodes(degree) + 1) / 2 * segment_seconds, 6) / segment_seconds * 2 - 1
+        fitted = propagate(rows, times_at(nodes))
+        values = fitted.r_teme.reshape(len(rows), n_segments, degree + 1, 3)
+        coefficients = np.einsum("nskc,jk->sncj", values, chebyshev_fit_matrix(nodes, degree))
+
+        taus = np.array(VALIDATION_TAUS)
+        checked = propagate(rows, times_at(taus))
+        expected = checked.r_teme.reshape(len(rows), n_segments, len(taus), 3)
+        basis = np.stack([chebyshev_basis(tau, degree)[0] for tau in taus])  # (taus, degree + 1)
+        approx = np.einsum("sncj,uj->nsuc", coefficients, basis)
+        error_km = np.linalg.norm(approx - expected, axis=-1).max(axis=(1, 2))
+
+        failed = fitted.error.any(axis=1) | checked.error.any(axis=1)
+        error_km[failed] = np.inf
+        valid = error_km <= max_error_km
+        return cls(norad_ids, epochs, start, segment_seconds, np.ascontiguousarray(coefficients), valid, error_km)
+
+
+class EphemerisTables:
+    """Keeps a ChebyshevTable for the whole catalog around the times being requested."""
+
+    def __init__(self, catalog, propagate: Callable, window_hours: float = 2.0, segment_minutes: float = 30.0,
+                 degree: int = 12, max_error_km: float = 0.001, refresh_margin_minutes: float = 30.0,
+                 now: Callable[[], datetime] = datetime.utcnow):
+        self.catalog = catalog
+        self.propagate = propagate
+        self.now = now
+        self.window_seconds = window_hours * 3600
+        self.segment_seconds = segment_minutes * 60
+        self.degree = degree
+        self.max_error_km = max_error_km
+        self.refresh_margin_seconds = refresh_margin_minutes * 60
+        self._table: Optional[ChebyshevTable] = None
+        self._build_lock = threading.Lock()
+        self._building: Optional[threading.Thread] = None
+        self._catalog_version = -1
+        self.builds = 0
+        self.evaluations = 0
+        self.satellites_evaluated = 0
+        self.fallbacks = 0
+        self.out_of_window = 0
+
+    def _build(self, center: datetime) -> ChebyshevTable:
+        with self._build_lock:
+            table = self._table
+            if table is not None and not self._needs_refresh(table, center):
+                return table  # another caller already rebuilt around this time
+            started = time.perf_counter()
+            version = self.catalog.version
+            rows = self.catalog.rows()
+            columns = self.catalog.columns(rows)
+            n_segments = max(1, int(np.ceil(2 * self.window_seconds / self.segment_seconds)))
+            # Segment edges on multiples of the segment length, so rebuilt windows line up
+            first = np.floor((unix_seconds(center) - self.window_seconds) / self.segment_seconds)
+            start = UNIX_EPOCH + timedelta(seconds=float(first) * self.segment_seconds)
+            table = ChebyshevTable.build(rows, columns["norad_id"], columns["epoch"], start,
+                                         self.segment_seconds, n_segments, self.degree, self.max_error_km,
+                                         self.propagate)
+            table.build_ms = (time.perf_counter() - started) * 1000
+            self._table, self._catalog_version = table, version
+            self.builds += 1
+            return table
+
+    def _needs_refresh(self, table: ChebyshevTable, when: datetime) -> bool:
+        margin = timedelta(seconds=self.refresh_margin_seconds)
+        when = naive_utc(when)
+        return (when < table.start + margin or when > table.end - margin
+                or self._catalog_version != self.catalog.version)
+
+    def refresh(self) -> ChebyshevTable:
+        """Build the table around now unless the current one is still fresh (blocking: startup and scripts)."""
+        return self._build(self.now())
+
+    def _build_in_background(self):
+        if self._building is not None and self._building.is_alive():
+            return
+        self._building = threading.Thread(target=self.refresh, name="ephemeris-tables", daemon=True)
+        self._building.start()
+
+    def table_for(self, when: datetime) -> Optional[ChebyshevTable]:
+        """The shared table if it covers `when`, else None (serve by SGP4); slides the window in the background."""
+        table = self._table
+        if table is None or self._needs_refresh(table, self.now()):
+            self._build_in_background()
+        if table is None or not table.covers(when):
+            return None
+        return table
+
+    def evaluate(self, norad_ids: np.ndarray, epochs: np.ndarray,
+                 when: datetime) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(served mask, r, v) at `when`; satellites not served need direct SGP4."""
+        table = self.table_for(when)
+        if table is None:
+            self.out_of_window += 1
+            n = len(norad_ids)
+            served, r, v = np.zeros(n, bool), np.zeros((n, 3)), np.zeros((n, 3))
+        else:
+            served, r, v = table.evaluate(norad_ids, epochs, when)
+        self.evaluations += 1
+        self.satellites_evaluated += int(served.sum())
+        self.fallbacks += len(served) - int(served.sum())
+        return served, r, v
+
+    def invalidate(self, norad_ids: Iterable[int]):
+        """Stop serving these satellites from the current table (registered as a catalog listener)."""
+        table = self._table
+        if table is not None:
+            table.invalidate(np.fromiter(norad_ids, np.int64))
+
+    def stats(self) -> dict:
+        table = self._table
+        stats = {
+            "builds": self.builds,
+            "evaluations": self.evaluations,
+            "satellites_evaluated": self.satellites_evaluated,
+            "fallbacks": self.fallbacks,
+            "out_of_window": self.out_of_window,
+            "segment_minutes": self.segment_seconds / 60,
+            "degree": self.degree,
+        }
+        if table is not None:
+            fitted = table.max_error_km[table.valid]
+            stats.update({
+                "window_start": table.start.isoformat(),
+                "window_end": table.end.isoformat(),
+                "satellites": len(table.norad_ids),
+                "unfitted": int((~table.valid).sum()),
+                "max_error_km": float(fitted.max()) if len(fitted) else None,
+                "p99_error_km": float(np.percentile(fitted, 99)) if len(fitted) else None,
+                "bytes": table.nbytes,
+                "build_ms": round(table.build_ms, 1),
+            })
+        return stats
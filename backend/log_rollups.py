@@ -0,0 +1,200 @@
+"""
+Per-Minute Log Rollups
+
+Maintains log_rollups_minute: one row per (minute, endpoint, level, category,
+profile_id) with request count, error count and latency sum/min/max plus a
+mergeable latency sketch (metrics.LatencyHistogram buckets as JSON). Charts
+read these aggregates instead of scanning system_logs partitions.
+
+MAINTENANCE:
+- requests are counted by observe() from the logging middleware before
+  sampling drops any rows, keyed by route template (bounded cardinality);
+  rows of those observed categories are not folded in again from the log
+- write() runs inside the log writer's batch transaction: it folds the
+  batch's other rows and flushes the observed requests accumulated since
+  the previous batch (the sampler's summary row guarantees batches)
+- rows already in the partitions when the table is first created are
+  backfilled as logged (sampled request rows included)
+- prune() removes minutes older than the retention cutoff (small table, cheap)
+
+QUERY:
+- query() re-buckets minutes to bucket_minutes, optionally grouped by one
+  dimension, and derives p50/p95/p99 from the merged sketches
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from metrics import LatencyHistogram
+
+
+ROLLUP_TABLE = "log_rollups_minute"
+ROLLUP_DIMENSIONS = ("endpoint", "level", "category", "profile_id")
+
+ROLLUP_SCHEMA = f"""CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+    minute TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    level TEXT NOT NULL,
+    category TEXT NOT NULL,
+    profile_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    error_count INTEGER NOT NULL,
+    latency_count INTEGER NOT NULL,
+    latency_sum REAL NOT NULL,
+    latency_min REAL,
+    latency_max REAL,
+    latency_sketch TEXT NOT NULL,
+    PRIMARY KEY (minute, endpoint, level, category, profile_id)
+) WITHOUT ROWID"""
+
+
+class _Aggregate:
+    __slots__ = ("count", "error_count", "latency")
+
+    def __init__(self):
+        self.count = 0
+        self.error_count = 0
+        self.latency = LatencyHistogram()
+
+    def add(self, level: str, status: Optional[int], duration_ms: Optional[float]):
+        self.count += 1
+        if level == "error" or (status is not None and status >= 500):
+            self.error_count += 1
+        if duration_ms is not None:
+            self.latency.record(duration_ms)
+
+
+def _rollup_key(row: Sequence) -> tuple:
+    # row is in LOG_COLUMNS[1:] order: timestamp, profile_id, username, level,
+    # category, endpoint, method, message, request_body, response_status, duration_ms
+    # NULL dimensions are stored as ''/0 so they take part in the primary key
+    return (row[0][:16], row[5] or "", row[3], row[4] or "", row[1] or 0)
+
+
+class LogRollups:
+    """Incrementally maintained per-minute aggregates over system_logs and observed requests."""
+
+    def __init__(self, observed_categories: Iterable[str] = ("API",)):
+        self.observed_categories = frozenset(observed_categories)
+        self._pending: Dict[tuple, _Aggregate] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, timestamp: str, endpoint: str, level: str, category: str, profile_id: Optional[int],
+                status: Optional[int], duration_ms: Optional[float]):
+        """Count one request (every request, sampled or not) until the next write()."""
+        key = (timestamp[:16], endpoint, level, category, profile_id or 0)
+        with self._lock:
+            agg = self._pending.get(key)
+            if agg is None:
+                agg = self._pending[key] = _Aggregate()
+            agg.add(level, status, duration_ms)
+
+    def write(self, conn: sqlite3.Connection, rows: Iterable[Sequence]):
+        """Fold a log batch's rows outside observed_categories plus all requests observed since the last write."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        self._fold(pending, (row for row in rows if row[4] not in self.observed_categories))
+        self._persist(conn, pending)
+
+    def init(self, conn: sqlite3.Connection, existing_rows: Iterable[Iterable[Sequence]] = ()):
+        """Create the table; backfill from existing_rows chunks when it is new."""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                              (ROLLUP_TABLE,)).fetchone()
+        conn.execute(ROLLUP_SCHEMA)
+        if not exists:
+            for chunk in existing_rows:
+                self.apply(conn, chunk)
+
+    def apply(self, conn: sqlite3.Connection, rows: Iterable[Sequence]):
+        """Fold a batch of log rows (LOG_COLUMNS[1:] order) into the minute rollups."""
+        batch = {}
+        self._fold(batch, rows)
+        self._persist(conn, batch)
+
+    @staticmethod
+    def _fold(batch: Dict[tuple, _Aggregate], rows: Iterable[Sequence]):
+        for row in rows:
+            key = _rollup_key(row)
+            agg = batch.get(key)
+            if agg is None:
+                agg = batch[key] = _Aggregate()
+            agg.add(row[3], row[9], row[10])
+
+    @staticmethod
+    def _persist(conn: sqlite3.Connection, batch: Dict[tuple, _Aggregate]):
+        for key, agg in batch.items():
+            existing = conn.execute(
+                f"SELECT count, error_count, latency_sum, latency_min, latency_max, latency_sketch "
+                f"FROM {ROLLUP_TABLE} WHERE minute = ? AND endpoint = ? AND level = ? "
+                f"AND category = ? AND profile_id = ?", key).fetchone()
+            latency = agg.latency
+            count, error_count = agg.count, agg.error_count
+            if existing:
+                count += existing[0]
+                error_count += existing[1]
+                latency.merge(LatencyHistogram.from_buckets(
+                    json.loads(existing[5]), existing[2],
+                    existing[3] if existing[3] is not None else float("inf"), existing[4] or 0.0))
+            conn.execute(
+                f"INSERT OR REPLACE INTO {ROLLUP_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (count, error_count, latency.count, latency.total,
+                       latency.min if latency.count else None, latency.max if latency.count else None,
+                       json.dumps(latency.to_buckets(), separators=(",", ":"))))
+
+    def prune(self, conn: sqlite3.Connection, cutoff: str) -> int:
+        return conn.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE minute < ?", (cutoff[:16],)).rowcount
+
+    def query(self, conn: sqlite3.Connection, since: Optional[str] = None, until: Optional[str] = None,
+              bucket_minutes: int = 1, group_by: Optional[str] = None, **filters) -> List[dict]:
+        """Time series of aggregates; filters may be any of ROLLUP_DIMENSIONS."""
+        if group_by is not None and group_by not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"group_by must be one of {', '.join(ROLLUP_DIMENSIONS)}")
+        clauses, params = [], []
+        if since:
+            clauses.append("minute >= ?")
+            params.append(since[:16])
+        if until:
+            clauses.append("minute <= ?")
+            params.append(until[:16])
+        for name, value in filters.items():
+            if name not in ROLLUP_DIMENSIONS:
+                raise ValueError(f"Unknown rollup filter: {name}")
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        where = " AND ".join(clauses) or "1=1"
+        cursor = conn.execute(
+            f"SELECT minute, {group_by or 'NULL'}, count, error_count, latency_sum, latency_min, "
+            f"latency_max, latency_sketch FROM {ROLLUP_TABLE} WHERE {where} ORDER BY minute", params)
+
+        buckets = {}
+        for minute, group, count, errors, lat_sum, lat_min, lat_max, sketch in cursor:
+            bucket = _floor_minute(minute, bucket_minutes)
+            entry = buckets.get((bucket, group))
+            if entry is None:
+                entry = buckets[(bucket, group)] = [0, 0, LatencyHistogram()]
+            entry[0] += count
+            entry[1] += errors
+            entry[2].merge(LatencyHistogram.from_buckets(
+                json.loads(sketch), lat_sum, lat_min if lat_min is not None else float("inf"), lat_max or 0.0))
+
+        series = []
+        for (bucket, group), (count, errors, latency) in sorted(buckets.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            point = {"time": bucket, "count": count, "error_count": errors, "latency_ms": latency.summary()}
+            point["latency_ms"]["min"] = round(latency.min, 3) if latency.count else None
+            if group_by:
+                point[group_by] = group
+            series.append(point)
+        return series
+
+
+def _floor_minute(minute: str, bucket_minutes: int) -> str:
+    if bucket_minutes <= 1:
+        return minute
+    dt = datetime.strptime(minute, "%Y-%m-%dT%H:%M")
+    total = dt.hour * 60 + dt.minute
+    total -= total % bucket_minutes
+    return dt.replace(hour=total // 60, minute=total % 60).strftime("%Y-%m-%dT%H:%M")
@@ -0,0 +1,108 @@
+"""
+Request Log Sampling
+
+Decides which API requests LoggingMiddleware persists to system_logs, so a
+polling client cannot swamp the table while warnings, errors and slow
+requests are never lost.
+
+DECISION ORDER:
+1. warning/error responses and requests slower than slow_ms are always kept
+2. per-endpoint sampling rate (longest matching path prefix, else default_rate)
+3. token bucket capping persisted rows per second (burst up to `burst`)
+
+Dropped rows are counted per route template (so /api/satellites/25544 and
+/api/satellites/7530 share one counter) and reason; take_summary() returns
+and resets those counters so the caller can write one periodic summary record.
+"""
+
+import random
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+
+ALWAYS_KEEP_LEVELS = ("warning", "error")
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+class LogSampler:
+    """Per-endpoint sampling plus a global rows/second cap for request logs."""
+
+    def __init__(self, endpoint_rates: Optional[Dict[str, float]] = None, default_rate: float = 1.0,
+                 slow_ms: float = 500.0, max_rows_per_second: float = 50.0, burst: float = 200.0,
+                 rng: Callable[[], float] = random.random):
+        self.default_rate = default_rate
+        self.slow_ms = slow_ms
+        # Longest prefix first so "/api/logs/export" wins over "/api/logs"
+        self._rates = sorted((endpoint_rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self._bucket = TokenBucket(max_rows_per_second, burst)
+        self._rng = rng
+        self._dropped: Dict[str, Counter] = {"sampled": Counter(), "rate_limited": Counter()}
+        self.kept = 0
+        self.dropped_total = 0
+
+    def rate_for(self, path: str) -> float:
+        for prefix, rate in self._rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def should_keep(self, path: str, level: str, duration_ms: float, route: Optional[str] = None) -> bool:
+        """Sample by `path` prefix; drops are counted under `route` (the route template, default `path`)."""
+        if level in ALWAYS_KEEP_LEVELS or duration_ms >= self.slow_ms:
+            self._bucket.take()  # counts toward the budget but is never refused
+            self.kept += 1
+            return True
+        rate = self.rate_for(path)
+        if rate < 1.0 and self._rng() >= rate:
+            return self._drop("sampled", route or path)
+        if not self._bucket.take():
+            return self._drop("rate_limited", route or path)
+        self.kept += 1
+        return True
+
+    def _drop(self, reason: str, route: str) -> bool:
+        self._dropped[reason][route] += 1
+        self.dropped_total += 1
+        return False
+
+    def take_summary(self) -> Optional[dict]:
+        """Dropped-row counters since the last call, or None if nothing was dropped."""
+        sampled, limited = self._dropped["sampled"], self._dropped["rate_limited"]
+        if not sampled and not limited:
+            return None
+        self._dropped = {"sampled": Counter(), "rate_limited": Counter()}
+        return {
+            "dropped": sum(sampled.values()) + sum(limited.values()),
+            "sampled": dict(sampled),
+            "rate_limited": dict(limited),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "kept": self.kept,
+            "dropped": self.dropped_total,
+            "default_rate": self.default_rate,
+            "endpoint_rates": dict(self._rates),
+            "slow_ms": self.slow_ms,
+            "max_rows_per_second": self._bucket.rate,
+            "burst": self._bucket.capacity,
+        }
@@ -0,0 +1,373 @@
+"""
+Time-Partitioned System Log Storage
+
+system_logs rows live in one table per time bucket (system_logs_pYYYYMMDDHH,
+LOG_PARTITION_HOURS wide) inside wa_map.db. Retention drops whole partitions
+instead of running DELETE scans, and reads fan out across the live partitions
+newest-first, stopping as soon as a page is full.
+
+IDS:
+- ids are assigned by the store (not AUTOINCREMENT) so they stay globally
+  increasing across partitions and keep (timestamp, id) keyset cursors valid
+- all inserts go through the single writer connection, which serializes them
+
+PRUNING:
+- a partition holds rows in [its start, start + partition_hours)
+- since/until and cursors skip partitions outside that range
+
+FULL-TEXT SEARCH:
+- each partition has an external-content FTS5 table ({partition}_fts) over
+  message and request_body, kept in sync by insert/delete triggers
+- dropping a partition drops its index, so retention prunes both together
+- search() ranks matches by bm25 across partitions and returns highlights
+
+The pre-partitioning system_logs table is migrated into partitions (and
+dropped) on first start.
+"""
+
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+
+PARTITION_PREFIX = "system_logs_p"
+LEGACY_TABLE = "system_logs"
+
+LOG_COLUMNS = ("id", "timestamp", "profile_id", "username", "level", "category", "endpoint",
+               "method", "message", "request_body", "response_status", "duration_ms")
+
+PARTITION_SCHEMA = """CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    profile_id INTEGER,
+    username TEXT DEFAULT 'anonymous',
+    level TEXT NOT NULL,
+    category TEXT,
+    endpoint TEXT,
+    method TEXT,
+    message TEXT NOT NULL,
+    request_body TEXT,
+    response_status INTEGER,
+    duration_ms REAL
+)"""
+
+PARTITION_FTS_SCHEMA = """CREATE VIRTUAL TABLE IF NOT EXISTS {name}_fts USING fts5(
+    message, request_body, content='{name}', content_rowid='id'
+)"""
+
+PARTITION_FTS_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS {name}_fts_ai AFTER INSERT ON {name} BEGIN
+        INSERT INTO {name}_fts(rowid, message, request_body) VALUES (new.id, new.message, new.request_body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS {name}_fts_ad AFTER DELETE ON {name} BEGIN
+        INSERT INTO {name}_fts({name}_fts, rowid, message, request_body)
+        VALUES ('delete', old.id, old.message, old.request_body);
+    END""",
+)
+
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+# Each composite index ends in timestamp (plus the implicit rowid) so filtered
+# keyset pages walk the index in order
+PARTITION_INDEXES = {
+    "ts": "timestamp",
+    "profile_ts": "profile_id, timestamp",
+    "level_ts": "level, timestamp",
+    "category_ts": "category, timestamp",
+}
+
+
+def build_log_filters(profile_id=None, level=None, category=None, since=None, until=None):
+    """Build the shared WHERE clause (without the keyword) and params for log queries."""
+    clauses, params = [], []
+    if profile_id is not None:
+        clauses.append("profile_id = ?")
+        params.append(profile_id)
+    if level:
+        clauses.append("level = ?")
+        params.append(level)
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if since:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        clauses.append("timestamp <= ?")
+        params.append(until)
+    return " AND ".join(clauses) or "1=1", params
+
+
+def _is_missing_table(error: sqlite3.OperationalError) -> bool:
+    return "no such table" in str(error)
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every term must match, `term*` is a prefix search."""
+    terms = []
+    for token in text.split():
+        prefix = token.endswith("*")
+        token = token.rstrip("*").replace('"', '""')
+        if token:
+            terms.append(f'"{token}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class PartitionedLogStore:
+    """Hourly (or partition_hours wide) system_logs partitions in one SQLite file."""
+
+    def __init__(self, partition_hours: int = 1):
+        if partition_hours < 1 or 24 % partition_hours:
+            raise ValueError("partition_hours must be a divisor of 24")
+        self.partition_hours = partition_hours
+        self._partitions: Tuple[str, ...] = ()  # sorted oldest-first, replaced atomically
+        self._next_id: Optional[int] = None
+        self._lock = threading.Lock()
+
+    # -- Naming -------------------------------------------------------------
+
+    def partition_for(self, timestamp: str) -> str:
+        """Partition table name for an ISO-8601 timestamp."""
+        hour = int(timestamp[11:13])
+        hour -= hour % self.partition_hours
+        return f"{PARTITION_PREFIX}{timestamp[0:4]}{timestamp[5:7]}{timestamp[8:10]}{hour:02d}"
+
+    @staticmethod
+    def partition_start(name: str) -> str:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d%H").isoformat()
+
+    def _ranges(self) -> List[Tuple[str, str, str]]:
+        """(name, start, end) for every partition, oldest first; end is exclusive."""
+        # Each partition covers exactly partition_hours, even with gaps before the next one
+        width = timedelta(hours=self.partition_hours)
+        ranges = []
+        for name in self._partitions:
+            start = datetime.fromisoformat(self.partition_start(name))
+            ranges.append((name, start.isoformat(), (start + width).isoformat()))
+        return ranges
+
+    def live_partitions(self, since: Optional[str] = None, until: Optional[str] = None,
+                        newest_first: bool = True) -> List[Tuple[str, str, str]]:
+        """Partitions that can hold rows with since <= timestamp <= until."""
+        ranges = [(n, s, e) for n, s, e in self._ranges()
+                  if (not since or e > since) and (not until or s <= until)]
+        return ranges[::-1] if newest_first else ranges
+
+    @property
+    def partitions(self) -> Tuple[str, ...]:
+        return self._partitions
+
+    # -- Schema -------------------------------------------------------------
+
+    def init(self, conn: sqlite3.Connection):
+        """Load the partition list and migrate a legacy system_logs table. Writer connection."""
+        self._reload(conn)
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (LEGACY_TABLE,)).fetchone()
+        if legacy:
+            self._migrate_legacy(conn)
+        for name in self._partitions:
+            self._ensure_fts(conn, name)
+        self._next_id = self._max_id(conn) + 1
+
+    def _reload(self, conn: sqlite3.Connection):
+        rows = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+            (PARTITION_PREFIX + "[0-9]" * 10,)).fetchall()
+        self._partitions = tuple(sorted(row[0] for row in rows))
+
+    def _ensure(self, conn: sqlite3.Connection, name: str):
+        # DDL runs even for cached names: IF NOT EXISTS is cheap, and it repairs the
+        # cache if a transaction that created the partition was rolled back
+        conn.execute(PARTITION_SCHEMA.format(name=name))
+        for suffix, columns in PARTITION_INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_{suffix} ON {name}({columns})")
+        self._ensure_fts(conn, name)
+        if name not in self._partitions:
+            self._partitions = tuple(sorted(self._partitions + (name,)))
+
+    def _ensure_fts(self, conn: sqlite3.Connection, name: str):
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                              (f"{name}_fts",)).fetchone()
+        conn.execute(PARTITION_FTS_SCHEMA.format(name=name))
+        for trigger in PARTITION_FTS_TRIGGERS:
+            conn.execute(trigger.format(name=name))
+        if not exists:
+            # Index rows that predate the FTS table (no-op for a brand-new partition)
+            conn.execute(f"INSERT INTO {name}_fts({name}_fts) VALUES ('rebuild')")
+
+    def _drop(self, conn: sqlite3.Connection, name: str):
+        conn.execute(f"DROP TABLE IF EXISTS {name}_fts")
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+        self._partitions = tuple(n for n in self._partitions if n != name)
+
+    def _max_id(self, conn: sqlite3.Connection) -> int:
+        # MAX(id) is a rowid lookup; migrated rows need not be id-ordered by time,
+        # so check every partition rather than only the newest
+        return max((conn.execute(f"SELECT MAX(id) FROM {name}").fetchone()[0] or 0
+                    for name in self._partitions), default=0)
+
+    def _migrate_legacy(self, conn: sqlite3.Connection):
+        hours = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT substr(timestamp, 1, 13) FROM {LEGACY_TABLE}").fetchall()]
+        for hour in hours:
+            if not hour or len(hour) < 13:
+                continue
+            name = self.partition_for(hour)
+            self._ensure(conn, name)
+            # Prefix range on the hour ("YYYY-MM-DDTHH") so the timestamp index is used
+            conn.execute(f"INSERT OR IGNORE INTO {name} SELECT {', '.join(LOG_COLUMNS)} FROM {LEGACY_TABLE} "
+                         "WHERE timestamp >= ? AND timestamp < ?", (hour, hour + "\x7f"))
+        conn.execute(f"DROP TABLE {LEGACY_TABLE}")
+
+    # -- Writes (writer connection) -----------------------------------------
+
+    def insert(self, conn: sqlite3.Connection, rows: Sequence[tuple]):
+        """Insert rows of LOG_COLUMNS[1:] values, assigning ids and routing to partitions."""
+        with self._lock:
+            if self._next_id is None:
+                self._next_id = self._max_id(conn) + 1
+            groups = defaultdict(list)
+            for row in rows:
+                groups[self.partition_for(row[0])].append((self._next_id,) + tuple(row))
+                self._next_id += 1
+        placeholders = ", ".join("?" * len(LOG_COLUMNS))
+        for name, group in groups.items():
+            self._ensure(conn, name)
+            conn.executemany(f"INSERT INTO {name} ({', '.join(LOG_COLUMNS)}) VALUES ({placeholders})", group)
+
+    def drop_expired(self, conn: sqlite3.Connection, cutoff: str) -> int:
+        """Drop every partition whose whole range is older than cutoff. Returns rows removed."""
+        removed = 0
+        for name, _, end in self.live_partitions(newest_first=False):
+            if end > cutoff:
+                break
+            removed += conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            self._drop(conn, name)
+        return removed
+
+    def delete_before(self, conn: sqlite3.Connection, before: str) -> int:
+        """Remove rows with timestamp < before: whole-partition drops plus one bounded DELETE."""
+        removed = self.drop_expired(conn, before)
+        for name, start, _ in self.live_partitions(newest_first=False):
+            if start >= before:
+                break
+            removed += conn.execute(f"DELETE FROM {name} WHERE timestamp < ?", (before,)).rowcount
+        return removed
+
+    def delete_all(self, conn: sqlite3.Connection) -> int:
+        removed = 0
+        for name in self._partitions:
+            removed += conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            self._drop(conn, name)
+        return removed
+
+    # -- Reads (any connection) ---------------------------------------------
+
+    def page(self, conn: sqlite3.Connection, where: str, params: list, limit: int,
+             position: Optional[Tuple[str, int]] = None, offset: int = 0,
+             since: Optional[str] = None, until: Optional[str] = None) -> List[sqlite3.Row]:
+        """Newest-first rows after the keyset position; returns up to limit + 1 rows."""
+        wanted = limit + 1 + (0 if position else offset)
+        rows: List[sqlite3.Row] = []
+        for name, start, _ in self.live_partitions(since, until):
+            if position and start > position[0]:
+                continue
+            query = f"SELECT * FROM {name} WHERE {where}"
+            query_params = list(params)
+            if position:
+                query += " AND (timestamp, id) < (?, ?)"
+                query_params.extend(position)
+            query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            query_params.append(wanted - len(rows))
+            try:
+                rows.extend(conn.execute(query, query_params).fetchall())
+            except sqlite3.OperationalError as e:
+                if not _is_missing_table(e):  # dropped by retention mid-query
+                    raise
+            if len(rows) >= wanted:
+                break
+        return rows if position else rows[offset:]
+
+    def count(self, conn: sqlite3.Connection, where: str, params: list,
+              since: Optional[str] = None, until: Optional[str] = None) -> int:
+        total = 0
+        for name, _, _ in self.live_partitions(since, until):
+            try:
+                total += conn.execute(f"SELECT COUNT(*) FROM {name} WHERE {where}", params).fetchone()[0]
+            except sqlite3.OperationalError as e:
+                if not _is_missing_table(e):
+                    raise
+        return total
+
+    def iter_chunks(self, conn: sqlite3.Connection, where: str, params: list, chunk_rows: int,
+                    since: Optional[str] = None, until: Optional[str] = None) -> Iterator[List[sqlite3.Row]]:
+        """Oldest-first rows across partitions, chunk_rows at a time."""
+        for name, _, _ in self.live_partitions(since, until, newest_first=False):
+            try:
+                cursor = conn.execute(f"SELECT * FROM {name} WHERE {where} ORDER BY timestamp, id", params)
+            except sqlite3.OperationalError as e:
+                if not _is_missing_table(e):
+                    raise
+                continue
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+
+    def search(self, conn: sqlite3.Connection, text: str, where: str, params: list, limit: int,
+               offset: int = 0, since: Optional[str] = None, until: Optional[str] = None) -> List[dict]:
+        """Best-ranked matches for `text` in message/request_body across live partitions.
+
+        bm25 scores come from per-partition indexes, so ranking across
+        partitions is approximate; within a partition it is exact.
+        """
+        match = fts_query(text)
+        if not match:
+            return []
+        wanted = limit + offset
+        results = []
+        for name, _, _ in self.live_partitions(since, until):
+            query = (f"SELECT {name}.*, bm25({name}_fts) AS rank, "
+                     f"highlight({name}_fts, 0, ?, ?) AS message_highlight, "
+                     f"snippet({name}_fts, 1, ?, ?, '...', 16) AS request_body_snippet "
+                     f"FROM {name}_fts JOIN {name} ON {name}.id = {name}_fts.rowid "
+                     f"WHERE {name}_fts MATCH ? AND {where} ORDER BY rank LIMIT ?")
+            query_params = [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, match,
+                            *params, wanted]
+            try:
+                results.extend(dict(row) for row in conn.execute(query, query_params).fetchall())
+            except sqlite3.OperationalError as e:
+                if not _is_missing_table(e):
+                    raise
+        results.sort(key=lambda row: (row["rank"], row["timestamp"]))
+        return results[offset:wanted]
+
+    def count_matches(self, conn: sqlite3.Connection, text: str, where: str, params: list,
+                      since: Optional[str] = None, until: Optional[str] = None) -> int:
+        match = fts_query(text)
+        if not match:
+            return 0
+        total = 0
+        for name, _, _ in self.live_partitions(since, until):
+            try:
+                total += conn.execute(
+                    f"SELECT COUNT(*) FROM {name}_fts JOIN {name} ON {name}.id = {name}_fts.rowid "
+                    f"WHERE {name}_fts MATCH ? AND {where}", [match, *params]).fetchone()[0]
+            except sqlite3.OperationalError as e:
+                if not _is_missing_table(e):
+                    raise
+        return total
+
+    def stats(self) -> dict:
+        ranges = self._ranges()
+        return {
+            "partition_hours": self.partition_hours,
+            "partitions": len(ranges),
+            "oldest": ranges[0][1] if ranges else None,
+            "newest": ranges[-1][1] if ranges else None,
+        }
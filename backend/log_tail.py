@@ -0,0 +1,107 @@
+"""
+Live Log Tail
+
+Fixed-size in-process ring buffer of recent log events, fed by log_event()
+alongside the log writer. The /ws/logs WebSocket streams from here, so live
+tailing costs no SQLite reads.
+
+SEQUENCE NUMBERS:
+- every appended event gets the next integer seq (per process, starting at 1)
+- a client resumes by sending the last seq it saw; entries still in the
+  buffer are replayed, and `missed` reports how many fell out of it
+- a resume seq ahead of the buffer (server restarted) replays everything held
+
+Filters (level, category, profile_id) are applied server-side per client.
+"""
+
+import asyncio
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+
+
+class LogFilter:
+    """Server-side match on the same fields as build_log_filters (minus the time range)."""
+
+    __slots__ = ("levels", "category", "profile_id")
+
+    def __init__(self, level: Optional[str] = None, category: Optional[str] = None,
+                 profile_id: Optional[int] = None):
+        # level accepts a comma-separated list, e.g. "warning,error"
+        self.levels = frozenset(l.strip() for l in level.split(",") if l.strip()) if level else None
+        self.category = category or None
+        self.profile_id = profile_id
+
+    def matches(self, entry: dict) -> bool:
+        if self.levels is not None and entry["level"] not in self.levels:
+            return False
+        if self.category is not None and entry["category"] != self.category:
+            return False
+        if self.profile_id is not None and entry["profile_id"] != self.profile_id:
+            return False
+        return True
+
+
+class LogTail:
+    """Ring buffer of the last `capacity` log events with sequence numbers."""
+
+    def __init__(self, capacity: int = 2000):
+        self.capacity = capacity
+        self._entries: Deque[Tuple[int, dict]] = deque(maxlen=capacity)
+        self._seq = 0
+        self._waiters: Set[asyncio.Event] = set()
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest seq still buffered (last_seq + 1 when empty)."""
+        return self._entries[0][0] if self._entries else self._seq + 1
+
+    def append(self, entry: dict) -> int:
+        self._seq += 1
+        entry["seq"] = self._seq
+        self._entries.append((self._seq, entry))
+        for waiter in self._waiters:
+            waiter.set()
+        return self._seq
+
+    def since(self, after: int, log_filter: Optional[LogFilter] = None,
+              limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        """Buffered entries with seq > after, plus how many were already evicted."""
+        if after > self._seq:
+            after = 0
+        missed = max(0, self.first_seq - after - 1) if after else 0
+        entries = []
+        # Entries are seq-ordered, so walk back from the newest until we pass `after`
+        for seq, entry in reversed(self._entries):
+            if seq <= after or (limit is not None and len(entries) >= limit):
+                break
+            if log_filter is None or log_filter.matches(entry):
+                entries.append(entry)
+        entries.reverse()
+        return entries, missed
+
+    async def wait(self, after: int, timeout: float) -> bool:
+        """Block until an entry newer than `after` exists; False on timeout."""
+        if self._seq > after:
+            return True
+        waiter = asyncio.Event()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.discard(waiter)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "buffered": len(self._entries),
+            "first_seq": self.first_seq,
+            "last_seq": self._seq,
+            "waiting_clients": len(self._waiters),
+        }
@@ -0,0 +1,137 @@
+"""
+Batched System Log Writer
+
+Queues system_logs rows in memory and flushes them to SQLite from a single
+background task using batched executemany transactions, so request handlers
+never wait on a per-row connect/commit/fsync.
+
+FLUSH TRIGGERS:
+- batch_size rows are queued
+- flush_interval seconds have passed since the last flush
+- stop() is called (everything still queued is written before it returns)
+
+OVERFLOW POLICY (queue is bounded by max_queue_size):
+- drop_oldest: discard the oldest queued row to admit the new one (default)
+- block: producers await free queue space (backpressure on the caller)
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+import structlog
+
+
+slog = structlog.get_logger("wa_map")
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_BLOCK = "block"
+
+
+class LogWriter:
+    """Bounded in-memory queue of log rows drained by one flush task."""
+
+    def __init__(self, write_batch: Callable[[List[tuple]], None],
+                 max_queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.5,
+                 overflow_policy: str = OVERFLOW_DROP_OLDEST,
+                 run_blocking: Callable[..., Awaitable] = asyncio.to_thread):
+        if overflow_policy not in (OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self._write_batch = write_batch
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self._run_blocking = run_blocking
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the flush task. Must be called from the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush every queued row, then stop the flush task."""
+        if not self.running:
+            return
+        self._stopping = True  # from here on put() writes through
+        self._wake.set()
+        await self._task
+        # Rows a put() blocked on a full queue added after the task's last drain
+        queue, self._queue = self._queue, None
+        leftover = [queue.get_nowait() for _ in range(queue.qsize())]
+        if leftover:
+            await self._run_blocking(self._write_rows, leftover)
+        self._task = None
+
+    async def put(self, row: tuple):
+        """Queue a row for the next batch, applying the overflow policy."""
+        if self._queue is None or self._stopping:
+            # Writer not running (before startup / stopping / after shutdown): write through, off the event loop
+            await self._run_blocking(self._write_rows, [row])
+            return
+        if self.overflow_policy == OVERFLOW_DROP_OLDEST and self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        await self._queue.put(row)  # only suspends under the block policy
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "overflow_policy": self.overflow_policy,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    async def _run(self):
+        while True:
+            if self._queue.qsize() < self.batch_size and not self._stopping:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._drain()
+            if batch:
+                await self._run_blocking(self._write_rows, batch)
+            elif self._stopping:
+                return
+
+    def _drain(self) -> List[tuple]:
+        batch = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    def _write_rows(self, rows: List[tuple]):
+        try:
+            self._write_batch(rows)
+            self.written += len(rows)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(rows)
+            slog.error("Log batch write failed", category="SYSTEM", rows=len(rows), error=str(e))
@@ -14,28 +14,52 @@ MOBILE COMPATIBILITY:
 - Adaptive update rates based on client capability
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 import asyncio
+import base64
+import codecs
+import csv
+import io
 import json
+import math
+import os
 import sqlite3
 import hashlib
 import time
+import zlib
 import structlog
 from pathlib import Path
 
+from catalog import SatelliteCatalog, make_record
+from database import db_executor, db_pool, run_db
+from ephemeris_cache import EphemerisCache
+from ephemeris_tables import EphemerisTables
+from log_rollups import LogRollups
+from log_sampling import LogSampler
+from log_store import LOG_COLUMNS, PartitionedLogStore, build_log_filters
+from log_tail import LogFilter, LogTail
+from log_writer import LogWriter, OVERFLOW_DROP_OLDEST
+from metrics import RequestMetrics
+from position_grid import GRID_MEDIA_TYPE, pack_position_grid
+from propagation import FRAMES as POSITION_FRAMES, PropagationEngine
+from propagation_pool import PropagationPool
+from delta_frames import PositionSnapshot
+from realtime import ConnectionManager, FrameGroup, RealtimeBroadcaster, dumps, watchlist_norad_ids
+from tle_parser import FORMATS as CATALOG_FORMATS, detect_format, make_parser
+
 
 # Configure structlog for structured logging
 structlog.configure(
     processors=[
         structlog.stdlib.add_log_level,
         structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.format_exc_info,
         structlog.processors.JSONRenderer()
     ],
     wrapper_class=structlog.stdlib.BoundLogger,
@@ -50,28 +74,146 @@ slog = structlog.get_logger("wa_map")
 # Log retention period (48 hours)
 LOG_RETENTION_HOURS = 48
 
+# Width of each system_logs partition table; retention drops whole partitions
+LOG_PARTITION_HOURS = 1
+
+# Batched log writer: queue bound, rows per transaction, max seconds between flushes,
+# and what to do when the queue is full ("drop_oldest" or "block")
+LOG_QUEUE_MAX_SIZE = 10000
+LOG_BATCH_SIZE = 500
+LOG_FLUSH_INTERVAL_SECONDS = 0.5
+LOG_OVERFLOW_POLICY = OVERFLOW_DROP_OLDEST
+
+# Largest page /api/logs returns (search results included)
+LOG_PAGE_MAX_LIMIT = 1000
+
+# Rows fetched per round trip when streaming /api/logs/export, and how many exports may hold a
+# read connection at once (a slow download keeps its connection until it finishes)
+LOG_EXPORT_CHUNK_ROWS = 1000
+LOG_EXPORT_MAX_CONCURRENT = 2
+
+# Request log sampling: keep-fraction per path prefix (unlisted paths keep everything),
+# requests at or above LOG_SLOW_REQUEST_MS are always kept (as are warnings/errors),
+# and a token bucket caps persisted request rows per second
+LOG_SAMPLING_RATES = {
+    "/api/satellites/positions": 0.05,
+    "/api/time/now": 0.1,
+}
+LOG_SLOW_REQUEST_MS = 500
+LOG_MAX_ROWS_PER_SECOND = 50
+LOG_BURST_ROWS = 200
+LOG_SAMPLING_SUMMARY_SECONDS = 60
+
+# Request body bytes captured per logged POST/PUT/PATCH
+LOG_BODY_MAX_BYTES = 1000
+
+# Live tail ring buffer (/ws/logs): recent events held in memory, heartbeat when idle
+LOG_TAIL_CAPACITY = 2000
+LOG_TAIL_BACKLOG = 100
+LOG_TAIL_HEARTBEAT_SECONDS = 15
+
+# Catalog ingestion: records per upsert transaction, bytes sniffed for format=auto
+INGEST_BATCH_SIZE = 5000
+INGEST_DETECT_BYTES = 1024
+
+# Worker processes for large propagation requests (full-catalog time grids); 1 keeps it in-process
+PROPAGATION_WORKERS = os.cpu_count() or 1
+
+# How single-time positions (/api/satellites/positions, /ws/realtime) are computed:
+# "sgp4" directly, "cache" through the shared ephemeris cache, or "chebyshev" from fitted tables
+EPHEMERIS_MODE = "cache"
+
+# Ephemeris cache: bucket width, memory budget, bucket lifetime, and Hermite interpolation inside a bucket
+EPHEMERIS_BUCKET_SECONDS = 1.0
+EPHEMERIS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+EPHEMERIS_CACHE_TTL_SECONDS = 600
+EPHEMERIS_INTERPOLATE = True
+
+# Chebyshev tables: window half-width, segment length and degree, worst fit served instead of SGP4,
+# and how close to the window end the current time triggers the next (background) build
+EPHEMERIS_TABLE_WINDOW_HOURS = 2
+EPHEMERIS_TABLE_SEGMENT_MINUTES = 30
+EPHEMERIS_TABLE_DEGREE = 12
+EPHEMERIS_TABLE_MAX_ERROR_KM = 0.001
+EPHEMERIS_TABLE_REFRESH_MINUTES = 30
+
+# /ws/realtime rates in Hz: the range a client may negotiate or be adapted within, and the starting
+# rate for clients that don't negotiate. Ticks run at the max rate; each frame is shared by the due clients
+REALTIME_MIN_RATE_HZ = 1.0
+REALTIME_MAX_RATE_HZ = 5.0
+REALTIME_DEFAULT_RATE_HZ = 1.0
+
+# Delta-encoded /ws/realtime clients get a full keyframe at least this often
+REALTIME_KEYFRAME_SECONDS = 10.0
+
+# /ws/realtime backpressure: outbound messages queued per client (position frames are
+# latest-wins, so one slot each), and how long one send may block before the client is dropped
+REALTIME_MAX_QUEUE = 8
+REALTIME_SEND_TIMEOUT_SECONDS = 10.0
+
+# Packed position grids (/api/satellites/positions/grid): defaults match calculateGroundTrack's
+# 20 s step. A request may not exceed GRID_MAX_TIMES times or GRID_MAX_STATES satellite-time states
+# (~1 s and ~350 MB peak each), and at most GRID_MAX_CONCURRENT grids are built at once
+GRID_DEFAULT_STEP_SECONDS = 20.0
+GRID_DEFAULT_SPAN_MINUTES = 90
+GRID_MAX_TIMES = 10_000
+GRID_MAX_STATES = 2_000_000
+GRID_MAX_CONCURRENT = 2
+
+
+log_store = PartitionedLogStore(partition_hours=LOG_PARTITION_HOURS)
+log_rollups = LogRollups()
+log_tail = LogTail(capacity=LOG_TAIL_CAPACITY)
+
+satellite_catalog = SatelliteCatalog()
+propagation_pool = PropagationPool(PROPAGATION_WORKERS) if PROPAGATION_WORKERS > 1 else None
+ephemeris_cache = EphemerisCache(bucket_seconds=EPHEMERIS_BUCKET_SECONDS, max_bytes=EPHEMERIS_CACHE_MAX_BYTES,
+                                 ttl_seconds=EPHEMERIS_CACHE_TTL_SECONDS, interpolate=EPHEMERIS_INTERPOLATE)
+satellite_catalog.add_listener(ephemeris_cache.invalidate)
+propagation_engine = PropagationEngine(satellite_catalog, pool=propagation_pool,
+                                       cache=ephemeris_cache if EPHEMERIS_MODE == "cache" else None)
+ephemeris_tables = EphemerisTables(satellite_catalog, propagation_engine.propagate,
+                                   window_hours=EPHEMERIS_TABLE_WINDOW_HOURS,
+                                   segment_minutes=EPHEMERIS_TABLE_SEGMENT_MINUTES,
+                                   degree=EPHEMERIS_TABLE_DEGREE, max_error_km=EPHEMERIS_TABLE_MAX_ERROR_KM,
+                                   refresh_margin_minutes=EPHEMERIS_TABLE_REFRESH_MINUTES)
+if EPHEMERIS_MODE == "chebyshev":
+    satellite_catalog.add_listener(ephemeris_tables.invalidate)
+    propagation_engine.tables = ephemeris_tables
+
+request_metrics = RequestMetrics()
+
+log_sampler = LogSampler(
+    endpoint_rates=LOG_SAMPLING_RATES,
+    slow_ms=LOG_SLOW_REQUEST_MS,
+    max_rows_per_second=LOG_MAX_ROWS_PER_SECOND,
+    burst=LOG_BURST_ROWS,
+)
+
 
-DB_PATH = Path(__file__).parent / "wa_map.db"
+def write_log_batch(rows):
+    """Insert a batch of system_logs rows and update the minute rollups, in one transaction."""
+    with db_pool.writer() as conn:
+        log_store.insert(conn, rows)
+        log_rollups.write(conn, rows)
 
 
-def get_db_connection():
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+log_writer = LogWriter(
+    write_log_batch,
+    max_queue_size=LOG_QUEUE_MAX_SIZE,
+    batch_size=LOG_BATCH_SIZE,
+    flush_interval=LOG_FLUSH_INTERVAL_SECONDS,
+    overflow_policy=LOG_OVERFLOW_POLICY,
+    run_blocking=run_db,
+)
 
 
-def log_event(level: str, category: str, message: str, profile_id = None,
-              username = None, endpoint = None,
-              method = None, request_body = None,
-              response_status = None, duration_ms = None):
-    """Log an event to the system_logs table with profile context."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO system_logs (timestamp, profile_id, username, level, category,
-                                 endpoint, method, message, request_body, response_status, duration_ms)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+async def log_event(level: str, category: str, message: str, profile_id = None,
+                    username = None, endpoint = None,
+                    method = None, request_body = None,
+                    response_status = None, duration_ms = None):
+    """Queue an event for the system_logs table with profile context and publish it to the live tail."""
+    row = (
         datetime.utcnow().isoformat(),
         profile_id,
         username or 'anonymous',
@@ -83,9 +225,9 @@ def log_event(level: str, category: str, message: str, profile_id = None,
         request_body,
         response_status,
         duration_ms
-    ))
-    conn.commit()
-    conn.close()
+    )
+    log_tail.append(dict(zip(LOG_COLUMNS[1:], row)))
+    await log_writer.put(row)
 
     # Also log to structlog for console output
     slog.info(message, level=level, category=category, profile_id=profile_id,
@@ -94,58 +236,39 @@ def log_event(level: str, category: str, message: str, profile_id = None,
 
 
 def cleanup_old_logs():
-    """Delete logs older than LOG_RETENTION_HOURS (48 hours)."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Drop log partitions that lie entirely outside LOG_RETENTION_HOURS (48 hours)."""
     cutoff = (datetime.utcnow() - timedelta(hours=LOG_RETENTION_HOURS)).isoformat()
-    cursor.execute("DELETE FROM system_logs WHERE timestamp < ?", (cutoff,))
-    deleted = cursor.rowcount
-    conn.commit()
-    conn.close()
+    with db_pool.writer() as conn:
+        deleted = log_store.drop_expired(conn, cutoff)
+        log_rollups.prune(conn, cutoff)
     if deleted > 0:
         slog.info(f"Cleaned up {deleted} old log entries", category="SYSTEM", deleted_count=deleted)
     return deleted
 
 
 def init_database():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""CREATE TABLE IF NOT EXISTS profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, display_name TEXT, role TEXT DEFAULT 'user', created_at TEXT DEFAULT CURRENT_TIMESTAMP)""")
-    cursor.execute("""CREATE TABLE IF NOT EXISTS profile_settings (profile_id INTEGER PRIMARY KEY, settings_json TEXT DEFAULT '{}', updated_at TEXT DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY (profile_id) REFERENCES profiles(id) ON DELETE CASCADE)""")
-    cursor.execute("""CREATE TABLE IF NOT EXISTS roles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, permissions TEXT DEFAULT '[]', description TEXT)""")
-
-    # Create system_logs table for 48-hour log retention
-    cursor.execute("""CREATE TABLE IF NOT EXISTS system_logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp TEXT NOT NULL,
-        profile_id INTEGER,
-        username TEXT DEFAULT 'anonymous',
-        level TEXT NOT NULL,
-        category TEXT,
-        endpoint TEXT,
-        method TEXT,
-        message TEXT NOT NULL,
-        request_body TEXT,
-        response_status INTEGER,
-        duration_ms REAL,
-        FOREIGN KEY (profile_id) REFERENCES profiles(id) ON DELETE SET NULL
-    )""")
-
-    # Create index for efficient cleanup and queries
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs(timestamp)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_profile_id ON system_logs(profile_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_level ON system_logs(level)")
-
-    cursor.execute("""INSERT OR IGNORE INTO roles (name, permissions, description) VALUES ('admin', '["read", "write", "delete", "admin"]', 'Full system access'), ('user', '["read", "write"]', 'Standard user access'), ('viewer', '["read"]', 'Read-only access')""")
-    cursor.execute("SELECT COUNT(*) FROM profiles")
-    if cursor.fetchone()[0] == 0:
-        default_hash = hashlib.sha256("default".encode()).hexdigest()
-        cursor.execute("INSERT INTO profiles (username, password_hash, display_name, role) VALUES ('default', ?, 'Default User', 'user')", (default_hash,))
-        profile_id = cursor.lastrowid
-        default_settings = json.dumps({"mapCenter": [0, 0], "mapZoom": 2, "selectedSatellites": [], "selectedSensors": [], "watchlists": [], "uiPreferences": {"panelExpanded": True, "activeSection": "satellites", "theme": "dark"}, "timeSettings": {"tailMinutes": 45, "headMinutes": 0, "glowEnabled": True, "glowIntensity": 1.0, "apexTickEnabled": True}})
-        cursor.execute("INSERT INTO profile_settings (profile_id, settings_json) VALUES (?, ?)", (profile_id, default_settings))
-    conn.commit()
-    conn.close()
+    with db_pool.writer() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""CREATE TABLE IF NOT EXISTS profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, display_name TEXT, role TEXT DEFAULT 'user', created_at TEXT DEFAULT CURRENT_TIMESTAMP)""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS profile_settings (profile_id INTEGER PRIMARY KEY, settings_json TEXT DEFAULT '{}', updated_at TEXT DEFAULT CURRENT_TIMESTAMP, FOREIGN KEY (profile_id) REFERENCES profiles(id) ON DELETE CASCADE)""")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS roles (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, permissions TEXT DEFAULT '[]', description TEXT)""")
+
+        # system_logs lives in time partitions (migrates the old single table)
+        log_store.init(conn)
+        # Minute rollups; a newly created table is backfilled from the partitions
+        log_rollups.init(conn, ([tuple(row)[1:] for row in chunk]
+                                for chunk in log_store.iter_chunks(conn, "1=1", [], LOG_EXPORT_CHUNK_ROWS)))
+        # Satellite catalog is served from memory; load the persisted records
+        satellite_catalog.init(conn)
+
+        cursor.execute("""INSERT OR IGNORE INTO roles (name, permissions, description) VALUES ('admin', '["read", "write", "delete", "admin"]', 'Full system access'), ('user', '["read", "write"]', 'Standard user access'), ('viewer', '["read"]', 'Read-only access')""")
+        cursor.execute("SELECT COUNT(*) FROM profiles")
+        if cursor.fetchone()[0] == 0:
+            default_hash = hashlib.sha256("default".encode()).hexdigest()
+            cursor.execute("INSERT INTO profiles (username, password_hash, display_name, role) VALUES ('default', ?, 'Default User', 'user')", (default_hash,))
+            profile_id = cursor.lastrowid
+            default_settings = json.dumps({"mapCenter": [0, 0], "mapZoom": 2, "selectedSatellites": [], "selectedSensors": [], "watchlists": [], "uiPreferences": {"panelExpanded": True, "activeSection": "satellites", "theme": "dark"}, "timeSettings": {"tailMinutes": 45, "headMinutes": 0, "glowEnabled": True, "glowIntensity": 1.0, "apexTickEnabled": True}})
+            cursor.execute("INSERT INTO profile_settings (profile_id, settings_json) VALUES (?, ?)", (profile_id, default_settings))
     print("Database initialized successfully")
 
 
@@ -166,56 +289,99 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
+class SatelliteTLE(BaseModel):
+    name: str
+    tleLine1: str
+    tleLine2: str
 
-# Logging middleware to capture all requests
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-
-        # Extract profile info from header (set by frontend after login)
-        profile_id = request.headers.get("X-Profile-ID")
-        username = request.headers.get("X-Username", "anonymous")
-
-        # Get request body for POST/PUT (limit size for logging)
-        request_body = None
-        if request.method in ["POST", "PUT", "PATCH"]:
-            try:
-                body = await request.body()
-                request_body = body.decode("utf-8")[:1000] if body else None
-            except:
-                pass
-
-        # Process request
-        response = await call_next(request)
-
-        # Calculate duration
-        duration_ms = (time.time() - start_time) * 1000
 
+# Logging middleware to capture all requests
+class LoggingMiddleware:
+    """Pure ASGI request logger.
+
+    Times each HTTP request end-to-end (including streamed bodies) with
+    perf_counter_ns and tees at most LOG_BODY_MAX_BYTES of POST/PUT/PATCH
+    bodies as they are received, without buffering the body or wrapping the
+    response. Every request feeds request_metrics; sampled ones are logged.
+    WebSocket and lifespan scopes pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_ns = time.perf_counter_ns()
+        method = scope["method"]
+        status_code = 500
+        body_prefix = bytearray()
+
+        async def receive_tee():
+            message = await receive()
+            if message["type"] == "http.request" and len(body_prefix) < LOG_BODY_MAX_BYTES:
+                body_prefix.extend(message.get("body", b"")[:LOG_BODY_MAX_BYTES - len(body_prefix)])
+            return message
+
+        async def send_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        capture_body = method in ("POST", "PUT", "PATCH")
+        try:
+            await self.app(scope, receive_tee if capture_body else receive, send_status)
+        finally:
+            duration_ms = (time.perf_counter_ns() - start_ns) / 1e6
+            # Route template (not raw path) keeps metric cardinality bounded
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            request_metrics.observe(method, route, status_code, duration_ms)
+            await self._log(scope, method, route, status_code, bytes(body_prefix), duration_ms)
+
+    async def _log(self, scope, method, route, status_code, body, duration_ms):
         # Determine log level based on status code
-        if response.status_code >= 500:
+        if status_code >= 500:
             level = "error"
-        elif response.status_code >= 400:
+        elif status_code >= 400:
             level = "warning"
         else:
             level = "info"
 
         # Skip logging for static files and health checks to reduce noise
-        path = request.url.path
-        if not path.startswith("/static") and path != "/api/health":
-            log_event(
-                level=level,
-                category="API",
-                message=f"{request.method} {path}",
-                profile_id=int(profile_id) if profile_id and profile_id.isdigit() else None,
-                username=username,
-                endpoint=path,
-                method=request.method,
-                request_body=request_body,
-                response_status=response.status_code,
-                duration_ms=round(duration_ms, 2)
-            )
-
-        return response
+        path = scope["path"]
+        if path.startswith("/static") or path == "/api/health":
+            return
+
+        # Extract profile info from headers (set by frontend after login)
+        profile_id, username = None, "anonymous"
+        for name, value in scope["headers"]:
+            if name == b"x-profile-id":
+                profile_id = value.decode("latin-1")
+            elif name == b"x-username":
+                username = value.decode("latin-1")
+        profile_id = int(profile_id) if profile_id and profile_id.isdigit() else None
+
+        # Rollups count every request; only then does the sampler thin out high-volume endpoints
+        log_rollups.observe(datetime.utcnow().isoformat(), route, level, "API", profile_id,
+                            status_code, round(duration_ms, 2))
+        if not log_sampler.should_keep(path, level, duration_ms, route):
+            return
+
+        await log_event(
+            level=level,
+            category="API",
+            message=f"{method} {path}",
+            profile_id=profile_id,
+            username=username,
+            endpoint=path,
+            method=method,
+            request_body=body.decode("utf-8", errors="ignore") or None,
+            response_status=status_code,
+            duration_ms=round(duration_ms, 2)
+        )
 
 
 app = FastAPI(title="Satellite Visualization API", description="Real-time satellite tracking and orbital mechanics", version="1.0.0")
@@ -234,15 +400,45 @@ async def periodic_log_cleanup():
     """Run log cleanup every hour."""
     while True:
         await asyncio.sleep(3600)  # 1 hour
-        cleanup_old_logs()
+        await run_db(cleanup_old_logs)
+
+
+async def write_sampling_summary():
+    """Persist one record counting the request rows the sampler dropped."""
+    summary = log_sampler.take_summary()
+    if summary:
+        await log_event("info", "SYSTEM",
+                        f"Log sampling dropped {summary['dropped']} request rows",
+                        endpoint="/", method="SAMPLING", request_body=json.dumps(summary))
+
+
+async def periodic_sampling_summary():
+    """Write the dropped-row summary every LOG_SAMPLING_SUMMARY_SECONDS."""
+    while True:
+        await asyncio.sleep(LOG_SAMPLING_SUMMARY_SECONDS)
+        await write_sampling_summary()
 
 
 @app.on_event("startup")
 async def startup_event():
-    init_database()
-    cleanup_old_logs()  # Clean up old logs on startup
+    await run_db(init_database)
+    await run_db(cleanup_old_logs)  # Clean up old logs on startup
     asyncio.create_task(periodic_log_cleanup())  # Start periodic cleanup
-    log_event("info", "SYSTEM", "Server started", endpoint="/", method="STARTUP")
+    asyncio.create_task(periodic_sampling_summary())
+    log_writer.start()
+    realtime_broadcaster.start()
+    await log_event("info", "SYSTEM", "Server started", endpoint="/", method="STARTUP")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await write_sampling_summary()
+    await log_event("info", "SYSTEM", "Server stopping", endpoint="/", method="SHUTDOWN")
+    await realtime_broadcaster.stop()
+    await log_writer.stop()  # Flush queued log rows before exit
+    if propagation_pool is not None:
+        await asyncio.to_thread(propagation_pool.close)
+    await run_db(db_pool.close)
 
 @app.get("/", response_class=HTMLResponse)
 async def serve_app():
@@ -260,140 +456,264 @@ async def get_current_time():
     return {"utc": datetime.utcnow().isoformat(), "unix": datetime.utcnow().timestamp()}
 
 
+def encode_log_cursor(timestamp: str, log_id: int) -> str:
+    """Opaque keyset cursor for the (timestamp, id) position of the last returned row."""
+    raw = json.dumps([timestamp, log_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_log_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, log_id = json.loads(raw)
+        return str(timestamp), int(log_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 # System logs endpoint
 @app.get("/api/logs")
 async def get_logs(
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1, le=LOG_PAGE_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
     profile_id: Optional[int] = None,
     level: Optional[str] = None,
     category: Optional[str] = None,
     since: Optional[str] = None,
-    until: Optional[str] = None
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    exact_count: bool = False,
+    q: Optional[str] = None
 ):
-    """Query system logs with optional filters. Logs are retained for 48 hours."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM system_logs WHERE 1=1"
-    params = []
-
-    if profile_id is not None:
-        query += " AND profile_id = ?"
-        params.append(profile_id)
-    if level:
-        query += " AND level = ?"
-        params.append(level)
-    if category:
-        query += " AND category = ?"
-        params.append(category)
-    if since:
-        query += " AND timestamp >= ?"
-        params.append(since)
-    if until:
-        query += " AND timestamp <= ?"
-        params.append(until)
-
-    query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
-
-    cursor.execute(query, params)
-    logs = [dict(row) for row in cursor.fetchall()]
-
-    # Get total count
-    count_query = "SELECT COUNT(*) FROM system_logs WHERE 1=1"
-    count_params = []
-    if profile_id is not None:
-        count_query += " AND profile_id = ?"
-        count_params.append(profile_id)
-    if level:
-        count_query += " AND level = ?"
-        count_params.append(level)
-    if category:
-        count_query += " AND category = ?"
-        count_params.append(category)
-    if since:
-        count_query += " AND timestamp >= ?"
-        count_params.append(since)
-    if until:
-        count_query += " AND timestamp <= ?"
-        count_params.append(until)
-
-    cursor.execute(count_query, count_params)
-    total = cursor.fetchone()[0]
-
-    conn.close()
+    """Query system logs with optional filters. Logs are retained for 48 hours.
+
+    Pages newest-first. Pass the returned next_cursor back as `cursor` for the
+    next page (keyset on timestamp, id); `offset` is only honoured without a
+    cursor. `total` is computed only when exact_count=true, otherwise null.
+
+    With `q`, searches message and request_body instead: results are ordered
+    by relevance (bm25 `rank`, lower is better) with <mark> highlights, page
+    with `offset` only, and next_cursor is always null.
+    """
+    where, params = build_log_filters(profile_id, level, category, since, until)
+    if q is not None and q.strip():
+        return await search_logs(q, where, params, limit, offset, since, until, exact_count)
+    position = decode_log_cursor(cursor) if cursor else None
+
+    def fetch():
+        with db_pool.reader() as conn:
+            # Fans out newest-first across partitions; one extra row tells us whether another page exists
+            logs = [dict(row) for row in log_store.page(conn, where, params, limit, position=position,
+                                                        offset=offset, since=since, until=until)]
+            total = log_store.count(conn, where, params, since=since, until=until) if exact_count else None
+            return logs, total
+
+    logs, total = await run_db(fetch)
+    has_more = len(logs) > limit
+    logs = logs[:limit]
     return {
         "logs": logs,
         "total": total,
         "limit": limit,
         "offset": offset,
+        "next_cursor": encode_log_cursor(logs[-1]["timestamp"], logs[-1]["id"]) if has_more and logs else None,
         "retention_hours": LOG_RETENTION_HOURS
     }
 
 
+async def search_logs(q: str, where: str, params: list, limit: int, offset: int,
+                      since: Optional[str], until: Optional[str], exact_count: bool):
+    def fetch():
+        with db_pool.reader() as conn:
+            try:
+                logs = log_store.search(conn, q, where, params, limit + 1, offset=offset,
+                                        since=since, until=until)
+                total = log_store.count_matches(conn, q, where, params, since=since,
+                                                until=until) if exact_count else None
+            except sqlite3.OperationalError as e:
+                if "fts5" in str(e):
+                    raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+                raise
+            return logs, total
+
+    logs, total = await run_db(fetch)
+    has_more = len(logs) > limit
+    return {
+        "logs": logs[:limit],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if has_more else None,
+        "next_cursor": None,
+        "q": q,
+        "retention_hours": LOG_RETENTION_HOURS
+    }
+
+
+log_exports = asyncio.Semaphore(LOG_EXPORT_MAX_CONCURRENT)
+
+@app.get("/api/logs/export")
+async def export_logs(
+    format: str = "ndjson",
+    gzip: bool = False,
+    profile_id: Optional[int] = None,
+    level: Optional[str] = None,
+    category: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """Stream system logs oldest-first as NDJSON or CSV, optionally gzipped.
+
+    Rows are pulled from the cursor LOG_EXPORT_CHUNK_ROWS at a time and encoded
+    as they arrive, so memory stays flat regardless of the export size.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    where, params = build_log_filters(profile_id, level, category, since, until)
+
+    def encode_rows(rows, columns):
+        if format == "ndjson":
+            return "".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    async def stream():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None  # wbits=31: gzip container
+
+        def emit(text):
+            data = text.encode()
+            return compressor.compress(data) if compressor else data
+
+        columns = list(LOG_COLUMNS)
+        if format == "csv":
+            yield emit(encode_rows([columns], columns))
+        async with log_exports:
+            # Borrow and return the reader on a DB thread: opening one connects and runs PRAGMAs
+            reader = db_pool.reader()
+            conn = await run_db(reader.__enter__)
+            chunks = log_store.iter_chunks(conn, where, params, LOG_EXPORT_CHUNK_ROWS, since=since, until=until)
+
+            def release():
+                chunks.close()
+                reader.__exit__(None, None, None)
+
+            try:
+                while True:
+                    rows = await run_db(next, chunks, None)
+                    if rows is None:
+                        break
+                    yield emit(encode_rows(rows, columns))
+            finally:
+                await run_db(release)
+        if compressor:
+            yield compressor.flush()
+
+    filename = f"wa_map_logs_{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.{format}"
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(stream(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.get("/api/logs/rollups")
+async def get_log_rollups(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    bucket_minutes: int = 1,
+    group_by: Optional[str] = None,
+    endpoint: Optional[str] = None,
+    level: Optional[str] = None,
+    category: Optional[str] = None,
+    profile_id: Optional[int] = None
+):
+    """Request volume and latency series from the per-minute rollups (no raw log scans).
+
+    Each point has count, error_count and latency_ms (p50/p95/p99/mean/min/max);
+    group_by splits the series by endpoint, level, category or profile_id.
+    API requests are counted before log sampling, with the route template as endpoint.
+    """
+    if not 1 <= bucket_minutes <= 1440:
+        raise HTTPException(status_code=400, detail="bucket_minutes must be between 1 and 1440")
+
+    def fetch():
+        with db_pool.reader() as conn:
+            return log_rollups.query(conn, since=since, until=until, bucket_minutes=bucket_minutes,
+                                     group_by=group_by, endpoint=endpoint, level=level,
+                                     category=category, profile_id=profile_id)
+
+    try:
+        series = await run_db(fetch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"bucket_minutes": bucket_minutes, "group_by": group_by, "series": series,
+            "retention_hours": LOG_RETENTION_HOURS}
+
+
 @app.delete("/api/logs")
 async def clear_logs(before: Optional[str] = None):
     """Clear logs. If 'before' timestamp provided, only clears logs before that time."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    if before:
-        cursor.execute("DELETE FROM system_logs WHERE timestamp < ?", (before,))
-    else:
-        cursor.execute("DELETE FROM system_logs")
+    def delete():
+        with db_pool.writer() as conn:
+            if before:
+                return log_store.delete_before(conn, before)
+            return log_store.delete_all(conn)
 
-    deleted = cursor.rowcount
-    conn.commit()
-    conn.close()
+    deleted = await run_db(delete)
 
-    log_event("info", "SYSTEM", f"Cleared {deleted} log entries", endpoint="/api/logs", method="DELETE")
+    await log_event("info", "SYSTEM", f"Cleared {deleted} log entries", endpoint="/api/logs", method="DELETE")
     return {"message": f"Deleted {deleted} log entries", "deleted": deleted}
 
 
 @app.get("/api/profiles")
 async def list_profiles():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username, display_name, role, created_at FROM profiles")
-    profiles = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return {"profiles": profiles}
+    def query():
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, username, display_name, role, created_at FROM profiles")
+            profiles = [dict(row) for row in cursor.fetchall()]
+            return profiles
+
+    return {"profiles": await run_db(query)}
 
 @app.get("/api/profiles/{profile_id}")
 async def get_profile(profile_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username, display_name, role, created_at FROM profiles WHERE id = ?", (profile_id,))
-    row = cursor.fetchone()
-    conn.close()
+    def query():
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, username, display_name, role, created_at FROM profiles WHERE id = ?", (profile_id,))
+            row = cursor.fetchone()
+            return row
+
+    row = await run_db(query)
     if not row:
         raise HTTPException(status_code=404, detail="Profile not found")
     return dict(row)
 
 @app.post("/api/profiles")
 async def create_profile(profile: ProfileCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    password_hash = hashlib.sha256(profile.password.encode()).hexdigest()
-    try:
-        cursor.execute("INSERT INTO profiles (username, password_hash, display_name) VALUES (?, ?, ?)", (profile.username, password_hash, profile.display_name or profile.username))
-        profile_id = cursor.lastrowid
-        default_settings = json.dumps({"mapCenter": [0, 0], "mapZoom": 2, "selectedSatellites": [], "selectedSensors": [], "watchlists": [], "uiPreferences": {"panelExpanded": True, "activeSection": "satellites", "theme": "dark"}, "timeSettings": {"tailMinutes": 45, "headMinutes": 0, "glowEnabled": True, "glowIntensity": 1.0, "apexTickEnabled": True}})
-        cursor.execute("INSERT INTO profile_settings (profile_id, settings_json) VALUES (?, ?)", (profile_id, default_settings))
-        conn.commit()
-        conn.close()
-        log_event("info", "AUTH", f"Profile created: {profile.username}", profile_id=profile_id, username=profile.username)
-        return {"id": profile_id, "username": profile.username, "message": "Profile created"}
-    except sqlite3.IntegrityError:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Username already exists")
+    def insert():
+        with db_pool.writer() as conn:
+            cursor = conn.cursor()
+            password_hash = hashlib.sha256(profile.password.encode()).hexdigest()
+            try:
+                cursor.execute("INSERT INTO profiles (username, password_hash, display_name) VALUES (?, ?, ?)", (profile.username, password_hash, profile.display_name or profile.username))
+                profile_id = cursor.lastrowid
+                default_settings = json.dumps({"mapCenter": [0, 0], "mapZoom": 2, "selectedSatellites": [], "selectedSensors": [], "watchlists": [], "uiPreferences": {"panelExpanded": True, "activeSection": "satellites", "theme": "dark"}, "timeSettings": {"tailMinutes": 45, "headMinutes": 0, "glowEnabled": True, "glowIntensity": 1.0, "apexTickEnabled": True}})
+                cursor.execute("INSERT INTO profile_settings (profile_id, settings_json) VALUES (?, ?)", (profile_id, default_settings))
+                return profile_id
+            except sqlite3.IntegrityError:
+                raise HTTPException(status_code=400, detail="Username already exists")
+
+    profile_id = await run_db(insert)
+    await log_event("info", "AUTH", f"Profile created: {profile.username}", profile_id=profile_id, username=profile.username)
+    return {"id": profile_id, "username": profile.username, "message": "Profile created"}
 
 
 @app.put("/api/profiles/{profile_id}")
 async def update_profile(profile_id: int, profile: ProfileUpdate):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     updates, values = [], []
     if profile.display_name is not None:
         updates.append("display_name = ?")
@@ -405,147 +725,405 @@ async def update_profile(profile_id: int, profile: ProfileUpdate):
         updates.append("role = ?")
         values.append(profile.role)
     if not updates:
-        conn.close()
         raise HTTPException(status_code=400, detail="No updates provided")
     values.append(profile_id)
-    cursor.execute(f"UPDATE profiles SET {', '.join(updates)} WHERE id = ?", values)
-    if cursor.rowcount == 0:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Profile not found")
-    conn.commit()
-    conn.close()
+
+    def update():
+        with db_pool.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"UPDATE profiles SET {', '.join(updates)} WHERE id = ?", values)
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Profile not found")
+
+    await run_db(update)
     return {"message": "Profile updated"}
 
 @app.delete("/api/profiles/{profile_id}")
 async def delete_profile(profile_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM profiles")
-    if cursor.fetchone()[0] <= 1:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Cannot delete the last profile")
-    cursor.execute("DELETE FROM profiles WHERE id = ?", (profile_id,))
-    if cursor.rowcount == 0:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Profile not found")
-    conn.commit()
-    conn.close()
+    def delete():
+        with db_pool.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM profiles")
+            if cursor.fetchone()[0] <= 1:
+                raise HTTPException(status_code=400, detail="Cannot delete the last profile")
+            cursor.execute("DELETE FROM profiles WHERE id = ?", (profile_id,))
+            if cursor.rowcount == 0:
+                raise HTTPException(status_code=404, detail="Profile not found")
+
+    await run_db(delete)
     return {"message": "Profile deleted"}
 
 @app.get("/api/profiles/{profile_id}/settings")
 async def get_profile_settings(profile_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT settings_json, updated_at FROM profile_settings WHERE profile_id = ?", (profile_id,))
-    row = cursor.fetchone()
-    conn.close()
+    def query():
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT settings_json, updated_at FROM profile_settings WHERE profile_id = ?", (profile_id,))
+            row = cursor.fetchone()
+            return row
+
+    row = await run_db(query)
     if not row:
         raise HTTPException(status_code=404, detail="Settings not found")
     return {"profile_id": profile_id, "settings": json.loads(row["settings_json"]), "updated_at": row["updated_at"]}
 
 @app.put("/api/profiles/{profile_id}/settings")
 async def update_profile_settings(profile_id: int, body: ProfileSettings):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM profiles WHERE id = ?", (profile_id,))
-    if not cursor.fetchone():
-        conn.close()
-        raise HTTPException(status_code=404, detail="Profile not found")
     settings_json = json.dumps(body.settings)
-    cursor.execute("INSERT OR REPLACE INTO profile_settings (profile_id, settings_json, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)", (profile_id, settings_json))
-    conn.commit()
-    conn.close()
+
+    def update():
+        with db_pool.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM profiles WHERE id = ?", (profile_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Profile not found")
+            cursor.execute("INSERT OR REPLACE INTO profile_settings (profile_id, settings_json, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)", (profile_id, settings_json))
+
+    await run_db(update)
     return {"message": "Settings updated", "profile_id": profile_id}
 
 
 @app.post("/api/auth/login")
 async def login(request: Request, body: LoginRequest):
-    conn = get_db_connection()
-    cursor = conn.cursor()
     password_hash = hashlib.sha256(body.password.encode()).hexdigest()
-    cursor.execute("SELECT id, username, display_name, role FROM profiles WHERE username = ? AND password_hash = ?", (body.username, password_hash))
-    row = cursor.fetchone()
-    conn.close()
+
+    def query():
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, username, display_name, role FROM profiles WHERE username = ? AND password_hash = ?", (body.username, password_hash))
+            row = cursor.fetchone()
+            return row
+
+    row = await run_db(query)
     if not row:
-        log_event("warning", "AUTH", f"Failed login attempt for: {body.username}", username=body.username, endpoint="/api/auth/login", method="POST", response_status=401)
+        await log_event("warning", "AUTH", f"Failed login attempt for: {body.username}", username=body.username, endpoint="/api/auth/login", method="POST", response_status=401)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     profile = dict(row)
-    log_event("info", "AUTH", f"User logged in: {body.username}", profile_id=profile["id"], username=body.username, endpoint="/api/auth/login", method="POST", response_status=200)
+    await log_event("info", "AUTH", f"User logged in: {body.username}", profile_id=profile["id"], username=body.username, endpoint="/api/auth/login", method="POST", response_status=200)
     return {"message": "Login successful", "profile": profile}
 
 @app.post("/api/auth/logout")
 async def logout(request: Request):
     profile_id = request.headers.get("X-Profile-ID")
     username = request.headers.get("X-Username", "anonymous")
-    log_event("info", "AUTH", f"User logged out: {username}",
+    await log_event("info", "AUTH", f"User logged out: {username}",
               profile_id=int(profile_id) if profile_id and profile_id.isdigit() else None,
               username=username, endpoint="/api/auth/logout", method="POST")
     return {"message": "Logged out"}
 
 @app.get("/api/roles")
 async def list_roles():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM roles")
-    roles = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return {"roles": roles}
+    def query():
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM roles")
+            roles = [dict(row) for row in cursor.fetchall()]
+            return roles
+
+    return {"roles": await run_db(query)}
+
+
+@app.get("/api/metrics")
+async def get_metrics(format: str = "json"):
+    """Request latency (p50/p95/p99 per route and status class), request/error rates
+    and pool/log pipeline counters, as JSON or Prometheus text (format=prometheus)."""
+    components = {
+        "db_executor": db_executor.stats(),
+        "log_writer": log_writer.stats(),
+        "log_sampling": log_sampler.stats(),
+        "propagation": propagation_engine.stats(),
+        "ephemeris_cache": ephemeris_cache.stats(),
+        "ephemeris_tables": ephemeris_tables.stats(),
+        "realtime": realtime_broadcaster.stats(),
+    }
+    if format == "prometheus":
+        gauges = [(f"wa_map_{component}_{key}", value, f"{component} {key}")
+                  for component, stats in components.items()
+                  for key, value in stats.items()
+                  if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        return PlainTextResponse(request_metrics.to_prometheus(gauges),
+                                 media_type="text/plain; version=0.0.4")
+    return {"http": request_metrics.snapshot(), **components}
+
+
+@app.get("/api/db/pool")
+async def get_db_pool_stats():
+    """Database thread pool saturation and connection pool metrics."""
+    return {"executor": db_executor.stats(), "connections": db_pool.stats(),
+            "log_writer": log_writer.stats(), "log_partitions": log_store.stats(),
+            "log_tail": log_tail.stats()}
 
 
-SATELLITES = []
+def parse_norad_ids(norad_ids: str) -> List[int]:
+    try:
+        return [int(x.strip()) for x in norad_ids.split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="norad_ids must be comma-separated integers")
 
 @app.get("/api/satellites")
-async def get_satellites(limit: int = 100, offset: int = 0):
-    satellites = SATELLITES[offset:offset + limit]
-    return {"total": len(SATELLITES), "limit": limit, "offset": offset, "satellites": satellites}
+async def get_satellites(limit: int = 100, offset: int = 0, name: Optional[str] = None,
+                         intl_designator: Optional[str] = None, regime: Optional[str] = None,
+                         epoch_from: Optional[str] = None, epoch_to: Optional[str] = None):
+    """Catalog page ordered by noradId. name/intl_designator match by prefix, regime is LEO/MEO/GEO/HEO/OTHER."""
+    try:
+        satellites, total = satellite_catalog.query(name=name, intl_designator=intl_designator, regime=regime,
+                                                    epoch_from=epoch_from, epoch_to=epoch_to,
+                                                    limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"total": total, "limit": limit, "offset": offset, "satellites": satellites}
 
 @app.get("/api/satellites/positions")
-async def get_satellite_positions(time: Optional[str] = None, norad_ids: Optional[str] = None):
-    target_time = datetime.fromisoformat(time) if time else datetime.utcnow()
-    if norad_ids:
-        ids = [int(x.strip()) for x in norad_ids.split(",")]
-        positions = [s for s in SATELLITES if s["noradId"] in ids]
-    else:
-        positions = SATELLITES
+async def get_satellite_positions(time: Optional[str] = None, norad_ids: Optional[str] = None,
+                                  frames: str = ",".join(POSITION_FRAMES)):
+    """SGP4 positions at `time` (ISO-8601, default now) for the given ids or the whole catalog.
+
+    `frames` selects any of geodetic (lat/lon deg, alt km), eci (TEME) and
+    ecef, each as {"r": km, "v": km/s}. Satellites whose propagation fails
+    carry an `error` message instead.
+    """
+    try:
+        target_time = datetime.fromisoformat(time) if time else datetime.utcnow()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="time must be an ISO-8601 timestamp")
+    selected = [f.strip() for f in frames.split(",") if f.strip()]
+    unknown = set(selected) - set(POSITION_FRAMES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"frames must be among {', '.join(POSITION_FRAMES)}")
+    rows = satellite_catalog.rows_for(parse_norad_ids(norad_ids)) if norad_ids else satellite_catalog.rows()
+    positions = await asyncio.to_thread(propagation_engine.positions, rows, target_time, selected)
     return {"time": target_time.isoformat(), "count": len(positions), "positions": positions}
 
+grid_builds = asyncio.Semaphore(GRID_MAX_CONCURRENT)
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+@app.get("/api/satellites/positions/grid")
+async def get_satellite_position_grid(norad_ids: Optional[str] = None, start: Optional[str] = None,
+                                      end: Optional[str] = None, step: float = GRID_DEFAULT_STEP_SECONDS,
+                                      frame: str = "geodetic", velocity: bool = False):
+    """Satellites x times position tensor as a packed float32 payload (layout in position_grid.py).
 
-manager = ConnectionManager()
+    Times run from `start` (ISO-8601, default now) to `end` (default start +
+    GRID_DEFAULT_SPAN_MINUTES) inclusive, every `step` seconds. `frame` is one of
+    geodetic, eci or ecef; `velocity` adds velocity components for eci/ecef.
+    """
+    try:
+        start_time = datetime.fromisoformat(start) if start else datetime.utcnow()
+        end_time = datetime.fromisoformat(end) if end else start_time + timedelta(minutes=GRID_DEFAULT_SPAN_MINUTES)
+        span_seconds = (end_time - start_time).total_seconds()
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="start and end must be ISO-8601 timestamps (both naive or both with offsets)")
+    if not math.isfinite(step) or step <= 0 or span_seconds < 0:
+        raise HTTPException(status_code=400, detail="step must be positive and end must not precede start")
+    if span_seconds / step >= GRID_MAX_TIMES:
+        raise HTTPException(status_code=400, detail=f"Grid exceeds {GRID_MAX_TIMES} times; narrow it or raise step")
+    if frame not in POSITION_FRAMES:
+        raise HTTPException(status_code=400, detail=f"frame must be one of {', '.join(POSITION_FRAMES)}")
+    if velocity and frame == "geodetic":
+        raise HTTPException(status_code=400, detail="velocity is only available for the eci and ecef frames")
+
+    rows = satellite_catalog.rows_for(parse_norad_ids(norad_ids)) if norad_ids else satellite_catalog.rows()
+    if not len(rows):
+        raise HTTPException(status_code=400, detail="No known satellites requested")
+    n_times = int(span_seconds // step) + 1
+    if len(rows) * n_times > GRID_MAX_STATES:
+        raise HTTPException(status_code=400, detail=f"Grid of {len(rows)} satellites x {n_times} times "
+                                                    f"exceeds {GRID_MAX_STATES} states; narrow it or raise step")
+    times = [start_time + timedelta(seconds=i * step) for i in range(n_times)]
+
+    def build():
+        return pack_position_grid(propagation_engine.propagate(rows, times), frame, velocity, start_time, step)
+
+    async with grid_builds:
+        return Response(content=await asyncio.to_thread(build), media_type=GRID_MEDIA_TYPE)
+
+@app.get("/api/satellites/{norad_id}")
+async def get_satellite(norad_id: int):
+    satellite = satellite_catalog.get(norad_id)
+    if satellite is None:
+        raise HTTPException(status_code=404, detail="Satellite not found")
+    return satellite
+
+@app.post("/api/satellites")
+async def upsert_satellites(satellites: List[SatelliteTLE]):
+    """Insert or replace satellites by NORAD id (taken from the TLE)."""
+    try:
+        records = [make_record(s.name, s.tleLine1, s.tleLine2) for s in satellites]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def upsert():
+        with db_pool.writer() as conn:
+            return satellite_catalog.upsert(conn, records)
+
+    count = await run_db(upsert)
+    return {"message": "Satellites saved", "count": count}
+
+@app.post("/api/satellites/ingest")
+async def ingest_satellites(request: Request, format: str = "auto", batch_size: int = INGEST_BATCH_SIZE):
+    """Stream-parse a TLE/3LE/OMM (xml, json, csv) upload and upsert it into the catalog.
+
+    The body is parsed as it arrives and written in transactions of
+    `batch_size` records. Invalid sets are skipped and reported per line
+    (per set for XML/JSON); the rest of the file still loads.
+    """
+    if format != "auto" and format not in CATALOG_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of auto, {', '.join(CATALOG_FORMATS)}")
+    batch_size = max(1, batch_size)
+    started = time.perf_counter()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = make_parser(format) if format != "auto" else None
+    head = ""
+    pending: List[dict] = []
+    upserted = 0
+
+    async def flush(records):
+        def upsert():
+            with db_pool.writer() as conn:
+                return satellite_catalog.upsert(conn, records)
+        return await run_db(upsert)
+
+    async def feed(text):
+        nonlocal upserted
+        parser.feed(text)
+        pending.extend(parser.take())
+        while len(pending) >= batch_size:
+            upserted += await flush(pending[:batch_size])
+            del pending[:batch_size]
+
+    async for chunk in request.stream():
+        text = decoder.decode(chunk)
+        if parser is None:
+            head += text
+            if len(head) < INGEST_DETECT_BYTES:
+                continue
+            parser, text, head = make_parser(detect_format(head)), head, ""
+        await feed(text)
+    text = head + decoder.decode(b"", final=True)
+    if parser is None:
+        parser = make_parser(detect_format(text))
+    await feed(text)
+    parser.close()
+    pending.extend(parser.take())
+    if pending:
+        upserted += await flush(pending)
+
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    await log_event(level="warning" if parser.error_count else "info", category="CATALOG",
+                    message=f"Ingested {upserted} satellites ({parser.format}, {parser.error_count} errors)",
+                    duration_ms=duration_ms)
+    return {"format": parser.format, "upserted": upserted, "error_count": parser.error_count,
+            "errors": parser.errors, "catalog_size": len(satellite_catalog), "duration_ms": duration_ms}
+
+@app.delete("/api/satellites/{norad_id}")
+async def delete_satellite(norad_id: int):
+    def delete():
+        with db_pool.writer() as conn:
+            if satellite_catalog.delete(conn, [norad_id]) == 0:
+                raise HTTPException(status_code=404, detail="Satellite not found")
+
+    await run_db(delete)
+    return {"message": "Satellite deleted"}
+
+
+def build_realtime_frames(groups: List[FrameGroup]) -> Dict[FrameGroup, object]:
+    """
+    One payload per /ws/realtime (subscription, encoding) group (runs in a worker thread):
+    JSON text, or a PositionSnapshot each delta client encodes against its own last frame.
+    """
+    now = datetime.utcnow()
+    subscriptions = {subscription for subscription, _ in groups}
+    if any(subscription.norad_ids is None for subscription in subscriptions):
+        rows = satellite_catalog.rows()
+    else:
+        rows = satellite_catalog.rows_for(sorted(set().union(*(s.norad_ids for s in subscriptions))))
+    result = propagation_engine.propagate_at(rows, now)
+    picked = {subscription: result.subset(subscription.mask(result.norad_ids, result.lat[:, 0], result.lon[:, 0],
+                                                            result.error[:, 0]))
+              for subscription in subscriptions}
+    frames = {}
+    for subscription, encoding in groups:
+        selected = picked[subscription]
+        if encoding == "delta":
+            frames[subscription, encoding] = PositionSnapshot.from_result(selected, now)
+        else:
+            data = selected.positions(satellite_catalog.names(selected.rows), 0, ["geodetic"])
+            frames[subscription, encoding] = dumps({"type": "positions", "time": now.isoformat(), "data": data})
+    return frames
+
+async def resolve_watchlists(profile_id: int, selectors: Optional[list]) -> set:
+    """NORAD ids of a profile's watchlists, for /ws/realtime watchlist subscriptions."""
+    def query():
+        with db_pool.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT settings_json FROM profile_settings WHERE profile_id = ?", (profile_id,))
+            return cursor.fetchone()
+
+    row = await run_db(query)
+    if not row:
+        raise LookupError(f"Settings not found for profile {profile_id}")
+    return watchlist_norad_ids(json.loads(row["settings_json"]).get("watchlists", []), selectors)
+
+manager = ConnectionManager(max_queue=REALTIME_MAX_QUEUE, send_timeout=REALTIME_SEND_TIMEOUT_SECONDS,
+                            min_rate=REALTIME_MIN_RATE_HZ, max_rate=REALTIME_MAX_RATE_HZ,
+                            default_rate=REALTIME_DEFAULT_RATE_HZ, resolve_watchlists=resolve_watchlists,
+                            keyframe_interval=REALTIME_KEYFRAME_SECONDS)
+realtime_broadcaster = RealtimeBroadcaster(manager, build_realtime_frames, interval=1.0 / REALTIME_MAX_RATE_HZ)
 
 @app.websocket("/ws/realtime")
 async def websocket_realtime(websocket: WebSocket):
+    """Position frames from the shared tick task; this handler tracks the connection and its control messages."""
     await manager.connect(websocket)
     try:
-        await websocket.send_json({"type": "connected", "message": "Real-time updates active"})
+        manager.send(websocket, {"type": "connected", "message": "Real-time updates active"})
         while True:
-            positions = {"type": "positions", "time": datetime.utcnow().isoformat(), "data": SATELLITES}
-            await websocket.send_json(positions)
-            await asyncio.sleep(1)
+            await manager.handle(websocket, await websocket.receive_text())
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        slog.exception("websocket_error", category="SYSTEM", error=str(e))
+    finally:
         manager.disconnect(websocket)
 
 
+@app.websocket("/ws/logs")
+async def websocket_logs(websocket: WebSocket, level: Optional[str] = None, category: Optional[str] = None,
+                         profile_id: Optional[int] = None, after: Optional[int] = None,
+                         backlog: int = LOG_TAIL_BACKLOG):
+    """Stream new log events from the in-memory tail; no database reads.
+
+    `level` may be comma-separated. Without `after`, the newest `backlog`
+    matching events are sent first; with `after` (the last_seq from a previous
+    connection), everything newer still buffered is replayed and `missed`
+    reports events that had already been evicted.
+    """
+    await websocket.accept()
+    log_filter = LogFilter(level, category, profile_id)
+    if after is None:
+        entries, missed = log_tail.since(0, log_filter, limit=max(0, backlog))
+    else:
+        entries, missed = log_tail.since(after, log_filter)
+    cursor = log_tail.last_seq
+    try:
+        await websocket.send_json({"type": "hello", "first_seq": log_tail.first_seq,
+                                   "last_seq": cursor, "missed": missed})
+        if entries:
+            await websocket.send_json({"type": "logs", "entries": entries, "last_seq": cursor})
+        while True:
+            if not await log_tail.wait(cursor, LOG_TAIL_HEARTBEAT_SECONDS):
+                await websocket.send_json({"type": "heartbeat", "last_seq": cursor})
+                continue
+            entries, missed = log_tail.since(cursor, log_filter)
+            cursor = log_tail.last_seq
+            if missed:
+                await websocket.send_json({"type": "gap", "missed": missed, "last_seq": cursor})
+            if entries:
+                await websocket.send_json({"type": "logs", "entries": entries, "last_seq": cursor})
+    except WebSocketDisconnect:
+        pass
+
+
 if __name__ == "__main__":
     import uvicorn
-    import os
     print("Starting Satellite Visualization Server")
     print("API: http://localhost:8000")
     print("Docs: http://localhost:8000/docs")
@@ -0,0 +1,202 @@
+"""
+In-Process Request Metrics
+
+Log-bucketed latency histograms (HDR-style: fixed relative precision over a
+wide range) per route template, method and status class, plus a rolling
+request/error rate window. Recording is a log() and two integer increments,
+so it runs inline in LoggingMiddleware for every request.
+
+HISTOGRAM:
+- bucket i covers [MIN_MS * GROWTH**i, MIN_MS * GROWTH**(i+1))
+- GROWTH = 1.05 keeps quantile error within ~5% from 10 us to ~100 s
+- histograms are mergeable and serialize to sparse {bucket: count} dicts
+
+EXPORT:
+- snapshot() for JSON, to_prometheus() for the Prometheus text format
+  (quantiles exported as summaries, not per-bucket series)
+"""
+
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+MIN_MS = 0.01
+GROWTH = 1.05
+BUCKETS = int(math.ceil(math.log(1e5 / MIN_MS) / math.log(GROWTH))) + 1
+_LOG_GROWTH = math.log(GROWTH)
+
+QUANTILES = (0.5, 0.95, 0.99)
+RATE_WINDOW_SECONDS = 60
+
+
+class LatencyHistogram:
+    """Fixed-precision log-bucketed histogram of millisecond durations."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    @staticmethod
+    def bucket_for(value_ms: float) -> int:
+        if value_ms <= MIN_MS:
+            return 0
+        return min(BUCKETS - 1, int(math.log(value_ms / MIN_MS) / _LOG_GROWTH))
+
+    def record(self, value_ms: float):
+        self.counts[self.bucket_for(value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q (bucket midpoint, clamped to the observed min/max)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= rank:
+                midpoint = MIN_MS * GROWTH ** (i + 0.5)
+                return min(max(midpoint, self.min), self.max)
+        return self.max
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def to_buckets(self) -> Dict[int, int]:
+        return {i: c for i, c in enumerate(self.counts) if c}
+
+    @classmethod
+    def from_buckets(cls, buckets: Dict, total: float = 0.0, min_ms: float = math.inf,
+                     max_ms: float = 0.0) -> "LatencyHistogram":
+        hist = cls()
+        for i, c in buckets.items():
+            hist.counts[int(i)] += c
+            hist.count += c
+        hist.total = total
+        hist.min = min_ms
+        hist.max = max_ms
+        return hist
+
+    def summary(self) -> dict:
+        result = {"count": self.count}
+        for q in QUANTILES:
+            value = self.quantile(q)
+            result[f"p{int(q * 100)}"] = round(value, 3) if value is not None else None
+        result["mean"] = round(self.mean(), 3) if self.count else None
+        result["max"] = round(self.max, 3) if self.count else None
+        return result
+
+
+class RateWindow:
+    """Requests and errors per second over the last RATE_WINDOW_SECONDS."""
+
+    def __init__(self, seconds: int = RATE_WINDOW_SECONDS):
+        self.seconds = seconds
+        self._slots: List[List[int]] = [[-1, 0, 0] for _ in range(seconds)]  # [second, requests, errors]
+
+    def add(self, error: bool):
+        now = int(time.monotonic())
+        slot = self._slots[now % self.seconds]
+        if slot[0] != now:
+            slot[0], slot[1], slot[2] = now, 0, 0
+        slot[1] += 1
+        if error:
+            slot[2] += 1
+
+    def rates(self) -> Tuple[float, float]:
+        now = int(time.monotonic())
+        live = [s for s in self._slots if now - self.seconds < s[0] <= now]
+        requests = sum(s[1] for s in live)
+        errors = sum(s[2] for s in live)
+        return requests / self.seconds, errors / self.seconds
+
+
+def status_class(status: int) -> str:
+    return f"{status // 100}xx"
+
+
+class RequestMetrics:
+    """Latency histograms keyed by (method, route template, status class)."""
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+        self.overall = LatencyHistogram()
+        self.window = RateWindow()
+        self.started = time.monotonic()
+
+    def observe(self, method: str, route: str, status: int, duration_ms: float):
+        key = (method, route, status_class(status))
+        hist = self._series.get(key)
+        if hist is None:
+            hist = self._series[key] = LatencyHistogram()
+        hist.record(duration_ms)
+        self.overall.record(duration_ms)
+        self.window.add(status >= 500)
+
+    def snapshot(self) -> dict:
+        uptime = time.monotonic() - self.started
+        request_rate, error_rate = self.window.rates()
+        errors = sum(h.count for (_, _, cls), h in self._series.items() if cls == "5xx")
+        routes = []
+        for (method, route, cls), hist in sorted(self._series.items()):
+            entry = {"method": method, "route": route, "status_class": cls}
+            entry.update(hist.summary())
+            entry["rate_per_s"] = round(hist.count / uptime, 3) if uptime > 0 else 0.0
+            routes.append(entry)
+        return {
+            "uptime_s": round(uptime, 1),
+            "requests": self.overall.count,
+            "errors": errors,
+            "error_ratio": round(errors / self.overall.count, 5) if self.overall.count else 0.0,
+            "request_rate_per_s": round(request_rate, 3),
+            "error_rate_per_s": round(error_rate, 3),
+            "latency_ms": self.overall.summary(),
+            "routes": routes,
+        }
+
+    def to_prometheus(self, gauges: Iterable[Tuple[str, float, str]] = ()) -> str:
+        """Prometheus text exposition; `gauges` adds (name, value, help) triples."""
+        lines = [
+            "# HELP wa_map_http_request_duration_ms Request latency in milliseconds.",
+            "# TYPE wa_map_http_request_duration_ms summary",
+        ]
+        for (method, route, cls), hist in sorted(self._series.items()):
+            labels = f'method="{_escape(method)}",route="{_escape(route)}",status_class="{cls}"'
+            for q in QUANTILES:
+                lines.append(f'wa_map_http_request_duration_ms{{{labels},quantile="{q}"}} {hist.quantile(q):.3f}')
+            lines.append(f"wa_map_http_request_duration_ms_sum{{{labels}}} {hist.total:.3f}")
+            lines.append(f"wa_map_http_request_duration_ms_count{{{labels}}} {hist.count}")
+        request_rate, error_rate = self.window.rates()
+        for name, value, help_text in [
+            ("wa_map_http_request_rate", request_rate, f"Requests per second over the last {RATE_WINDOW_SECONDS}s."),
+            ("wa_map_http_error_rate", error_rate, f"5xx responses per second over the last {RATE_WINDOW_SECONDS}s."),
+            *gauges,
+        ]:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
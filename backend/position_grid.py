@@ -0,0 +1,87 @@
+"""
+Packed Position Grids
+
+Binary encoding of a satellites x times position tensor, served by
+GET /api/satellites/positions/grid for ground tracks and event detection
+(calculateGroundTrack / EventDetector.propagateForDetection in the browser
+re-propagate the same satellites over the same time grid).
+
+LAYOUT (little-endian):
+    offset  size        field
+    0       4           magic b"WAPG"
+    4       2           version (uint16, GRID_VERSION)
+    6       1           frame (uint8: 0 geodetic, 1 eci, 2 ecef)
+    7       1           components per state (uint8: 3, or 6 with velocity)
+    8       4           n_sats (uint32)
+    12      4           n_times (uint32)
+    16      8           start, Unix seconds UTC (float64)
+    24      8           step, seconds (float64)
+    32      4 * n_sats  NORAD ids (int32), in tensor order
+    ...     4 * n_sats * n_times * components
+                        states (float32), C order [satellite][time][component]
+
+Components are lat (deg), lon (deg), alt (km) for geodetic and x, y, z (km)
+for eci (TEME) / ecef, followed by vx, vy, vz (km/s) when velocity is
+requested. States whose propagation failed are NaN. The state block starts
+on a 4-byte boundary, so a browser can view it directly:
+
+    const view = new DataView(buffer);
+    const nSats = view.getUint32(8, true), nTimes = view.getUint32(12, true);
+    const ids = new Int32Array(buffer, 32, nSats);
+    const states = new Float32Array(buffer, 32 + 4 * nSats);
+
+float32 keeps ~0.5 m at GEO radius and ~1e-5 deg in latitude/longitude,
+well inside what the map draws.
+"""
+
+import struct
+from datetime import datetime, timezone
+from typing import Dict
+
+import numpy as np
+
+from propagation import FRAMES, PropagationResult
+
+
+GRID_MAGIC = b"WAPG"
+GRID_VERSION = 1
+GRID_MEDIA_TYPE = "application/octet-stream"
+GRID_HEADER = struct.Struct("<4sHBBIIdd")
+
+FRAME_CODES = {frame: code for code, frame in enumerate(FRAMES)}
+
+
+def pack_position_grid(result: PropagationResult, frame: str, velocity: bool,
+                       start: datetime, step_seconds: float) -> bytes:
+    """Encode `result` (all of its times) in the layout above."""
+    if frame == "geodetic":
+        components = [result.lat[..., None], result.lon[..., None], result.alt[..., None]]
+    else:
+        r, v = (result.r_teme, result.v_teme) if frame == "eci" else (result.r_ecef, result.v_ecef)
+        components = [r, v] if velocity else [r]
+    states = np.concatenate(components, axis=-1).astype("<f4")
+    states[result.error != 0] = np.nan
+    n_sats, n_times, n_components = states.shape
+    if start.tzinfo is None:  # naive datetimes are UTC throughout the backend
+        start = start.replace(tzinfo=timezone.utc)
+    header = GRID_HEADER.pack(GRID_MAGIC, GRID_VERSION, FRAME_CODES[frame], n_components,
+                              n_sats, n_times, start.timestamp(), step_seconds)
+    return b"".join((header, result.norad_ids.astype("<i4").tobytes(), states.tobytes()))
+
+
+def unpack_position_grid(payload: bytes) -> Dict[str, object]:
+    """Decode a packed grid (for scripts and checks; the browser reads it with typed arrays)."""
+    magic, version, frame, n_components, n_sats, n_times, start, step = GRID_HEADER.unpack_from(payload)
+    if magic != GRID_MAGIC or version != GRID_VERSION:
+        raise ValueError("Not a version 1 position grid")
+    offset = GRID_HEADER.size
+    norad_ids = np.frombuffer(payload, "<i4", n_sats, offset)
+    offset += norad_ids.nbytes
+    states = np.frombuffer(payload, "<f4", n_sats * n_times * n_components, offset)
+    return {
+        "frame": FRAMES[frame],
+        "start": start,
+        "step": step,
+        "norad_ids": norad_ids,
+        "states": states.reshape(n_sats, n_times, n_components),
+    }
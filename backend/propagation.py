@@ -0,0 +1,292 @@
+"""
+Vectorized SGP4 Propagation
+
+Propagates catalog rows with sgp4's SatrecArray (C++ SGP4 over whole arrays
+of satellites and times) and converts the TEME states to ECEF and WGS84
+geodetic coordinates with NumPy. Replaces per-satellite propagation in
+static/modules/data/propagation.js for server-side consumers.
+
+FRAMES:
+- eci       TEME position (km) and velocity (km/s), as returned by SGP4
+- ecef      TEME rotated by GMST (IAU-82, as satellite.js gstime); polar
+            motion and the equation of the equinoxes are ignored (< ~20 m)
+- geodetic  WGS84 latitude/longitude (deg) and altitude (km)
+
+SATREC CACHE:
+- Satrec objects are built once per catalog row and reused until the row's
+  TLE lines change (checked by identity, so a lookup costs no parsing)
+- the packed SatrecArray for a row set is kept too (small LRU keyed by the
+  catalog version and the rows), since packing costs more than propagating
+
+MULTI-CORE: large time grids (ground tracks for the whole catalog) can be
+sharded across worker processes, see propagation_pool.py.
+
+PERFORMANCE TARGET: < 50 ms for 1000 satellites at one epoch
+(scripts/benchmark_propagation.py).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sgp4.api import SGP4_ERRORS, Satrec, SatrecArray, jday
+
+from catalog import SatelliteCatalog
+
+
+FRAMES = ("geodetic", "eci", "ecef")
+
+# WGS84 ellipsoid
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+
+EARTH_ROTATION_RAD_S = 7.292115e-5
+GEODETIC_ITERATIONS = 3
+
+SATREC_ARRAY_CACHE_SIZE = 8
+
+# Satellite-time steps below which a configured process pool is not worth the round trip
+POOL_MIN_STEPS = 100_000
+
+
+def julian_dates(times: Sequence[datetime]) -> Tuple[np.ndarray, np.ndarray]:
+    """(jd, fraction) arrays for UTC datetimes (naive datetimes are taken as UTC)."""
+    jd = np.empty(len(times))
+    fr = np.empty(len(times))
+    for i, t in enumerate(times):
+        if t.tzinfo is not None:
+            t = t.astimezone(timezone.utc).replace(tzinfo=None)
+        jd[i], fr[i] = jday(t.year, t.month, t.day, t.hour, t.minute, t.second + t.microsecond / 1e6)
+    return jd, fr
+
+
+def gmst(jd: np.ndarray, fr: np.ndarray) -> np.ndarray:
+    """Greenwich mean sidereal time in radians (IAU-82, UT1 ~ UTC)."""
+    tut1 = ((jd - 2451545.0) + fr) / 36525.0
+    seconds = (-6.2e-6 * tut1 ** 3 + 0.093104 * tut1 ** 2
+               + (876600.0 * 3600 + 8640184.812866) * tut1 + 67310.54841)
+    return np.mod(np.radians(seconds / 240.0), 2 * np.pi)
+
+
+def teme_to_ecef(r: np.ndarray, v: np.ndarray, theta: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Rotate TEME states (n_sats, n_times, 3) about z by GMST theta (n_times,)."""
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    x, y, z = r[..., 0], r[..., 1], r[..., 2]
+    r_ecef = np.stack([cos_t * x + sin_t * y, -sin_t * x + cos_t * y, z], axis=-1)
+    vx, vy, vz = v[..., 0], v[..., 1], v[..., 2]
+    v_ecef = np.stack([cos_t * vx + sin_t * vy + EARTH_ROTATION_RAD_S * r_ecef[..., 1],
+                       -sin_t * vx + cos_t * vy - EARTH_ROTATION_RAD_S * r_ecef[..., 0], vz], axis=-1)
+    return r_ecef, v_ecef
+
+
+def ecef_to_geodetic(r: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """WGS84 (lat deg, lon deg, alt km) for ECEF positions (..., 3)."""
+    x, y, z = r[..., 0], r[..., 1], r[..., 2]
+    lon = np.arctan2(y, x)
+    p = np.hypot(x, y)
+    lat = np.arctan2(z, p * (1 - WGS84_E2))
+    for _ in range(GEODETIC_ITERATIONS):
+        sin_lat = np.sin(lat)
+        n = WGS84_A_KM / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+        lat = np.arctan2(z + WGS84_E2 * n * sin_lat, p)
+    sin_lat = np.sin(lat)
+    n = WGS84_A_KM / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    # p / cos(lat) - N is unstable near the poles; this form holds everywhere
+    alt = p * np.cos(lat) + z * sin_lat - WGS84_A_KM ** 2 / n
+    return np.degrees(lat), np.degrees(lon), alt
+
+
+def convert_frames(r_teme: np.ndarray, v_teme: np.ndarray, jd: np.ndarray, fr: np.ndarray) -> tuple:
+    """(r_ecef, v_ecef, lat, lon, alt) for TEME states (n_sats, n_times, 3)."""
+    r_ecef, v_ecef = teme_to_ecef(r_teme, v_teme, gmst(jd, fr))
+    return (r_ecef, v_ecef) + ecef_to_geodetic(r_ecef)
+
+
+class PropagationResult:
+    """Arrays for n satellites x t times; position/velocity arrays end in a (x, y, z) axis."""
+
+    __slots__ = ("rows", "norad_ids", "jd", "fr", "error", "r_teme", "v_teme", "r_ecef", "v_ecef",
+                 "lat", "lon", "alt", "duration_ms")
+
+    def __init__(self, rows: np.ndarray, norad_ids: np.ndarray, jd: np.ndarray, fr: np.ndarray,
+                 error: np.ndarray, r_teme: np.ndarray, v_teme: np.ndarray, converted: Optional[tuple] = None):
+        self.rows = rows
+        self.norad_ids = norad_ids
+        self.jd, self.fr = jd, fr
+        self.error = error
+        self.r_teme, self.v_teme = r_teme, v_teme
+        if converted is None:  # pool workers convert their own shards
+            converted = convert_frames(r_teme, v_teme, jd, fr)
+        self.r_ecef, self.v_ecef, self.lat, self.lon, self.alt = converted
+        self.duration_ms = 0.0
+
+    def subset(self, mask: np.ndarray) -> "PropagationResult":
+        """The satellites selected by a boolean mask (or index array), all times."""
+        result = PropagationResult(self.rows[mask], self.norad_ids[mask], self.jd, self.fr, self.error[mask],
+                                   self.r_teme[mask], self.v_teme[mask],
+                                   (self.r_ecef[mask], self.v_ecef[mask], self.lat[mask], self.lon[mask],
+                                    self.alt[mask]))
+        result.duration_ms = self.duration_ms
+        return result
+
+    def positions(self, names: List[str], time_index: int = 0, frames: Iterable[str] = FRAMES) -> List[dict]:
+        """Per-satellite JSON records at one time; failed propagations carry an error instead."""
+        frames = set(frames)
+        rounded = {}
+        if "geodetic" in frames:
+            rounded["lat"] = np.round(self.lat[:, time_index], 5).tolist()
+            rounded["lon"] = np.round(self.lon[:, time_index], 5).tolist()
+            rounded["alt"] = np.round(self.alt[:, time_index], 3).tolist()
+        for frame, r, v in (("eci", self.r_teme, self.v_teme), ("ecef", self.r_ecef, self.v_ecef)):
+            if frame in frames:
+                rounded[frame] = (np.round(r[:, time_index], 3).tolist(), np.round(v[:, time_index], 6).tolist())
+        errors = self.error[:, time_index].tolist()
+        norad_ids = self.norad_ids.tolist()
+
+        positions = []
+        for i, norad_id in enumerate(norad_ids):
+            entry = {"noradId": norad_id, "name": names[i]}
+            if errors[i]:
+                entry["error"] = SGP4_ERRORS.get(errors[i], f"SGP4 error {errors[i]}")
+                positions.append(entry)
+                continue
+            if "geodetic" in frames:
+                entry["lat"], entry["lon"], entry["alt"] = rounded["lat"][i], rounded["lon"][i], rounded["alt"][i]
+            for frame in ("eci", "ecef"):
+                if frame in rounded:
+                    entry[frame] = {"r": rounded[frame][0][i], "v": rounded[frame][1][i]}
+            positions.append(entry)
+        return positions
+
+
+class PropagationEngine:
+    """
+    SatrecArray propagation over SatelliteCatalog rows.
+
+    With a pool (propagation_pool.PropagationPool), requests of at least
+    POOL_MIN_STEPS satellite-time steps are sharded across worker processes;
+    smaller ones (a single realtime epoch) stay in-process, where they are
+    cheaper than the round trip. Single-time positions() are served from
+    Chebyshev tables (ephemeris_tables.EphemerisTables) when `tables` is set,
+    else from shared time-bucketed states (ephemeris_cache.EphemerisCache)
+    when `cache` is set, else by SGP4 directly.
+    """
+
+    def __init__(self, catalog: SatelliteCatalog, pool=None, cache=None, tables=None):
+        self.catalog = catalog
+        self.pool = pool
+        self.cache = cache
+        self.tables = tables
+        self._satrecs: Dict[int, Tuple[Tuple[str, str], Satrec]] = {}  # row -> (tle lines, Satrec)
+        self._arrays: "OrderedDict[tuple, SatrecArray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.propagations = 0
+        self.satellites_propagated = 0
+        self.last_duration_ms: Optional[float] = None
+
+    def satrecs(self, rows: np.ndarray) -> List[Satrec]:
+        lines = self.catalog.tle_lines(rows)
+        satrecs = []
+        with self._lock:
+            cache = self._satrecs
+            for row, tle in zip(rows.tolist(), lines):
+                cached = cache.get(row)
+                if cached is None or cached[0] is not tle:
+                    cached = cache[row] = (tle, Satrec.twoline2rv(tle[0], tle[1]))
+                satrecs.append(cached[1])
+        return satrecs
+
+    def satrec_array(self, rows: np.ndarray) -> SatrecArray:
+        key = (self.catalog.version, rows.tobytes())
+        with self._lock:
+            array = self._arrays.get(key)
+            if array is not None:
+                self._arrays.move_to_end(key)
+                return array
+        array = SatrecArray(self.satrecs(rows))
+        with self._lock:
+            self._arrays[key] = array
+            while len(self._arrays) > SATREC_ARRAY_CACHE_SIZE:
+                self._arrays.popitem(last=False)
+        return array
+
+    def propagate(self, rows: np.ndarray, times: Sequence[datetime]) -> PropagationResult:
+        """Propagate catalog rows to every time in `times` (all in one SatrecArray call)."""
+        started = time.perf_counter()
+        jd, fr = julian_dates(times)
+        columns = self.catalog.columns(rows)
+        converted = None
+        if self.pool is not None and len(rows) * len(jd) >= POOL_MIN_STEPS:
+            error, r, v, *converted = self.pool.propagate((self.catalog.version, rows.tobytes()), columns, jd, fr)
+        elif len(rows):
+            error, r, v = self.satrec_array(rows).sgp4(jd, fr)
+        else:
+            error, r, v = np.zeros((0, len(jd)), np.uint8), np.zeros((0, len(jd), 3)), np.zeros((0, len(jd), 3))
+        result = PropagationResult(rows, columns["norad_id"], jd, fr, error, r, v, converted)
+        result.duration_ms = (time.perf_counter() - started) * 1000
+        self.propagations += 1
+        self.satellites_propagated += len(rows)
+        self.last_duration_ms = result.duration_ms
+        return result
+
+    def propagate_cached(self, rows: np.ndarray, when: datetime) -> PropagationResult:
+        """propagate(rows, [when]) through the ephemeris cache; only missing states run SGP4."""
+        started = time.perf_counter()
+        columns = self.catalog.columns(rows)
+
+        def compute(mask: np.ndarray, at: datetime):
+            subset = rows[mask]
+            array = self.satrec_array(rows) if len(subset) == len(rows) else SatrecArray(self.satrecs(subset))
+            error, r, v = array.sgp4(*julian_dates([at]))
+            self.satellites_propagated += len(subset)
+            return error[:, 0], r[:, 0], v[:, 0]
+
+        error, r, v, at = self.cache.states(columns["norad_id"], columns["epoch"], when, compute)
+        jd, fr = julian_dates([at])
+        result = PropagationResult(rows, columns["norad_id"], jd, fr, error[:, None], r[:, None], v[:, None])
+        result.duration_ms = (time.perf_counter() - started) * 1000
+        self.propagations += 1
+        self.last_duration_ms = result.duration_ms
+        return result
+
+    def propagate_tabled(self, rows: np.ndarray, when: datetime) -> PropagationResult:
+        """propagate(rows, [when]) by Chebyshev evaluation; satellites the tables cannot serve run SGP4."""
+        started = time.perf_counter()
+        columns = self.catalog.columns(rows)
+        served, r, v = self.tables.evaluate(columns["norad_id"], columns["epoch"], when)
+        jd, fr = julian_dates([when])
+        error = np.zeros(len(rows), np.uint8)
+        if not served.all():
+            missing = ~served
+            subset_error, subset_r, subset_v = SatrecArray(self.satrecs(rows[missing])).sgp4(jd, fr)
+            error[missing], r[missing], v[missing] = subset_error[:, 0], subset_r[:, 0], subset_v[:, 0]
+            self.satellites_propagated += int(missing.sum())
+        result = PropagationResult(rows, columns["norad_id"], jd, fr, error[:, None], r[:, None], v[:, None])
+        result.duration_ms = (time.perf_counter() - started) * 1000
+        self.propagations += 1
+        self.last_duration_ms = result.duration_ms
+        return result
+
+    def propagate_at(self, rows: np.ndarray, when: datetime) -> PropagationResult:
+        """propagate(rows, [when]) from the tables, the cache or SGP4, whichever is configured."""
+        if self.tables is not None and len(rows):
+            return self.propagate_tabled(rows, when)
+        if self.cache is not None and len(rows):
+            return self.propagate_cached(rows, when)
+        return self.propagate(rows, [when])
+
+    def positions(self, rows: np.ndarray, when: datetime, frames: Iterable[str] = FRAMES) -> List[dict]:
+        return self.propagate_at(rows, when).positions(self.catalog.names(rows), 0, frames)
+
+    def stats(self) -> dict:
+        return {
+            "propagations": self.propagations,
+            "satellites_propagated": self.satellites_propagated,
+            "cached_satrecs": len(self._satrecs),
+            "last_duration_ms": round(self.last_duration_ms, 3) if self.last_duration_ms is not None else None,
+            "pool": self.pool.stats() if self.pool is not None else None,
+        }
@@ -0,0 +1,231 @@
+"""
+Multi-Process SGP4 Propagation
+
+Shards a propagation request across a pool of worker processes. Inputs and
+outputs move through shared-memory NumPy buffers, so only shared-memory block
+names, shard bounds and the (small) time arrays are pickled per task.
+
+DATA FLOW:
+- input   the parent packs catalog element columns for a row set into one
+          float64 block (n_sats x ELEMENT_FIELDS, sgp4init units); blocks are
+          kept in a small LRU keyed by (catalog version, rows), like the
+          engine's SatrecArray cache
+- shards  each task covers a contiguous slice of satellites; the worker
+          rebuilds Satrecs from the elements with sgp4init (no TLE text
+          crosses the process boundary) and caches the SatrecArray per
+          (input block, shard)
+- output  workers propagate their slice and convert it to ECEF/geodetic in
+          place, writing every array into one output block; the parent copies
+          the arrays out and unlinks the block
+
+Satrecs built from elements match Satrec.twoline2rv to ~0.1 m (the TLE
+fields are rounded the same way either path takes).
+
+WORKERS: processes are started lazily with the "spawn" method (the server
+has live threads, which fork does not copy safely) and shut down by close().
+Throughput scales with the number of physical cores up to the number of
+shards; benchmark with scripts/benchmark_propagation.py --workers 1 2 4 8.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sgp4.api import WGS72, Satrec, SatrecArray
+
+from catalog import J2000_JD
+from propagation import convert_frames
+
+
+# Per-satellite input row, in Satrec.sgp4init argument order
+ELEMENT_FIELDS = ("norad_id", "epoch", "bstar", "mean_motion_dot", "mean_motion_ddot", "eccentricity",
+                  "arg_perigee", "inclination", "mean_anomaly", "mean_motion", "raan")
+
+# Output arrays per satellite-time step: (name, dtype, trailing shape); uint8 last keeps float64 aligned
+OUTPUT_FIELDS = (
+    ("r_teme", np.float64, (3,)),
+    ("v_teme", np.float64, (3,)),
+    ("r_ecef", np.float64, (3,)),
+    ("v_ecef", np.float64, (3,)),
+    ("lat", np.float64, ()),
+    ("lon", np.float64, ()),
+    ("alt", np.float64, ()),
+    ("error", np.uint8, ()),
+)
+
+SGP4_EPOCH_JD = 2433281.5  # sgp4init epochs count days from 1949 December 31 00:00 UT
+MINUTES_PER_DAY = 1440.0
+XPDOTP = MINUTES_PER_DAY / (2 * math.pi)  # rev/day -> rad/min divisor
+
+INPUT_CACHE_SIZE = 2
+WORKER_ARRAY_CACHE_SIZE = 8
+
+# Worker-process state: (input block, start, stop) -> SatrecArray
+_worker_arrays: "OrderedDict[tuple, SatrecArray]" = OrderedDict()
+
+
+def pack_elements(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """(n, len(ELEMENT_FIELDS)) float64 sgp4init arguments from catalog element columns."""
+    elements = np.empty((len(columns["norad_id"]), len(ELEMENT_FIELDS)))
+    elements[:, 0] = columns["norad_id"]
+    elements[:, 1] = columns["epoch"] + (J2000_JD - SGP4_EPOCH_JD)
+    elements[:, 2] = columns["bstar"]
+    elements[:, 3] = columns["mean_motion_dot"] / (XPDOTP * MINUTES_PER_DAY)
+    elements[:, 4] = columns["mean_motion_ddot"] / (XPDOTP * MINUTES_PER_DAY ** 2)
+    elements[:, 5] = columns["eccentricity"]
+    elements[:, 6] = np.radians(columns["arg_perigee"])
+    elements[:, 7] = np.radians(columns["inclination"])
+    elements[:, 8] = np.radians(columns["mean_anomaly"])
+    elements[:, 9] = columns["mean_motion"] / XPDOTP
+    elements[:, 10] = np.radians(columns["raan"])
+    return elements
+
+
+def satrecs_from_elements(elements: np.ndarray) -> List[Satrec]:
+    satrecs = []
+    for values in elements.tolist():
+        satrec = Satrec()
+        satrec.sgp4init(WGS72, "i", int(values[0]), *values[1:])
+        satrecs.append(satrec)
+    return satrecs
+
+
+def output_size(n_sats: int, n_times: int) -> int:
+    return sum(n_sats * n_times * int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize
+               for _, dtype, shape in OUTPUT_FIELDS)
+
+
+def output_views(buffer, n_sats: int, n_times: int) -> Dict[str, np.ndarray]:
+    """Arrays laid out back to back over an output block (see OUTPUT_FIELDS)."""
+    views, offset = {}, 0
+    for name, dtype, shape in OUTPUT_FIELDS:
+        full_shape = (n_sats, n_times) + shape
+        views[name] = np.ndarray(full_shape, dtype, buffer=buffer, offset=offset)
+        offset += views[name].nbytes
+    return views
+
+
+def _propagate_shard(input_name: str, n_sats: int, output_name: str, n_times: int,
+                     start: int, stop: int, jd: np.ndarray, fr: np.ndarray) -> int:
+    """Worker task: propagate satellites [start, stop) into the shared output block."""
+    key = (input_name, start, stop)
+    array = _worker_arrays.get(key)
+    if array is None:
+        block = SharedMemory(name=input_name)
+        try:
+            elements = np.ndarray((n_sats, len(ELEMENT_FIELDS)), np.float64, buffer=block.buf)[start:stop].copy()
+        finally:
+            block.close()
+        array = _worker_arrays[key] = SatrecArray(satrecs_from_elements(elements))
+        while len(_worker_arrays) > WORKER_ARRAY_CACHE_SIZE:
+            _worker_arrays.popitem(last=False)
+    else:
+        _worker_arrays.move_to_end(key)
+
+    error, r, v = array.sgp4(jd, fr)
+    r_ecef, v_ecef, lat, lon, alt = convert_frames(r, v, jd, fr)
+    block = SharedMemory(name=output_name)
+    try:
+        _write_shard(block.buf, n_sats, n_times, start, stop,
+                     {"r_teme": r, "v_teme": v, "r_ecef": r_ecef, "v_ecef": v_ecef,
+                      "lat": lat, "lon": lon, "alt": alt, "error": error})
+    finally:
+        block.close()
+    return stop - start
+
+
+def _write_shard(buffer, n_sats: int, n_times: int, start: int, stop: int, arrays: Dict[str, np.ndarray]):
+    # Kept out of _propagate_shard so the views are gone before the block closes
+    for name, view in output_views(buffer, n_sats, n_times).items():
+        view[start:stop] = arrays[name]
+
+
+class PropagationPool:
+    """Worker processes plus the shared-memory input blocks they read."""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inputs: "OrderedDict[tuple, SharedMemory]" = OrderedDict()
+        # One request at a time: a request already fans out to every worker, and
+        # evicting an input block must not race another request still reading it
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.steps_propagated = 0
+        self.last_duration_ms: Optional[float] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+        return self._executor
+
+    def _input(self, key: tuple, columns: Dict[str, np.ndarray]) -> SharedMemory:
+        block = self._inputs.get(key)
+        if block is not None:
+            self._inputs.move_to_end(key)
+            return block
+        elements = pack_elements(columns)
+        block = SharedMemory(create=True, size=max(1, elements.nbytes))
+        np.ndarray(elements.shape, elements.dtype, buffer=block.buf)[:] = elements
+        self._inputs[key] = block
+        while len(self._inputs) > INPUT_CACHE_SIZE:
+            _, evicted = self._inputs.popitem(last=False)
+            evicted.close()
+            evicted.unlink()
+        return block
+
+    def shards(self, n_sats: int) -> List[Tuple[int, int]]:
+        bounds = np.linspace(0, n_sats, min(self.workers, n_sats) + 1).astype(int).tolist()
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def propagate(self, key: tuple, columns: Dict[str, np.ndarray], jd: np.ndarray, fr: np.ndarray) -> tuple:
+        """
+        Propagate the satellites in `columns` (cached as input block `key`).
+
+        Returns (error, r_teme, v_teme, r_ecef, v_ecef, lat, lon, alt).
+        """
+        started = time.perf_counter()
+        n_sats, n_times = len(columns["norad_id"]), len(jd)
+        with self._lock:
+            source = self._input(key, columns)
+            output = SharedMemory(create=True, size=max(1, output_size(n_sats, n_times)))
+            try:
+                pool = self._pool()
+                futures = [pool.submit(_propagate_shard, source.name, n_sats, output.name, n_times, start, stop, jd, fr)
+                           for start, stop in self.shards(n_sats)]
+                for future in futures:
+                    future.result()
+                arrays = {name: view.copy() for name, view in output_views(output.buf, n_sats, n_times).items()}
+            finally:
+                output.close()
+                output.unlink()
+        self.requests += 1
+        self.steps_propagated += n_sats * n_times
+        self.last_duration_ms = (time.perf_counter() - started) * 1000
+        return tuple(arrays[name] for name in ("error", "r_teme", "v_teme", "r_ecef", "v_ecef", "lat", "lon", "alt"))
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+            for block in self._inputs.values():
+                block.close()
+                block.unlink()
+            self._inputs.clear()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "started": self._executor is not None,
+            "requests": self.requests,
+            "steps_propagated": self.steps_propagated,
+            "input_blocks": len(self._inputs),
+            "last_duration_ms": round(self.last_duration_ms, 3) if self.last_duration_ms is not None else None,
+        }
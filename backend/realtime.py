@@ -0,0 +1,617 @@
+"""
+Realtime Position Broadcast
+
+One tick task computes and serializes each /ws/realtime frame once per
+distinct subscription and sends the same text to every client sharing it
+through ConnectionManager, instead of a propagate/json.dumps/send loop per
+connection. Serialization cost per tick scales with the number of distinct
+subscriptions, not clients; only the sends scale with clients.
+
+TICKS:
+- every `interval` seconds (fixed rate on the monotonic clock; a tick that
+  overruns the interval delays the next one instead of piling up); the
+  interval is the fastest rate any client may get
+- a frame is produced only when at least one client is due, and only the
+  due clients are sent it; due clients are grouped by subscription and the
+  whole tick (one propagation, one frame per group) runs in a worker thread
+
+FAN-OUT (backpressure):
+- every client has a bounded outbound queue drained by its own sender
+  task, so broadcasting never waits on a socket and one slow client cannot
+  delay the others
+- position frames are latest-frame-wins: a queued, unsent position frame is
+  replaced by the next one (counted as dropped); control messages are kept
+  and only the oldest entries give way when the queue is full
+- a send that does not complete within send_timeout marks the client as
+  stalled: it is closed (1013, try again later) and removed, as are
+  clients whose sends fail
+
+ADAPTIVE RATE (per client, between min_rate and max_rate Hz):
+- clients start at default_rate and negotiate with
+  {"type": "configure", "rate": hz, "frame_budget_ms": ms}; the server
+  answers {"type": "configured", ...} with the rate it will actually use
+- frame_budget_ms is how long the client needs to handle a frame (parse,
+  render); the rate is capped at 1000 / frame_budget_ms
+- a client whose position frame was replaced before it went out, or whose
+  average send takes over half its frame interval, has its rate halved
+  (at most once per second); RATE_RECOVERY_SECONDS of clean sends raise it
+  by 1 Hz again, up to the negotiated ceiling; every change is announced
+  with {"type": "rate", "rate": hz}
+
+SUBSCRIPTIONS (what a client's frames contain):
+- new clients get the whole catalog, as before subscriptions existed
+- {"type": "subscribe", "norad_ids": [...]} an explicit set
+- {"type": "subscribe", "profile_id": 1, "watchlists": [id or name, ...]}
+  the NORAD ids of those watchlists in the profile's settings (all of its
+  watchlists when "watchlists" is omitted), read once at subscribe time;
+  resubscribe after editing them
+- {"type": "subscribe", "bbox": [west, south, east, north]} satellites whose
+  subpoint is inside the viewport (degrees; west > east crosses the
+  antimeridian); edges are snapped outward to BBOX_GRID_DEGREES so nearby
+  viewports share a group
+- ids/watchlists and bbox may be combined (ids inside the box); a subscribe
+  without any of them returns to the whole catalog
+- {"type": "unsubscribe"} stops position frames until the next subscribe
+- replies are {"type": "subscribed", ...} / {"type": "unsubscribed"}, or
+  {"type": "error", "message": ...} for a bad request
+
+ENCODINGS ({"type": "configure", "encoding": ...}):
+- "json" (default): text frames as above
+- "delta": binary keyframes plus fixed-point deltas (delta_frames.py). Each
+  group's DeltaStream encodes a frame once, in the producer thread, against
+  every base a due member may hold; each client's sender picks the delta
+  against the frame it was last actually sent, or the keyframe when that
+  one is missing (latest-wins drops, a new subscription). A client whose
+  base does not match sends {"type": "resync"} and gets a keyframe next
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import structlog
+from fastapi import WebSocket
+
+from delta_frames import DeltaStream, EncodedFrame, PositionSnapshot
+
+
+slog = structlog.get_logger("wa_map")
+
+
+def dumps(message: dict) -> str:
+    """JSON text as Starlette's send_json would produce it."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+# Viewport boxes are widened to this grid so clients with almost the same view share one frame
+BBOX_GRID_DEGREES = 0.01
+
+
+def parse_bbox(value) -> Tuple[float, float, float, float]:
+    """[west, south, east, north] in degrees, snapped outward to BBOX_GRID_DEGREES."""
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        raise ValueError("bbox must be [west, south, east, north]")
+    west, south, east, north = (float(x) for x in value)
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError("bbox needs -180 <= west, east <= 180 and -90 <= south <= north <= 90")
+    grid = BBOX_GRID_DEGREES
+    return (round(max(-180.0, math.floor(west / grid) * grid), 6), round(max(-90.0, math.floor(south / grid) * grid), 6),
+            round(min(180.0, math.ceil(east / grid) * grid), 6), round(min(90.0, math.ceil(north / grid) * grid), 6))
+
+
+def watchlist_norad_ids(watchlists: list, selectors: Optional[list] = None) -> Set[int]:
+    """
+    NORAD ids in profile_settings["watchlists"] entries ({"id", "name", "noradIds"}),
+    limited to the entries whose id or name is in `selectors` when given.
+    """
+    wanted = None if selectors is None else {str(selector) for selector in selectors}
+    norad_ids = set()
+    for watchlist in watchlists:
+        if not isinstance(watchlist, dict):
+            continue
+        if wanted is not None and str(watchlist.get("id")) not in wanted and watchlist.get("name") not in wanted:
+            continue
+        norad_ids.update(int(norad_id) for norad_id in watchlist.get("noradIds", []))
+    return norad_ids
+
+
+class Subscription:
+    """A client's frame filter: NORAD ids, a lat/lon box, both (ids inside the box) or neither (all)."""
+
+    __slots__ = ("norad_ids", "bbox", "_ids", "_key")
+
+    def __init__(self, norad_ids: Optional[Iterable[int]] = None,
+                 bbox: Optional[Tuple[float, float, float, float]] = None):
+        self.norad_ids: Optional[FrozenSet[int]] = frozenset(norad_ids) if norad_ids is not None else None
+        self.bbox = bbox
+        self._ids = np.fromiter(self.norad_ids, np.int64) if self.norad_ids is not None else None
+        self._key = (self.norad_ids, self.bbox)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Subscription) and self._key == other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def mask(self, norad_ids: np.ndarray, lat: np.ndarray, lon: np.ndarray, error: np.ndarray) -> np.ndarray:
+        """Which of the propagated satellites (one time) this subscription receives."""
+        keep = np.ones(len(norad_ids), bool)
+        if self._ids is not None:
+            keep &= np.isin(norad_ids, self._ids)
+        if self.bbox is not None:
+            west, south, east, north = self.bbox
+            in_lon = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+            keep &= (error == 0) & (lat >= south) & (lat <= north) & in_lon
+        return keep
+
+    def describe(self) -> dict:
+        return {
+            "norad_ids": len(self.norad_ids) if self.norad_ids is not None else None,
+            "bbox": list(self.bbox) if self.bbox is not None else None,
+        }
+
+
+ALL_SATELLITES = Subscription()
+
+# resolve_watchlists(profile_id, selectors) -> NORAD ids; raises LookupError for an unknown profile
+ResolveWatchlists = Callable[[int, Optional[list]], Awaitable[Set[int]]]
+
+
+FRAME_POSITIONS = "positions"
+FRAME_CONTROL = "control"
+
+ENCODINGS = ("json", "delta")
+
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_TIMEOUT_SECONDS = 2.0
+
+# Adaptive rate: send-latency smoothing, the share of a frame interval a send may take before the
+# client counts as congested, the spacing between decreases, and clean time before each increase
+LATENCY_SMOOTHING = 0.3
+CONGESTED_SEND_SHARE = 0.5
+RATE_DECREASE_COOLDOWN_SECONDS = 1.0
+RATE_RECOVERY_SECONDS = 3.0
+
+
+class RealtimeClient:
+    """One connection's outbound queue and the task that drains it."""
+
+    def __init__(self, manager: "ConnectionManager", websocket: WebSocket):
+        self.manager = manager
+        self.websocket = websocket
+        self._queue: Deque[Tuple[str, Union[str, EncodedFrame]]] = deque()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.subscription: Optional[Subscription] = ALL_SATELLITES  # None: unsubscribed
+        self._encoding = "json"
+        # "delta" state: the stream and seq of the last frame sent and the last queued, when the next keyframe is due
+        self.delta_stream: Optional[DeltaStream] = None
+        self.delta_seq = 0
+        self._queued_stream: Optional[DeltaStream] = None
+        self._queued_seq = 0
+        self._keyframe_at = 0.0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.last_send_ms: Optional[float] = None
+
+        self.target_rate = manager.default_rate
+        self.frame_budget_ms: Optional[float] = None
+        self.rate = self.target_rate
+        self.send_ms: Optional[float] = None  # smoothed position-frame send time
+        self.rate_changes = 0
+        self._next_due = 0.0
+        self._last_decrease = 0.0
+        self._clean_since = time.monotonic()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        self._task = asyncio.create_task(self._drain())
+
+    def stop(self):
+        self.closed = True
+        self._queue.clear()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    @property
+    def encoding(self) -> str:
+        return self._encoding
+
+    @property
+    def rate_ceiling(self) -> float:
+        ceiling = self.target_rate
+        if self.frame_budget_ms:
+            ceiling = min(ceiling, 1000.0 / self.frame_budget_ms)
+        return max(self.manager.min_rate, ceiling)
+
+    def configure(self, rate: Optional[float] = None, frame_budget_ms: Optional[float] = None,
+                  encoding: Optional[str] = None) -> dict:
+        """Apply a client's negotiated target rate, frame budget and/or encoding; returns the reply."""
+        if encoding is not None and encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {', '.join(ENCODINGS)}")
+        if rate is not None and not math.isfinite(float(rate)):
+            raise ValueError("rate must be a finite number")
+        if frame_budget_ms is not None and not math.isfinite(float(frame_budget_ms)):
+            raise ValueError("frame_budget_ms must be a finite number")
+        if encoding is not None and encoding != self.encoding:
+            self._encoding = encoding
+            self.resync()
+        if rate is not None:
+            self.target_rate = min(max(float(rate), self.manager.min_rate), self.manager.max_rate)
+        if frame_budget_ms is not None:
+            self.frame_budget_ms = float(frame_budget_ms) if float(frame_budget_ms) > 0 else None
+        self.rate = self.rate_ceiling
+        self._clean_since = time.monotonic()
+        return {
+            "type": "configured",
+            "rate": self.rate,
+            "target_rate": self.target_rate,
+            "frame_budget_ms": self.frame_budget_ms,
+            "encoding": self.encoding,
+            "min_rate": self.manager.min_rate,
+            "max_rate": self.manager.max_rate,
+        }
+
+    def due(self, now: float, tick: float) -> bool:
+        """True if a position frame is due at `now`; ticks are `tick` seconds apart."""
+        if now + tick / 2 < self._next_due:
+            return False
+        # Accumulate so rates that don't divide the tick rate still average out; restart after falling behind
+        self._next_due = max(self._next_due, now - tick / 2) + 1.0 / self.rate
+        return True
+
+    def _set_rate(self, rate: float, now: float):
+        if rate != self.rate:
+            self.rate = rate
+            self.rate_changes += 1
+            self.enqueue(FRAME_CONTROL, dumps({"type": "rate", "rate": rate}))
+        self._clean_since = now
+
+    def _congested(self):
+        now = time.monotonic()
+        self._clean_since = now
+        if now - self._last_decrease < RATE_DECREASE_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        self._set_rate(max(self.manager.min_rate, self.rate / 2), now)
+
+    def _sent_frame(self, send_ms: float):
+        if self.send_ms is None:
+            self.send_ms = send_ms
+        else:
+            self.send_ms += LATENCY_SMOOTHING * (send_ms - self.send_ms)
+        if self.send_ms > CONGESTED_SEND_SHARE * 1000.0 / self.rate:
+            self._congested()
+            return
+        now = time.monotonic()
+        ceiling = self.rate_ceiling
+        if self.rate < ceiling and now - self._clean_since >= RATE_RECOVERY_SECONDS:
+            self._set_rate(min(ceiling, self.rate + 1), now)
+
+    def resync(self):
+        """Send the next position frame as a keyframe."""
+        self.delta_stream = self._queued_stream = None
+
+    def delta_bases(self, stream: DeltaStream) -> Tuple[int, ...]:
+        """Frames of `stream` this client may hold when its next frame is sent: the last sent and last queued."""
+        return tuple(seq for held, seq in ((self.delta_stream, self.delta_seq), (self._queued_stream, self._queued_seq))
+                     if held is stream)
+
+    def _delta_payload(self, frame: EncodedFrame) -> bytes:
+        now = time.monotonic()
+        delta = None
+        if frame.stream is self.delta_stream and now - self._keyframe_at < self.manager.keyframe_interval:
+            delta = frame.deltas.get(self.delta_seq)
+        self.delta_stream, self.delta_seq = frame.stream, frame.seq
+        if delta is None:
+            self._keyframe_at = now
+            self.manager.keyframes += 1
+            return frame.keyframe
+        self.manager.delta_frames += 1
+        self.manager.delta_escapes += delta[1]
+        return delta[0]
+
+    def enqueue(self, kind: str, payload: Union[str, EncodedFrame]):
+        if self.closed:
+            return
+        if isinstance(payload, EncodedFrame):
+            self._queued_stream, self._queued_seq = payload.stream, payload.seq
+        if kind == FRAME_POSITIONS:
+            for i, (queued_kind, _) in enumerate(self._queue):
+                if queued_kind == FRAME_POSITIONS:
+                    del self._queue[i]
+                    self._drop()
+                    self._congested()
+                    break
+        while len(self._queue) >= self.manager.max_queue:
+            self._queue.popleft()
+            self._drop()
+        self._queue.append((kind, payload))
+        self._wake.set()
+
+    def _drop(self):
+        self.dropped += 1
+        self.manager.dropped += 1
+
+    async def _drain(self):
+        while not self.closed:
+            if not self._queue:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            kind, payload = self._queue.popleft()
+            if isinstance(payload, EncodedFrame):
+                if self.encoding != "delta":  # switched back to JSON after this was queued
+                    continue
+                payload = self._delta_payload(payload)
+            send = self.websocket.send_bytes if isinstance(payload, bytes) else self.websocket.send_text
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(send(payload), self.manager.send_timeout)
+            except asyncio.TimeoutError:
+                await self.manager.close(self, "stalled")
+                return
+            except Exception:
+                await self.manager.close(self, "send_error")
+                return
+            self.last_send_ms = (time.perf_counter() - started) * 1000
+            self.sent += 1
+            self.bytes_sent += len(payload)
+            self.manager.sent += 1
+            self.manager.bytes_sent += len(payload)
+            if kind == FRAME_POSITIONS:
+                self._sent_frame(self.last_send_ms)
+
+
+class ConnectionManager:
+    """Connected /ws/realtime clients, each behind its own bounded send queue."""
+
+    def __init__(self, max_queue: int = 8, send_timeout: float = 10.0,
+                 min_rate: float = 1.0, max_rate: float = 5.0, default_rate: float = 1.0,
+                 resolve_watchlists: Optional[ResolveWatchlists] = None, keyframe_interval: float = 10.0):
+        self.resolve_watchlists = resolve_watchlists
+        self.keyframe_interval = keyframe_interval
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.default_rate = default_rate
+        self.clients: Dict[WebSocket, RealtimeClient] = {}
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.keyframes = 0
+        self.delta_frames = 0
+        self.delta_escapes = 0
+        self.resyncs = 0
+        self.stall_disconnects = 0
+        self.error_disconnects = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
+
+    async def connect(self, websocket: WebSocket) -> RealtimeClient:
+        await websocket.accept()
+        client = self.clients[websocket] = RealtimeClient(self, websocket)
+        client.start()
+        return client
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            client.stop()
+
+    async def close(self, client: RealtimeClient, reason: str):
+        """Drop a stalled or failed client and close its socket (best effort)."""
+        if reason == "stalled":
+            self.stall_disconnects += 1
+        else:
+            self.error_disconnects += 1
+        self.disconnect(client.websocket)
+        try:
+            await asyncio.wait_for(client.websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason=reason),
+                                   CLOSE_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+
+    async def handle(self, websocket: WebSocket, text: str):
+        """Handle one message from a client: configure, subscribe, unsubscribe or resync."""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        try:
+            message = json.loads(text)
+            if not isinstance(message, dict):
+                raise ValueError("expected a JSON object")
+            kind = message.get("type")
+            if kind == "configure":
+                reply = client.configure(message.get("rate"), message.get("frame_budget_ms"), message.get("encoding"))
+            elif kind == "subscribe":
+                client.subscription = await self.subscription_from(message)
+                reply = {"type": "subscribed", **client.subscription.describe()}
+            elif kind == "unsubscribe":
+                client.subscription = None
+                reply = {"type": "unsubscribed"}
+            elif kind == "resync":
+                if client.encoding == "delta":
+                    client.resync()
+                    self.resyncs += 1
+                return  # answered by the next frame being a keyframe
+            else:
+                raise ValueError(f"unknown message type {kind!r}")
+        except (ValueError, TypeError, LookupError) as e:
+            reply = {"type": "error", "message": str(e)}
+        client.enqueue(FRAME_CONTROL, dumps(reply))
+
+    async def subscription_from(self, message: dict) -> Subscription:
+        norad_ids = None
+        if message.get("norad_ids") is not None:
+            if not isinstance(message["norad_ids"], list):
+                raise ValueError("norad_ids must be a list")
+            norad_ids = {int(norad_id) for norad_id in message["norad_ids"]}
+        if message.get("profile_id") is not None or message.get("watchlists") is not None:
+            if message.get("profile_id") is None:
+                raise ValueError("watchlists need a profile_id")
+            if self.resolve_watchlists is None:
+                raise ValueError("watchlist subscriptions are not available")
+            selectors = message.get("watchlists")
+            if selectors is not None and not isinstance(selectors, list):
+                raise ValueError("watchlists must be a list of ids or names")
+            norad_ids = (norad_ids or set()) | await self.resolve_watchlists(int(message["profile_id"]), selectors)
+        bbox = parse_bbox(message["bbox"]) if message.get("bbox") is not None else None
+        if norad_ids is None and bbox is None:
+            return ALL_SATELLITES
+        return Subscription(norad_ids, bbox)
+
+    def due_clients(self, now: float, tick: float) -> List[RealtimeClient]:
+        return [client for client in list(self.clients.values())
+                if client.subscription is not None and client.due(now, tick)]
+
+    def send(self, websocket: WebSocket, message: dict):
+        """Queue a control message for one client."""
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.enqueue(FRAME_CONTROL, dumps(message))
+
+    def broadcast(self, message: dict):
+        self.broadcast_text(dumps(message), FRAME_CONTROL)
+
+    def broadcast_text(self, text: str, kind: str = FRAME_POSITIONS):
+        """Queue already-serialized text for every client; never waits on a socket."""
+        for client in list(self.clients.values()):
+            client.enqueue(kind, text)
+
+    def stats(self) -> dict:
+        clients = list(self.clients.values())
+        depths = [client.queue_depth for client in clients]
+        rates = [client.rate for client in clients]
+        return {
+            "clients": len(depths),
+            "subscriptions": len({client.subscription for client in clients} - {None}),
+            "min_rate": min(rates, default=None),
+            "mean_rate": round(sum(rates) / len(rates), 3) if rates else None,
+            "max_rate": max(rates, default=None),
+            "rate_changes": sum(client.rate_changes for client in clients),
+            "max_queue": self.max_queue,
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "delta_clients": sum(client.encoding == "delta" for client in clients),
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "keyframes": self.keyframes,
+            "delta_frames": self.delta_frames,
+            "delta_escapes": self.delta_escapes,
+            "resyncs": self.resyncs,
+            "stall_disconnects": self.stall_disconnects,
+            "error_disconnects": self.error_disconnects,
+        }
+
+
+# A subscription group: clients with the same subscription and encoding share one payload
+FrameGroup = Tuple[Subscription, str]
+
+# produce_frames(groups) -> JSON text ("json") or a PositionSnapshot ("delta") for each group
+ProduceFrames = Callable[[List[FrameGroup]], Dict[FrameGroup, Union[str, PositionSnapshot]]]
+
+
+class RealtimeBroadcaster:
+    """Tick task: produce_frames() once per tick with a due client, one payload per subscription group."""
+
+    def __init__(self, manager: ConnectionManager, produce_frames: ProduceFrames, interval: float = 0.2):
+        self.manager = manager
+        self.produce_frames = produce_frames
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._streams: Dict[Subscription, DeltaStream] = {}  # "delta" groups; touched by one tick at a time
+
+        self.ticks = 0
+        self.frames = 0
+        self.errors = 0
+        self.last_groups = 0
+        self.last_frame_bytes = 0
+        self.last_produce_ms: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the tick task. Must be called from the running event loop."""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            self.ticks += 1
+            due = self.manager.due_clients(time.monotonic(), self.interval)
+            if due:
+                try:
+                    await self._tick(due)
+                except Exception as e:
+                    self.errors += 1
+                    slog.error("realtime_tick_failed", error=str(e))
+            next_tick = max(next_tick + self.interval, time.monotonic())
+            await asyncio.sleep(next_tick - time.monotonic())
+
+    async def _tick(self, clients: List[RealtimeClient]):
+        started = time.perf_counter()
+        groups: Dict[FrameGroup, List[RealtimeClient]] = {}
+        for client in clients:
+            groups.setdefault((client.subscription, client.encoding), []).append(client)
+        live = {client.subscription for client in self.manager.clients.values() if client.encoding == "delta"}
+        for subscription in [s for s in self._streams if s not in live]:
+            del self._streams[subscription]
+        bases: Dict[FrameGroup, Set[int]] = {}
+        for (subscription, encoding), members in groups.items():
+            if encoding == "delta":
+                stream = self._streams.setdefault(subscription, DeltaStream())
+                bases[(subscription, encoding)] = {seq for client in members for seq in client.delta_bases(stream)}
+        frames = await asyncio.to_thread(self._produce, list(groups), bases)
+        for group, members in groups.items():
+            for client in members:
+                client.enqueue(FRAME_POSITIONS, frames[group])
+        self.frames += len(frames)
+        self.last_groups = len(frames)
+        self.last_frame_bytes = sum(len(frame) for frame in frames.values() if isinstance(frame, str))
+        self.last_produce_ms = (time.perf_counter() - started) * 1000
+
+    def _produce(self, groups: List[FrameGroup], bases: Dict[FrameGroup, Set[int]]) -> Dict[FrameGroup, Union[str, EncodedFrame]]:
+        """Worker thread: produce_frames(), then encode each "delta" group's snapshot once for all its members."""
+        frames = self.produce_frames(groups)
+        for group, group_bases in bases.items():
+            frames[group] = self._streams[group[0]].encode(frames[group], group_bases)
+        return frames
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "ticks": self.ticks,
+            "frames": self.frames,
+            "errors": self.errors,
+            "last_groups": self.last_groups,
+            "last_frame_bytes": self.last_frame_bytes,
+            "last_produce_ms": round(self.last_produce_ms, 3) if self.last_produce_ms is not None else None,
+            **self.manager.stats(),
+        }
@@ -0,0 +1,39 @@
+"""
+Shared fixtures for the backend test suite.
+
+Backend modules are flat (imported as `import log_store`, not as a package),
+so the backend directory goes on sys.path. `client` runs the app against a
+fresh database in a temp directory instead of backend/wa_map.db.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# ISS and two other sets with valid checksums, as a three-line TLE file
+SAMPLE_TLE = """ISS (ZARYA)
+1 25544U 98067A   25328.51782528  .00016717  00000-0  30246-3 0  9998
+2 25544  51.6415 293.1537 0003571 341.5211 138.4682 15.49711591542104
+AO-07
+1 10000U 74089B   25328.63325197 -.00000040  00000-0  41462-4 0  9991
+2 10000 101.9973 334.7103 0012252 160.6151 316.0496 12.53693653334884
+UO-11
+1 10001U 84021B   25328.66253352  .00001879  00000-0  20018-3 0  9998
+2 10001  97.7788 291.9758 0008716 131.8357 228.3606 14.90050575226666
+"""
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    import database
+    database.DB_PATH = tmp_path_factory.mktemp("db") / "wa_map.db"
+    import main
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as client:
+        response = client.post("/api/satellites/ingest", content=SAMPLE_TLE)
+        assert response.status_code == 200, response.text
+        yield client
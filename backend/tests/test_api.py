@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+
+@pytest.mark.parametrize("limit", [0, -1, 1001])
+def test_logs_limit_out_of_range_is_rejected(client, limit):
+    assert client.get("/api/logs", params={"limit": limit}).status_code == 422
+    assert client.get("/api/logs", params={"limit": limit, "q": "satellites"}).status_code == 422
+
+
+def test_logs_negative_offset_is_rejected(client):
+    assert client.get("/api/logs", params={"offset": -1}).status_code == 422
+
+
+def wait_for_logs(client, count, timeout=5.0):
+    """Request rows reach system_logs on the log writer's next flush."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if len(client.get("/api/logs", params={"limit": count, "category": "API"}).json()["logs"]) >= count:
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"fewer than {count} API log rows after {timeout} s")
+
+
+def test_logs_cursor_pages_without_repeats(client):
+    for norad_id in (25544, 10000, 10001, 25544, 10000):
+        client.get(f"/api/satellites/{norad_id}")
+    wait_for_logs(client, 5)
+    seen, cursor = [], None
+    for _ in range(50):
+        params = {"limit": 2, "category": "API"}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/logs", params=params).json()
+        seen.extend(log["id"] for log in body["logs"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) >= 5
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_logs_invalid_cursor_is_a_400(client):
+    assert client.get("/api/logs", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+@pytest.mark.parametrize("epoch_from", ["2025-11-01T00:00:00Z", "2025-11-01T00:00:00+00:00", "2025-11-01"])
+def test_catalog_epoch_filter_accepts_timezone_suffixes(client, epoch_from):
+    response = client.get("/api/satellites", params={"epoch_from": epoch_from})
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
+
+
+def test_catalog_epoch_filter_rejects_garbage(client):
+    assert client.get("/api/satellites", params={"epoch_from": "yesterday"}).status_code == 400
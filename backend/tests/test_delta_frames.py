@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from delta_frames import MISSING, DeltaDecoder, DeltaStream, PositionSnapshot, wrap_lon
+from realtime import FRAME_POSITIONS, ConnectionManager, RealtimeClient
+
+
+def snapshots(count, n=500, seed=0):
+    """Moving positions: small steps, a few jumps (escapes), failures, and the set changing."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n + 1, dtype=np.int32)
+    values = np.stack([rng.integers(-9_000_000, 9_000_000, n), rng.integers(-18_000_000, 18_000_000, n),
+                       rng.integers(200_000, 2_000_000, n)], axis=1).astype(np.int32)
+    result = []
+    for i in range(count):
+        values = values.copy()
+        values[values[:, 0] == MISSING] = 1000  # recovered
+        values[:, 0] += rng.integers(-500, 500, len(ids)).astype(np.int32)
+        values[:, 1] = wrap_lon(values[:, 1] + 3000)  # crosses the antimeridian
+        values[rng.integers(0, len(ids), 3), 2] += 100_000
+        values[rng.integers(0, len(ids), 2)] = MISSING
+        if i % 3 == 2:
+            keep = rng.random(len(ids)) > 0.05
+            ids, values = ids[keep], values[keep]
+            new = np.arange(ids.max() + 1, ids.max() + 11, dtype=np.int32)
+            ids, values = np.concatenate([ids, new]), np.concatenate([values, values[:10]])
+        order = rng.permutation(len(ids))  # snapshots sort themselves by NORAD id
+        result.append(PositionSnapshot(1_700_000_000 + i * 0.2, ids[order], values[order]))
+    return result
+
+
+def assert_decoded(decoder, snapshot):
+    assert np.array_equal(decoder.norad_ids, snapshot.norad_ids)
+    assert np.array_equal(decoder.values, snapshot.values)
+
+
+def test_deltas_round_trip_exactly():
+    stream, decoder = DeltaStream(), DeltaDecoder()
+    for i, snapshot in enumerate(snapshots(12)):
+        frame = stream.encode(snapshot, [stream.seq])
+        payload = frame.deltas[frame.seq - 1][0] if i else frame.keyframe
+        decoded = decoder.decode(payload)
+        assert decoded["keyframe"] == (i == 0)
+        assert decoded["time"] == snapshot.time
+        assert_decoded(decoder, snapshot)
+    failed = np.isnan(decoded["lat"])
+    assert np.array_equal(failed, snapshot.values[:, 0] == MISSING)
+    assert len(payload) < len(frame.keyframe) / 2
+
+
+def test_delta_against_an_older_base():
+    stream, decoder = DeltaStream(), DeltaDecoder()
+    frames = [stream.encode(snapshot, [1]) for snapshot in snapshots(5)]
+    decoder.decode(frames[0].keyframe)
+    decoder.decode(frames[4].deltas[1][0])  # a slower client skipping frames 2-4
+    assert decoder.seq == 5
+
+
+def test_decoder_rejects_a_delta_for_another_base():
+    stream, decoder = DeltaStream(), DeltaDecoder()
+    first, second, third = (stream.encode(snapshot, [1, 2]) for snapshot in snapshots(3))
+    decoder.decode(first.keyframe)
+    with pytest.raises(ValueError, match="Delta for frame 2 but holding frame 1"):
+        decoder.decode(third.deltas[2][0])
+
+
+def test_bases_outside_the_history_are_not_encoded():
+    stream = DeltaStream(history=2)
+    frames = [stream.encode(snapshot, [1]) for snapshot in snapshots(4)]
+    assert 1 in frames[2].deltas and 1 not in frames[3].deltas
+
+
+class FakeWebSocket:
+    pass
+
+
+def delta_client(keyframe_interval=10.0):
+    manager = ConnectionManager(keyframe_interval=keyframe_interval)
+    client = RealtimeClient(manager, FakeWebSocket())
+    client.configure(encoding="delta")
+    return manager, client
+
+
+def send_next(client):
+    kind, frame = client._queue.popleft()
+    assert kind == FRAME_POSITIONS
+    return client._delta_payload(frame)
+
+
+def test_client_gets_deltas_against_the_frame_it_was_sent():
+    manager, client = delta_client()
+    stream, decoder = DeltaStream(), DeltaDecoder()
+    for snapshot in snapshots(6):
+        client.enqueue(FRAME_POSITIONS, stream.encode(snapshot, client.delta_bases(stream)))
+        decoder.decode(send_next(client))
+        assert_decoded(decoder, snapshot)
+    assert (manager.keyframes, manager.delta_frames) == (1, 5)
+
+
+def test_client_gets_a_keyframe_when_its_base_was_dropped():
+    manager, client = delta_client()
+    stream, decoder = DeltaStream(), DeltaDecoder()
+    first, second, third = snapshots(3)
+    client.enqueue(FRAME_POSITIONS, stream.encode(first, client.delta_bases(stream)))
+    decoder.decode(send_next(client))
+    client.enqueue(FRAME_POSITIONS, stream.encode(second, client.delta_bases(stream)))
+    # Encoded against the queued frame 2 only; latest-wins then drops frame 2 before it is sent
+    frame = stream.encode(third, [2])
+    client.enqueue(FRAME_POSITIONS, frame)
+    assert client.dropped == 1
+    decoded = decoder.decode(send_next(client))
+    assert decoded["keyframe"]
+    assert_decoded(decoder, third)
+
+
+def test_dropped_frame_still_gets_a_delta_against_the_last_sent_frame():
+    manager, client = delta_client()
+    stream, decoder = DeltaStream(), DeltaDecoder()
+    first, second, third = snapshots(3)
+    client.enqueue(FRAME_POSITIONS, stream.encode(first, client.delta_bases(stream)))
+    decoder.decode(send_next(client))
+    client.enqueue(FRAME_POSITIONS, stream.encode(second, client.delta_bases(stream)))
+    client.enqueue(FRAME_POSITIONS, stream.encode(third, client.delta_bases(stream)))  # drops frame 2
+    decoded = decoder.decode(send_next(client))
+    assert not decoded["keyframe"]
+    assert_decoded(decoder, third)
+
+
+def test_resync_and_keyframe_interval_force_keyframes():
+    manager, client = delta_client(keyframe_interval=0.0)
+    stream = DeltaStream()
+    kinds = []
+    for snapshot in snapshots(3):
+        client.enqueue(FRAME_POSITIONS, stream.encode(snapshot, client.delta_bases(stream)))
+        kinds.append(DeltaDecoder().decode(send_next(client))["keyframe"])
+    assert kinds == [True, True, True]
+
+    manager, client = delta_client()
+    decoder = DeltaDecoder()
+    for i, snapshot in enumerate(snapshots(3)):
+        if i == 2:
+            client.resync()
+        client.enqueue(FRAME_POSITIONS, stream.encode(snapshot, client.delta_bases(stream)))
+        kinds.append(decoder.decode(send_next(client))["keyframe"])
+    assert kinds[3:] == [True, False, True]
@@ -0,0 +1,54 @@
+import pytest
+
+from log_sampling import LogSampler, TokenBucket
+
+
+def never_sampled():
+    return 0.999  # rng draw above every rate below 1
+
+
+def test_token_bucket_refuses_once_empty():
+    bucket = TokenBucket(rate=0.0, capacity=3)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+
+
+def test_token_bucket_refills_at_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("log_sampling.time.monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    assert bucket.take() and bucket.take() and not bucket.take()
+    now[0] += 0.5  # one token
+    assert bucket.take() and not bucket.take()
+    now[0] += 60  # refill is capped at capacity
+    assert [bucket.take() for _ in range(3)] == [True, True, False]
+
+
+@pytest.mark.parametrize("level, duration_ms", [("warning", 1.0), ("error", 1.0), ("info", 500.0)])
+def test_warnings_errors_and_slow_requests_are_always_kept(level, duration_ms):
+    sampler = LogSampler(endpoint_rates={"/api/satellites/positions": 0.0}, slow_ms=500.0,
+                         max_rows_per_second=0.0, burst=0.0, rng=never_sampled)
+    assert all(sampler.should_keep("/api/satellites/positions", level, duration_ms) for _ in range(10))
+    assert sampler.dropped_total == 0
+
+
+def test_endpoint_rates_match_longest_prefix():
+    sampler = LogSampler(endpoint_rates={"/api/logs": 0.5, "/api/logs/export": 0.0})
+    assert sampler.rate_for("/api/logs/export") == 0.0
+    assert sampler.rate_for("/api/logs?limit=5") == 0.5
+    assert sampler.rate_for("/api/health") == 1.0
+
+
+def test_sampled_drops_are_counted_per_route_template():
+    sampler = LogSampler(endpoint_rates={"/api/satellites/": 0.1}, rng=never_sampled)
+    for norad_id in (25544, 10000, 10001):
+        assert not sampler.should_keep(f"/api/satellites/{norad_id}", "info", 1.0, "/api/satellites/{norad_id}")
+    summary = sampler.take_summary()
+    assert summary == {"dropped": 3, "sampled": {"/api/satellites/{norad_id}": 3}, "rate_limited": {}}
+    assert sampler.take_summary() is None
+
+
+def test_rows_over_the_budget_are_rate_limited():
+    sampler = LogSampler(max_rows_per_second=0.0, burst=2)
+    kept = [sampler.should_keep("/api/catalog", "info", 1.0) for _ in range(5)]
+    assert kept == [True, True, False, False, False]
+    assert sampler.take_summary()["rate_limited"] == {"/api/catalog": 3}
@@ -0,0 +1,109 @@
+import sqlite3
+
+import pytest
+
+from log_store import LOG_COLUMNS, PartitionedLogStore, fts_query
+
+
+def log_row(timestamp, message="GET /api/satellites", level="info"):
+    # LOG_COLUMNS[1:] order
+    return (timestamp, None, "anonymous", level, "API", "/api/satellites", "GET", message, None, 200, 1.5)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def store(conn):
+    store = PartitionedLogStore(partition_hours=1)
+    store.init(conn)
+    return store
+
+
+def test_rows_are_routed_to_hourly_partitions(store, conn):
+    store.insert(conn, [log_row("2025-11-25T10:59:59"), log_row("2025-11-25T11:00:00"),
+                        log_row("2025-11-25T11:30:00")])
+    assert store.partitions == ("system_logs_p2025112510", "system_logs_p2025112511")
+    assert [row[0] for row in conn.execute("SELECT COUNT(*) FROM system_logs_p2025112511")] == [2]
+
+
+def test_keyset_paging_walks_every_row_across_partitions(store, conn):
+    timestamps = [f"2025-11-25T{hour:02d}:{minute:02d}:00" for hour in (9, 10, 13) for minute in (0, 15, 30, 45)]
+    # Two rows share a timestamp: the id breaks the tie
+    store.insert(conn, [log_row(t) for t in timestamps] + [log_row("2025-11-25T10:15:00")])
+    expected = [(row["timestamp"], row["id"]) for chunk in store.iter_chunks(conn, "1=1", [], 100)
+                for row in chunk][::-1]
+
+    seen, position = [], None
+    while True:
+        rows = store.page(conn, "1=1", [], 4, position=position)
+        page = rows[:4]
+        seen.extend((row["timestamp"], row["id"]) for row in page)
+        if len(rows) <= 4:
+            break
+        position = (page[-1]["timestamp"], page[-1]["id"])
+    assert seen == expected
+    assert len(seen) == len(timestamps) + 1
+
+
+def test_page_filters_and_offset(store, conn):
+    store.insert(conn, [log_row(f"2025-11-25T10:{m:02d}:00", level="error" if m % 2 else "info")
+                        for m in range(10)])
+    rows = store.page(conn, "level = ?", ["error"], 2, offset=1)
+    assert [row["timestamp"] for row in rows] == ["2025-11-25T10:07:00", "2025-11-25T10:05:00",
+                                                 "2025-11-25T10:03:00"]
+
+
+def test_partition_ranges_end_after_partition_hours_despite_gaps(store, conn):
+    store.insert(conn, [log_row("2025-11-20T10:05:00"), log_row("2025-11-25T09:00:00")])
+    assert store.live_partitions(newest_first=False)[0][2] == "2025-11-20T11:00:00"
+
+
+def test_drop_expired_keeps_only_partitions_inside_retention(store, conn):
+    store.insert(conn, [log_row("2025-11-20T10:05:00"), log_row("2025-11-20T10:06:00"),
+                        log_row("2025-11-23T09:10:00"), log_row("2025-11-25T09:00:00")])
+    removed = store.drop_expired(conn, "2025-11-23T09:30:00")
+    assert removed == 2
+    # The 09:00 partition still holds rows at or after the cutoff's hour
+    assert store.partitions == ("system_logs_p2025112309", "system_logs_p2025112509")
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'system_logs_p2025112010_fts'").fetchone() is None
+
+
+def test_ids_stay_increasing_across_partitions(store, conn):
+    store.insert(conn, [log_row("2025-11-25T12:00:00"), log_row("2025-11-25T09:00:00")])
+    store.insert(conn, [log_row("2025-11-25T10:00:00")])
+    ids = [row["id"] for chunk in store.iter_chunks(conn, "1=1", [], 10) for row in chunk]
+    assert sorted(ids) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("satellite", '"satellite"'),
+    ("sat* ingest", '"sat"* "ingest"'),
+    ('say "hi"', '"say" """hi"""'),
+    ("a OR b", '"a" "OR" "b"'),
+    ("NEAR(x y) -z", '"NEAR(x" "y)" "-z"'),
+    ("*** ", ""),
+])
+def test_fts_query_quotes_every_term(text, expected):
+    assert fts_query(text) == expected
+
+
+@pytest.mark.parametrize("text", ['"unbalanced', "a AND (b", "col:value", "^start", "x* OR -y", "'; DROP"])
+def test_search_accepts_fts_syntax_as_plain_text(store, conn, text):
+    store.insert(conn, [log_row("2025-11-25T10:00:00", message=f"payload {text} here")])
+    results = store.search(conn, text, "1=1", [], 10)
+    assert all(set(row) >= set(LOG_COLUMNS) for row in results)
+
+
+def test_search_matches_and_highlights(store, conn):
+    store.insert(conn, [log_row("2025-11-25T10:00:00", message="ingest finished"),
+                        log_row("2025-11-25T11:00:00", message="positions served")])
+    results = store.search(conn, "ingest", "1=1", [], 10)
+    assert [row["message"] for row in results] == ["ingest finished"]
+    assert results[0]["message_highlight"] == "<mark>ingest</mark> finished"
+    assert store.count_matches(conn, "pos*", "1=1", []) == 1
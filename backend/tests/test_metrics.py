@@ -0,0 +1,48 @@
+import math
+import random
+
+import pytest
+
+from metrics import GROWTH, LatencyHistogram, RequestMetrics
+
+# A bucket midpoint is within sqrt(GROWTH) of anything in its bucket
+QUANTILE_RELATIVE_ERROR = math.sqrt(GROWTH) - 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("q", [0.5, 0.95, 0.99])
+def test_quantile_is_within_the_bucket_error_bound(seed, q):
+    rng = random.Random(seed)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(5000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    exact = sorted(values)[math.ceil(q * len(values)) - 1]
+    assert abs(histogram.quantile(q) - exact) <= QUANTILE_RELATIVE_ERROR * exact
+
+
+def test_quantile_is_clamped_to_observed_range():
+    histogram = LatencyHistogram()
+    histogram.record(42.0)
+    assert histogram.quantile(0.5) == histogram.quantile(0.99) == 42.0
+    assert LatencyHistogram().quantile(0.5) is None
+
+
+def test_merged_and_round_tripped_histograms_agree():
+    rng = random.Random(1)
+    a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(2000):
+        value = rng.expovariate(0.05)
+        (a if i % 2 else b).record(value)
+        both.record(value)
+    a.merge(b)
+    restored = LatencyHistogram.from_buckets(a.to_buckets(), a.total, a.min, a.max)
+    assert restored.summary() == both.summary()
+
+
+def test_prometheus_output_escapes_labels():
+    metrics = RequestMetrics()
+    metrics.observe('GET"\\', "/api/satellites/{norad_id}", 200, 12.0)
+    text = metrics.to_prometheus()
+    assert 'method="GET\\"\\\\"' in text
+    assert 'route="/api/satellites/{norad_id}"' in text
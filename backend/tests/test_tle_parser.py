@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from conftest import SAMPLE_TLE
+from tle_parser import check_tle_line, detect_format, make_parser, omm_to_tle, tle_checksum
+
+ISS_LINE1 = SAMPLE_TLE.splitlines()[1]
+ISS_LINE2 = SAMPLE_TLE.splitlines()[2]
+
+ISS_OMM = {
+    "OBJECT_NAME": "ISS (ZARYA)", "OBJECT_ID": "1998-067A", "EPOCH": "2025-11-24T12:25:40.104192",
+    "MEAN_MOTION": "15.49711591", "ECCENTRICITY": "0.0003571", "INCLINATION": "51.6415",
+    "RA_OF_ASC_NODE": "293.1537", "ARG_OF_PERICENTER": "341.5211", "MEAN_ANOMALY": "138.4682",
+    "EPHEMERIS_TYPE": "0", "CLASSIFICATION_TYPE": "U", "NORAD_CAT_ID": "25544", "ELEMENT_SET_NO": "999",
+    "REV_AT_EPOCH": "54210", "BSTAR": "0.00030246", "MEAN_MOTION_DOT": "0.00016717", "MEAN_MOTION_DDOT": "0",
+}
+
+
+def parse(format, text, chunk=None):
+    parser = make_parser(format)
+    chunks = [text] if chunk is None else [text[i:i + chunk] for i in range(0, len(text), chunk)]
+    for part in chunks:
+        parser.feed(part)
+    parser.close()
+    return parser.take(), parser
+
+
+def test_checksum_counts_digits_and_minus_signs():
+    assert tle_checksum(ISS_LINE1) == int(ISS_LINE1[-1])
+    assert tle_checksum("--- ABC" + "0" * 61 + "9") == 3  # letters and column 69 are ignored
+
+
+def test_check_tle_line_rejects_bad_checksum_and_length():
+    assert check_tle_line(ISS_LINE1) is None
+    broken = ISS_LINE1[:-1] + str((int(ISS_LINE1[-1]) + 1) % 10)
+    assert "checksum mismatch" in check_tle_line(broken)
+    assert check_tle_line(ISS_LINE1[:-2]) == "expected 69 characters, got 67"
+
+
+@pytest.mark.parametrize("chunk", [None, 1, 7, 64])
+def test_tle_parser_handles_three_line_sets_in_any_chunking(chunk):
+    records, parser = parse("tle", SAMPLE_TLE, chunk)
+    assert [(r["noradId"], r["name"]) for r in records] == [(25544, "ISS (ZARYA)"), (10000, "AO-07"), (10001, "UO-11")]
+    assert parser.error_count == 0
+
+
+def test_tle_parser_accepts_two_line_sets_and_name_prefix():
+    text = f"0 ISS\n{ISS_LINE1}\n{ISS_LINE2}\n" + "\n".join(SAMPLE_TLE.splitlines()[4:6])
+    records, _ = parse("tle", text)
+    assert [r["name"] for r in records] == ["ISS", "10000"]
+
+
+def test_tle_parser_reports_errors_per_line_and_continues():
+    bad = ISS_LINE2[:-1] + str((int(ISS_LINE2[-1]) + 1) % 10)
+    lines = SAMPLE_TLE.splitlines()
+    text = "\n".join([lines[0], ISS_LINE1, bad, ISS_LINE2, *lines[3:]])
+    records, parser = parse("tle", text)
+    assert [r["noradId"] for r in records] == [10000, 10001]
+    assert [(e["line"], e["error"].split(":")[0]) for e in parser.errors] == [
+        (3, "TLE line 2"), (4, "TLE line 2 without a preceding line 1")]
+
+
+def test_omm_to_tle_reproduces_the_tle():
+    name, line1, line2 = omm_to_tle(ISS_OMM)
+    assert name == "ISS (ZARYA)"
+    assert check_tle_line(line1) is None and check_tle_line(line2) is None
+    assert line1[:62] == ISS_LINE1[:62]  # up to the element set number
+    assert line2[:63] == ISS_LINE2[:63]
+
+
+def test_omm_to_tle_requires_elements():
+    omm = dict(ISS_OMM)
+    del omm["MEAN_MOTION"]
+    with pytest.raises(ValueError, match="MEAN_MOTION"):
+        omm_to_tle(omm)
+
+
+def test_omm_json_xml_and_csv_parse_the_same_record():
+    xml = ("<ndm><omm><body><segment><data><meanElements>"
+           + "".join(f"<{k}>{v}</{k}>" for k, v in ISS_OMM.items())
+           + "</meanElements></data></segment></body></omm></ndm>")
+    csv = ",".join(ISS_OMM) + "\n" + ",".join(ISS_OMM.values()) + "\n"
+    parsed = {format: parse(format, text, 16)[0] for format, text in
+              (("json", json.dumps([ISS_OMM])), ("xml", xml), ("csv", csv))}
+    assert [r["tleLine2"] for records in parsed.values() for r in records] == [parsed["json"][0]["tleLine2"]] * 3
+
+
+def test_omm_json_reports_bad_sets_individually():
+    records, parser = parse("json", json.dumps([ISS_OMM, {"OBJECT_NAME": "x"}, 5]))
+    assert len(records) == 1
+    assert [e["set"] for e in parser.errors] == [2, 3]
+
+
+@pytest.mark.parametrize("head, format", [
+    (SAMPLE_TLE, "tle"), ("[{\"OBJECT_NAME\": 1}]", "json"), ("<?xml version='1.0'?><ndm>", "xml"),
+    ("OBJECT_NAME,NORAD_CAT_ID\n", "csv"),
+])
+def test_detect_format(head, format):
+    assert detect_format(head) == format
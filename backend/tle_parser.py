@@ -0,0 +1,365 @@
+"""
+Streaming Catalog Parsers (TLE / 3LE / OMM)
+
+Incremental parsers for element set files: feed() text as it arrives, take()
+the catalog records parsed so far, close() at end of input. Nothing buffers
+the whole file except OMM JSON, which has no streaming decoder in the stdlib.
+
+FORMATS:
+- tle   two-line or three-line (name + 2 lines, "0 NAME" accepted) sets, mixed freely
+- xml   CCSDS OMM XML (CelesTrak/Space-Track NDM), parsed with XMLPullParser
+- json  OMM JSON array of objects (or a single object)
+- csv   OMM CSV with a header row of OMM keywords
+
+VALIDATION:
+- TLE lines must be 69 characters with a valid mod-10 checksum
+- OMM sets are converted to TLE lines (with checksums) so every format lands
+  in the catalog through catalog.make_record()
+- errors are collected per input line ({"line": n, "error": "..."}) and never
+  abort the parse; XML/JSON errors are reported per element set
+"""
+
+import csv
+import json
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from catalog import make_record
+
+
+FORMATS = ("tle", "xml", "json", "csv")
+
+# Errors kept per parse; further errors are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+# Keeps digits, maps '-' to '1' and deletes everything else, so the checksum is a byte sum
+_CHECKSUM_TABLE = {code: None for code in range(128)}
+_CHECKSUM_TABLE.update({ord(d): d for d in "0123456789"})
+_CHECKSUM_TABLE[ord("-")] = "1"
+
+
+def tle_checksum(line: str) -> int:
+    """Mod-10 checksum over the first 68 columns: digits count as their value, '-' as 1."""
+    digits = line[:68].translate(_CHECKSUM_TABLE).encode("ascii", "ignore")
+    return (sum(digits) - 48 * len(digits)) % 10
+
+
+def check_tle_line(line: str) -> Optional[str]:
+    """Error message for a malformed TLE data line, or None if it is valid."""
+    if len(line) != 69:
+        return f"expected 69 characters, got {len(line)}"
+    if not line[68].isdigit() or tle_checksum(line) != int(line[68]):
+        return f"checksum mismatch (expected {tle_checksum(line)})"
+    return None
+
+
+def detect_format(head: str) -> str:
+    """Guess the format from the start of the input."""
+    text = head.lstrip("\ufeff \t\r\n")
+    if text.startswith("<"):
+        return "xml"
+    if text.startswith(("[", "{")):
+        return "json"
+    first_line = text.split("\n", 1)[0].upper()
+    if "," in first_line and ("NORAD_CAT_ID" in first_line or "OBJECT_NAME" in first_line):
+        return "csv"
+    return "tle"
+
+
+# -- OMM -> TLE ---------------------------------------------------------------
+
+def _format_implied(value: float) -> str:
+    """Inverse of the TLE implied-decimal field: 0.00012345 -> ' 12345-3'."""
+    if value == 0:
+        return " 00000-0"
+    sign = "-" if value < 0 else " "
+    mantissa, exponent = abs(value), 0
+    while mantissa >= 1:
+        mantissa /= 10
+        exponent += 1
+    while mantissa < 0.1:
+        mantissa *= 10
+        exponent -= 1
+    digits = round(mantissa * 1e5)
+    if digits == 100000:
+        digits, exponent = 10000, exponent + 1
+    if not -9 <= exponent <= 9:
+        raise ValueError(f"{value} does not fit a TLE exponent field")
+    return f"{sign}{digits:05d}{'-' if exponent < 0 else '+'}{abs(exponent)}"
+
+
+def _format_ndot(value: float) -> str:
+    text = f"{abs(value):.8f}"
+    if not text.startswith("0."):
+        raise ValueError(f"MEAN_MOTION_DOT {value} does not fit the TLE field")
+    return ("-" if value < 0 else " ") + text[1:]
+
+
+def _format_eccentricity(value: float) -> str:
+    if not 0 <= value < 1:
+        raise ValueError(f"ECCENTRICITY {value} is outside [0, 1)")
+    return f"{value:.7f}"[2:]
+
+
+def _intl_to_tle(object_id: str) -> str:
+    # "1998-067A" -> "98067A"
+    if len(object_id) >= 8 and object_id[4] == "-":
+        return object_id[2:4] + object_id[5:]
+    return object_id
+
+
+def _with_checksum(line: str) -> str:
+    return line + str(tle_checksum(line))
+
+
+def omm_to_tle(omm: Dict[str, str]) -> Tuple[str, str, str]:
+    """(name, line1, line2) for an OMM mean-element set keyed by OMM keywords."""
+    try:
+        norad_id = int(omm["NORAD_CAT_ID"])
+        epoch = datetime.fromisoformat(omm["EPOCH"].rstrip("Z"))
+        day_of_year = (epoch - datetime(epoch.year, 1, 1)).total_seconds() / 86400 + 1
+        line1 = (f"1 {norad_id:05d}{(omm.get('CLASSIFICATION_TYPE') or 'U')[:1]} "
+                 f"{_intl_to_tle(omm.get('OBJECT_ID') or ''):<8.8} "
+                 f"{epoch.year % 100:02d}{day_of_year:012.8f} "
+                 f"{_format_ndot(float(omm.get('MEAN_MOTION_DOT') or 0))} "
+                 f"{_format_implied(float(omm.get('MEAN_MOTION_DDOT') or 0))} "
+                 f"{_format_implied(float(omm.get('BSTAR') or 0))} "
+                 f"{str(omm.get('EPHEMERIS_TYPE') or 0)[:1]} "
+                 f"{int(omm.get('ELEMENT_SET_NO') or 0) % 10000:4d}")
+        line2 = (f"2 {norad_id:05d} "
+                 f"{float(omm['INCLINATION']):8.4f} "
+                 f"{float(omm['RA_OF_ASC_NODE']):8.4f} "
+                 f"{_format_eccentricity(float(omm['ECCENTRICITY']))} "
+                 f"{float(omm['ARG_OF_PERICENTER']):8.4f} "
+                 f"{float(omm['MEAN_ANOMALY']):8.4f} "
+                 f"{float(omm['MEAN_MOTION']):11.8f}"
+                 f"{int(omm.get('REV_AT_EPOCH') or 0) % 100000:5d}")
+    except KeyError as e:
+        raise ValueError(f"missing OMM field {e.args[0]}")
+    if norad_id > 99999:
+        raise ValueError(f"NORAD_CAT_ID {norad_id} does not fit the TLE format")
+    return omm.get("OBJECT_NAME") or str(norad_id), _with_checksum(line1), _with_checksum(line2)
+
+
+# -- Parsers ------------------------------------------------------------------
+
+class CatalogParser:
+    """Base for incremental parsers: feed() text, take() records, close() at EOF."""
+
+    format = ""
+
+    def __init__(self):
+        self._records: List[dict] = []
+        self.errors: List[dict] = []
+        self.error_count = 0
+        self.parsed = 0
+
+    def feed(self, text: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def take(self) -> List[dict]:
+        """Records parsed since the last call."""
+        records, self._records = self._records, []
+        return records
+
+    def _error(self, message: str, line: Optional[int] = None, set_no: Optional[int] = None):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            error = {"line": line, "error": message}
+            if set_no is not None:
+                error["set"] = set_no
+            self.errors.append(error)
+
+    def _add(self, name: str, line1: str, line2: str, line: Optional[int] = None, set_no: Optional[int] = None):
+        try:
+            self._records.append(make_record(name, line1, line2))
+            self.parsed += 1
+        except ValueError as e:
+            self._error(str(e), line, set_no)
+
+    def _add_omm(self, omm: Dict[str, str], line: Optional[int] = None, set_no: Optional[int] = None):
+        try:
+            name, line1, line2 = omm_to_tle(omm)
+        except ValueError as e:
+            self._error(str(e), line, set_no)
+            return
+        self._add(name, line1, line2, line, set_no)
+
+
+class _LineParser(CatalogParser):
+    """Splits fed text into numbered lines, carrying a partial last line over."""
+
+    def __init__(self):
+        super().__init__()
+        self._partial = ""
+        self._line_no = 0
+
+    def feed(self, text: str):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._line_no += 1
+            self._line(self._line_no, line.rstrip("\r"))
+
+    def close(self):
+        if self._partial:
+            self._line_no += 1
+            self._line(self._line_no, self._partial.rstrip("\r"))
+            self._partial = ""
+
+    def _line(self, line_no: int, line: str):
+        raise NotImplementedError
+
+
+class TLEParser(_LineParser):
+    """Two- and three-line element sets; a name line applies to the next set only."""
+
+    format = "tle"
+
+    def __init__(self):
+        super().__init__()
+        self._name: Optional[str] = None
+        self._line1: Optional[Tuple[int, str]] = None
+
+    def _line(self, line_no: int, line: str):
+        line = line.rstrip()
+        if not line:
+            return
+        if line.startswith("1 ") and _is_data_line(line):
+            self._orphan_line1()
+            problem = check_tle_line(line)
+            if problem:
+                self._error(f"TLE line 1: {problem}", line_no)
+                self._name = None
+            else:
+                self._line1 = (line_no, line)
+        elif line.startswith("2 ") and _is_data_line(line):
+            if self._line1 is None:
+                self._error("TLE line 2 without a preceding line 1", line_no)
+            else:
+                problem = check_tle_line(line)
+                if problem:
+                    self._error(f"TLE line 2: {problem}", line_no)
+                else:
+                    line1 = self._line1[1]
+                    self._add(self._name or line1[2:7].strip(), line1, line, line_no)
+            self._line1, self._name = None, None
+        else:
+            self._orphan_line1()
+            self._name = line[2:] if line.startswith("0 ") else line
+
+    def _orphan_line1(self):
+        if self._line1 is not None:
+            self._error("TLE line 1 without a following line 2", self._line1[0])
+            self._line1 = None
+
+    def close(self):
+        super().close()
+        self._orphan_line1()
+
+
+class OMMCSVParser(_LineParser):
+    """OMM CSV: first non-empty line is the header of OMM keywords."""
+
+    format = "csv"
+
+    def __init__(self):
+        super().__init__()
+        self._header: Optional[List[str]] = None
+
+    def _line(self, line_no: int, line: str):
+        if not line.strip():
+            return
+        values = next(csv.reader([line]))
+        if self._header is None:
+            self._header = [h.strip().upper() for h in values]
+            return
+        if len(values) != len(self._header):
+            self._error(f"expected {len(self._header)} columns, got {len(values)}", line_no)
+            return
+        self._add_omm(dict(zip(self._header, values)), line_no)
+
+
+class OMMXMLParser(CatalogParser):
+    """CCSDS OMM XML; each <omm> element is one set, keyed by its leaf tag names."""
+
+    format = "xml"
+
+    def __init__(self):
+        super().__init__()
+        self._parser = ET.XMLPullParser(events=("end",))
+        self._sets = 0
+        self._failed = False
+
+    def feed(self, text: str):
+        self._run(self._parser.feed, text)
+
+    def close(self):
+        self._run(self._parser.close)
+
+    def _run(self, step, *args):
+        if self._failed:
+            return
+        try:
+            step(*args)
+            for _, element in self._parser.read_events():
+                if _local(element.tag) == "omm":
+                    self._sets += 1
+                    omm = {_local(child.tag).upper(): (child.text or "").strip()
+                           for child in element.iter() if len(child) == 0}
+                    element.clear()
+                    self._add_omm(omm, set_no=self._sets)
+        except ET.ParseError as e:
+            # Malformed XML cannot be resynchronized; keep what was parsed before it
+            self._failed = True
+            self._error(f"XML parse error: {e}", e.position[0] if e.position else None)
+
+
+class OMMJSONParser(CatalogParser):
+    """OMM JSON array (or single object); buffered, then decoded in one json.loads."""
+
+    format = "json"
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[str] = []
+
+    def feed(self, text: str):
+        self._chunks.append(text)
+
+    def close(self):
+        text, self._chunks = "".join(self._chunks), []
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            self._error(f"JSON parse error: {e}", getattr(e, "lineno", None))
+            return
+        for set_no, omm in enumerate(data if isinstance(data, list) else [data], start=1):
+            if not isinstance(omm, dict):
+                self._error("expected an OMM object", set_no=set_no)
+                continue
+            self._add_omm({key.upper(): "" if value is None else str(value) for key, value in omm.items()},
+                          set_no=set_no)
+
+
+PARSERS = {"tle": TLEParser, "xml": OMMXMLParser, "json": OMMJSONParser, "csv": OMMCSVParser}
+
+
+def make_parser(format: str) -> CatalogParser:
+    if format not in PARSERS:
+        raise ValueError(f"format must be one of auto, {', '.join(FORMATS)}")
+    return PARSERS[format]()
+
+
+def _is_data_line(line: str) -> bool:
+    # "1 25544U ..." / "2 25544 ...": a NORAD id follows, unlike a name that happens to start with "1 "
+    return line[2:7].strip().isdigit()
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
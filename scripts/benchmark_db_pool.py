@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+SQLite Connection Pool Benchmark
+
+Compares the legacy data access pattern (new connection per call, rollback
+journal) against the pooled WAL connections in backend/database.py, using a
+mixed workload that mirrors the API: log inserts from the request logger
+running concurrently with GET /api/logs and profile reads.
+
+Each "request" is the SQL one endpoint call performs. The benchmark runs
+against a throwaway copy of the schema in a temp directory, never wa_map.db.
+
+Usage:
+    python scripts/benchmark_db_pool.py                    # 5s per mode, 8 threads
+    python scripts/benchmark_db_pool.py --seconds 10 --threads 16 --write-ratio 0.5
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Backend modules live next to main.py, not in a package
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import database  # noqa: E402
+
+
+SCHEMA = """
+CREATE TABLE system_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, profile_id INTEGER,
+    username TEXT DEFAULT 'anonymous', level TEXT NOT NULL, category TEXT, endpoint TEXT,
+    method TEXT, message TEXT NOT NULL, request_body TEXT, response_status INTEGER, duration_ms REAL
+);
+CREATE INDEX idx_system_logs_timestamp ON system_logs(timestamp);
+CREATE TABLE profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL, display_name TEXT, role TEXT DEFAULT 'user');
+INSERT INTO profiles (username, password_hash, display_name) VALUES ('default', 'x', 'Default User');
+"""
+
+INSERT_LOG = """INSERT INTO system_logs (timestamp, profile_id, username, level, category, endpoint,
+    method, message, request_body, response_status, duration_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+READ_LOGS = "SELECT * FROM system_logs WHERE timestamp >= ? ORDER BY timestamp DESC LIMIT 100"
+READ_PROFILES = "SELECT id, username, display_name, role FROM profiles"
+
+
+def make_db(directory: Path, seed_rows: int) -> Path:
+    path = directory / "bench.db"
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    start = datetime.utcnow() - timedelta(hours=48)
+    conn.executemany(INSERT_LOG, (
+        ((start + timedelta(seconds=i * 10)).isoformat(), 1, "default", "info", "API",
+         "/api/profiles", "GET", "GET /api/profiles", None, 200, 1.5)
+        for i in range(seed_rows)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def log_row():
+    return (datetime.utcnow().isoformat(), 1, "default", "info", "API", "/api/profiles",
+            "GET", "GET /api/profiles", None, 200, round(random.random() * 10, 2))
+
+
+class LegacyAccess:
+    """connect / execute / commit / close per call, default journal mode."""
+
+    def __init__(self, path: Path):
+        self.path = str(path)
+
+    def write(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute(INSERT_LOG, log_row())
+        conn.commit()
+        conn.close()
+
+    def read(self, sql, params=()):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(sql, params).fetchall()
+        conn.close()
+        return rows
+
+
+class PooledAccess:
+    """backend/database.py ConnectionPool (WAL, tuned pragmas, reader/writer split)."""
+
+    def __init__(self, path: Path):
+        database.DB_PATH = path
+        self.pool = database.ConnectionPool(max_readers=database.DB_MAX_WORKERS)
+        with self.pool.writer():
+            pass  # switch the file to WAL before readers attach
+
+    def write(self):
+        with self.pool.writer() as conn:
+            conn.execute(INSERT_LOG, log_row())
+
+    def read(self, sql, params=()):
+        with self.pool.reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+
+def run(access, seconds: float, threads: int, write_ratio: float) -> dict:
+    counts = {"writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    since = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+
+    def worker():
+        local = {"writes": 0, "reads": 0, "locked": 0}
+        while time.perf_counter() < deadline:
+            try:
+                if random.random() < write_ratio:
+                    access.write()
+                    local["writes"] += 1
+                elif random.random() < 0.5:
+                    access.read(READ_LOGS, (since,))
+                    local["reads"] += 1
+                else:
+                    access.read(READ_PROFILES)
+                    local["reads"] += 1
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                local["locked"] += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    counts["requests_per_sec"] = round((counts["writes"] + counts["reads"]) / elapsed, 1)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark legacy vs pooled SQLite access")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration per mode")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent request threads")
+    parser.add_argument("--write-ratio", type=float, default=0.3, help="Fraction of requests that insert a log row")
+    parser.add_argument("--seed-rows", type=int, default=20000, help="Log rows preloaded before the run")
+    args = parser.parse_args()
+
+    results = {}
+    for name, factory in (("legacy", LegacyAccess), ("pooled", PooledAccess)):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = make_db(Path(tmp), args.seed_rows)
+            access = factory(path)
+            results[name] = run(access, args.seconds, args.threads, args.write_ratio)
+            if isinstance(access, PooledAccess):
+                access.pool.close()
+
+    print(f"{'mode':<8} {'req/s':>10} {'reads':>9} {'writes':>9} {'locked':>8}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['requests_per_sec']:>10} {r['reads']:>9} {r['writes']:>9} {r['locked']:>8}")
+    legacy_rps = results["legacy"]["requests_per_sec"]
+    if legacy_rps:
+        print(f"\nSpeedup: {results['pooled']['requests_per_sec'] / legacy_rps:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
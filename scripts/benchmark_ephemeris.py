@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Ephemeris Table Benchmark
+
+Builds backend/ephemeris_tables.py Chebyshev tables for a synthetic catalog,
+checks them against direct SGP4 at random times across the window, and
+times a run of high-rate ticks (default 10 Hz, as a fast /ws/realtime
+client would need) three ways: direct SGP4 (SatrecArray), the ephemeris
+cache (Hermite, 1 s buckets) and the Chebyshev tables. Tick times exclude
+JSON encoding, which costs the same in every mode.
+
+Usage:
+    python scripts/benchmark_ephemeris.py                          # 30000 satellites, 10 Hz
+    python scripts/benchmark_ephemeris.py --size 1000 --rate 30 --ticks 300
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Backend modules live next to main.py, not in a package
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import numpy as np  # noqa: E402
+
+from benchmark_propagation import synthetic_catalog  # noqa: E402
+from ephemeris_cache import EphemerisCache  # noqa: E402
+from ephemeris_tables import EphemerisTables  # noqa: E402
+from propagation import PropagationEngine  # noqa: E402
+
+
+def tick_times(engine_fn, rows, start: datetime, rate: float, ticks: int) -> list:
+    samples = []
+    for i in range(ticks):
+        when = start + timedelta(seconds=i / rate)
+        started = time.perf_counter()
+        engine_fn(rows, when)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark Chebyshev ephemeris tables against SGP4")
+    parser.add_argument("--size", type=int, default=30000, help="Satellites in the synthetic catalog")
+    parser.add_argument("--rate", type=float, default=10.0, help="Tick rate in Hz")
+    parser.add_argument("--ticks", type=int, default=100, help="Ticks timed per mode")
+    parser.add_argument("--samples", type=int, default=20, help="Random times checked against SGP4")
+    parser.add_argument("--segment-minutes", type=float, default=30.0)
+    parser.add_argument("--degree", type=int, default=12)
+    args = parser.parse_args()
+
+    center = datetime(2025, 11, 25, 12, 0, 0)
+    catalog = synthetic_catalog(args.size)
+    rows = catalog.rows()
+    direct = PropagationEngine(catalog)
+    direct.satrec_array(rows)  # warm, as a running server would be
+    # The table's "now" is pinned to the benchmark center, so sampling the whole window never rebuilds it
+    tables = EphemerisTables(catalog, direct.propagate, segment_minutes=args.segment_minutes, degree=args.degree,
+                             now=lambda: center)
+    tabled = PropagationEngine(catalog, tables=tables)
+    cached = PropagationEngine(catalog, cache=EphemerisCache())
+
+    tables.refresh()
+    stats = tables.stats()
+    print(f"Table: {stats['satellites']} satellites, {stats['window_start']} .. {stats['window_end']}, "
+          f"{args.segment_minutes:g} min segments, degree {args.degree}")
+    print(f"  build {stats['build_ms']:.0f} ms, {stats['bytes'] / 2 ** 20:.1f} MiB, "
+          f"{stats['unfitted']} satellites left to SGP4")
+    print(f"  fit bound (validation points): max {stats['max_error_km'] * 1e6:.2f} mm, "
+          f"p99 {stats['p99_error_km'] * 1e6:.2f} mm")
+
+    rng = random.Random(7)
+    position_errors, velocity_errors = [], []
+    for _ in range(args.samples):
+        when = center + timedelta(seconds=rng.uniform(-7200, 7200))
+        expected = direct.propagate(rows, [when])
+        actual = tabled.propagate_tabled(rows, when)
+        ok = expected.error[:, 0] == 0
+        position_errors.append(np.linalg.norm(actual.r_teme - expected.r_teme, axis=-1)[ok, 0])
+        velocity_errors.append(np.linalg.norm(actual.v_teme - expected.v_teme, axis=-1)[ok, 0])
+    position_errors, velocity_errors = np.concatenate(position_errors), np.concatenate(velocity_errors)
+    print(f"  vs SGP4 at {args.samples} random times: position max {position_errors.max() * 1e6:.2f} mm "
+          f"(p99 {np.percentile(position_errors, 99) * 1e6:.2f} mm), "
+          f"velocity max {velocity_errors.max() * 1e6:.1f} mm/s (SGP4 v is not exactly dr/dt)")
+
+    print(f"\n{args.ticks} ticks at {args.rate:g} Hz, {len(rows)} satellites per tick")
+    print(f"{'mode':>10} {'median ms':>10} {'max ms':>10} {'max Hz':>10} {'speedup':>8}")
+    modes = [
+        ("sgp4", lambda r, w: direct.propagate(r, [w])),
+        ("cache", cached.propagate_cached),
+        ("chebyshev", tabled.propagate_tabled),
+    ]
+    baseline = None
+    for name, fn in modes:
+        samples = tick_times(fn, rows, center, args.rate, args.ticks)
+        median = statistics.median(samples)
+        baseline = baseline or median
+        print(f"{name:>10} {median:>10.2f} {max(samples):>10.2f} {1000 / median:>10.0f} {baseline / median:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Request Logging Middleware Benchmark
+
+Measures in-process request throughput of a small FastAPI app under three
+configurations:
+    none    - no logging middleware (baseline)
+    legacy  - the previous BaseHTTPMiddleware implementation (await request.body())
+    asgi    - the pure ASGI LoggingMiddleware from backend/main.py
+
+Log rows go to a counting no-op sink and sampling is disabled, so the numbers
+isolate middleware overhead (no SQLite, no sockets: requests are driven
+through httpx's ASGI transport).
+
+Usage:
+    python scripts/benchmark_logging_middleware.py                  # 3000 requests per case
+    python scripts/benchmark_logging_middleware.py --requests 10000 --body-kb 64
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+# Backend modules live next to main.py, not in a package
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import main  # noqa: E402
+from log_sampling import LogSampler  # noqa: E402
+
+
+logged = 0
+
+
+async def count_log_event(**kwargs):
+    global logged
+    logged += 1
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """The pre-ASGI middleware, kept here only as the benchmark baseline."""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        profile_id = request.headers.get("X-Profile-ID")
+        username = request.headers.get("X-Username", "anonymous")
+        request_body = None
+        if request.method in ["POST", "PUT", "PATCH"]:
+            body = await request.body()
+            request_body = body.decode("utf-8")[:1000] if body else None
+        response = await call_next(request)
+        duration_ms = (time.time() - start_time) * 1000
+        level = "error" if response.status_code >= 500 else "warning" if response.status_code >= 400 else "info"
+        await main.log_event(level=level, category="API", message=f"{request.method} {request.url.path}",
+                             profile_id=int(profile_id) if profile_id and profile_id.isdigit() else None,
+                             username=username, endpoint=request.url.path, method=request.method,
+                             request_body=request_body, response_status=response.status_code,
+                             duration_ms=round(duration_ms, 2))
+        return response
+
+
+def build_app(middleware):
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/api/echo")
+    async def echo(request: Request):
+        return {"received": len(await request.body())}
+
+    @app.get("/api/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(32):
+                yield b"x" * 4096
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+
+async def run_case(app, requests: int, body: bytes, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, call in (
+            ("GET", lambda: client.get("/api/ping")),
+            ("POST", lambda: client.post("/api/echo", content=body)),
+            ("STREAM", lambda: client.get("/api/stream")),
+        ):
+            remaining = requests
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    response = await call()
+                    response.raise_for_status()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            results[name] = requests / (time.perf_counter() - started)
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark request logging middleware overhead")
+    parser.add_argument("--requests", type=int, default=3000, help="Requests per request type and case")
+    parser.add_argument("--body-kb", type=int, default=16, help="POST body size in KiB")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-flight requests")
+    args = parser.parse_args()
+
+    main.log_event = count_log_event
+    main.log_sampler = LogSampler(max_rows_per_second=float("inf"), burst=float("inf"))
+    body = b"a" * (args.body_kb * 1024)
+
+    table = {}
+    for name, middleware in (("none", None), ("legacy", LegacyLoggingMiddleware), ("asgi", main.LoggingMiddleware)):
+        table[name] = asyncio.run(run_case(build_app(middleware), args.requests, body, args.concurrency))
+
+    print(f"{'case':<8} {'GET req/s':>11} {'POST req/s':>11} {'STREAM req/s':>13}")
+    for name, r in table.items():
+        print(f"{name:<8} {r['GET']:>11.0f} {r['POST']:>11.0f} {r['STREAM']:>13.0f}")
+    print()
+    for kind in ("GET", "POST", "STREAM"):
+        print(f"{kind:<6} asgi vs legacy: {table['asgi'][kind] / table['legacy'][kind]:.2f}x")
+    print(f"\nLog rows emitted: {logged}")
+
+
+if __name__ == "__main__":
+    main_cli()
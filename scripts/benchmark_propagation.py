@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+SGP4 Propagation Benchmark
+
+Times backend/propagation.py (SatrecArray plus NumPy frame conversion) against
+a per-satellite loop (one Satrec.sgp4 call and a scalar geodetic conversion
+per object, the shape of static/modules/data/propagation.js) at one epoch.
+The main.py target is < 50 ms for 1000 satellites.
+
+A second table propagates the largest catalog over a time grid (ground
+tracks) with backend/propagation_pool.py at each --workers count; 1 worker
+is the in-process engine. Scaling is bounded by physical cores.
+
+The catalog is synthetic: the 18 default satellites from satelliteState.js
+are replicated under new NORAD ids, with checksums recomputed.
+
+Usage:
+    python scripts/benchmark_propagation.py                     # 100/1000/10000/30000 satellites
+    python scripts/benchmark_propagation.py --sizes 1000 --repeat 20
+    python scripts/benchmark_propagation.py --sizes 30000 --workers 1 2 4 8 --steps 96
+"""
+
+import argparse
+import math
+import re
+import sqlite3
+import statistics
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Backend modules live next to main.py, not in a package
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sgp4.api import Satrec, jday  # noqa: E402
+
+from catalog import SatelliteCatalog, make_record  # noqa: E402
+from propagation import FRAMES, PropagationEngine, WGS84_A_KM, WGS84_E2, gmst  # noqa: E402
+from propagation_pool import PropagationPool  # noqa: E402
+from tle_parser import tle_checksum  # noqa: E402
+
+
+DEFAULT_SATELLITES = Path(__file__).parent.parent / "static" / "modules" / "state" / "satelliteState.js"
+TARGET_MS_PER_1000 = 50.0
+
+
+def synthetic_catalog(size: int) -> SatelliteCatalog:
+    source = DEFAULT_SATELLITES.read_text()
+    base = re.findall(r"name: '([^']+)',\s*noradId: \d+,\s*tleLine1: '([^']+)',\s*tleLine2: '([^']+)'", source)
+    records = []
+    for i in range(size):
+        name, line1, line2 = base[i % len(base)]
+        norad = f"{10000 + i:05d}"
+        line1, line2 = line1[:2] + norad + line1[7:68], line2[:2] + norad + line2[7:68]
+        records.append(make_record(f"{name}-{i}", line1 + str(tle_checksum(line1)), line2 + str(tle_checksum(line2))))
+    catalog = SatelliteCatalog()
+    conn = sqlite3.connect(":memory:")
+    catalog.init(conn)
+    catalog.upsert(conn, records)
+    return catalog
+
+
+def loop_propagate(satrecs, jd: float, fr: float):
+    """Per-object baseline: scalar SGP4, GMST rotation and geodetic conversion."""
+    theta = float(gmst(jd, fr))
+    cos_t, sin_t = math.cos(theta), math.sin(theta)
+    out = []
+    for sat in satrecs:
+        error, r, v = sat.sgp4(jd, fr)
+        x, y, z = cos_t * r[0] + sin_t * r[1], -sin_t * r[0] + cos_t * r[1], r[2]
+        p = math.hypot(x, y)
+        lat = math.atan2(z, p * (1 - WGS84_E2))
+        for _ in range(3):
+            n = WGS84_A_KM / math.sqrt(1 - WGS84_E2 * math.sin(lat) ** 2)
+            lat = math.atan2(z + WGS84_E2 * n * math.sin(lat), p)
+        out.append((math.degrees(lat), math.degrees(math.atan2(y, x))))
+    return out
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def grid_benchmark(catalog: SatelliteCatalog, start: datetime, steps: int, workers: list, repeat: int):
+    rows = catalog.rows()
+    times = [start + timedelta(minutes=15 * i) for i in range(steps)]
+    total = len(rows) * steps
+    print(f"\nTime grid: {len(rows)} satellites x {steps} steps ({total:,} states), "
+          f"{os.cpu_count()} CPUs available")
+    print(f"{'workers':>10} {'grid ms':>10} {'states/s':>12} {'scaling':>8}")
+    baseline = None
+    for count in workers:
+        pool = PropagationPool(count) if count > 1 else None
+        engine = PropagationEngine(catalog, pool=pool)
+        try:
+            engine.propagate(rows, times)  # start workers and build their Satrecs
+            grid_ms = timed(lambda: engine.propagate(rows, times), repeat)
+        finally:
+            if pool is not None:
+                pool.close()
+        baseline = baseline or grid_ms
+        print(f"{count:>10} {grid_ms:>10.1f} {total / grid_ms * 1000:>12,.0f} {baseline / grid_ms:>7.2f}x")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized SGP4 propagation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 30000])
+    parser.add_argument("--repeat", type=int, default=7, help="Runs per case (median reported)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Pool sizes for the time grid")
+    parser.add_argument("--steps", type=int, default=96, help="Time grid steps (15 min apart; 0 skips the grid)")
+    parser.add_argument("--grid-repeat", type=int, default=3, help="Runs per time grid case")
+    args = parser.parse_args()
+
+    when = datetime(2025, 11, 25, 12, 0, 0)
+    jd, fr = jday(when.year, when.month, when.day, when.hour, when.minute, when.second)
+    print(f"{'satellites':>10} {'loop ms':>10} {'arrays ms':>10} {'json ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        catalog = synthetic_catalog(size)
+        engine = PropagationEngine(catalog)
+        rows = catalog.rows()
+        satrecs = [Satrec.twoline2rv(*lines) for lines in catalog.tle_lines(rows)]
+        engine.satrecs(rows)  # warm the Satrec cache, as a running server would be
+
+        loop_ms = timed(lambda: loop_propagate(satrecs, jd, fr), args.repeat)
+        arrays_ms = timed(lambda: engine.propagate(rows, [when]), args.repeat)
+        json_ms = timed(lambda: engine.positions(rows, when, FRAMES), args.repeat)
+        print(f"{size:>10} {loop_ms:>10.2f} {arrays_ms:>10.2f} {json_ms:>10.2f} {loop_ms / arrays_ms:>7.1f}x")
+        if size == 1000:
+            verdict = "PASS" if json_ms < TARGET_MS_PER_1000 else "FAIL"
+            print(f"{'':>10} target < {TARGET_MS_PER_1000:.0f} ms for 1000 satellites (with JSON records): {verdict}")
+
+    if args.steps > 0:
+        grid_benchmark(catalog, when, args.steps, args.workers, args.grid_repeat)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Catalog Ingestion CLI
+
+Loads TLE, 3LE or OMM (XML/JSON/CSV) files straight into the satellite
+catalog in wa_map.db. It uses the same streaming parsers and batched
+upserts as POST /api/satellites/ingest. Files are read in 1 MiB chunks, so
+multi-megabyte catalogs never sit in memory as text (except OMM JSON).
+
+Stop the server first, or point --db at a copy. The server only loads the
+catalog at startup, so it will not see rows written underneath it.
+
+Usage:
+    python scripts/ingest_catalog.py active.tle
+    python scripts/ingest_catalog.py gp.xml gp.csv --batch-size 2000
+    curl -s https://celestrak.org/... | python scripts/ingest_catalog.py - --format json
+"""
+
+import argparse
+import codecs
+import sys
+import time
+from pathlib import Path
+
+# Backend modules live next to main.py, not in a package
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import database  # noqa: E402
+from catalog import SatelliteCatalog  # noqa: E402
+from tle_parser import FORMATS, detect_format, make_parser  # noqa: E402
+
+
+CHUNK_BYTES = 1 << 20
+
+
+def ingest(stream, catalog: SatelliteCatalog, format: str, batch_size: int):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    first = decoder.decode(stream.read(CHUNK_BYTES))
+    parser = make_parser(detect_format(first) if format == "auto" else format)
+    upserted = 0
+    pending = []
+
+    def flush(records):
+        with database.db_pool.writer() as conn:
+            return catalog.upsert(conn, records)
+
+    text = first
+    while True:
+        parser.feed(text)
+        pending.extend(parser.take())
+        while len(pending) >= batch_size:
+            upserted += flush(pending[:batch_size])
+            del pending[:batch_size]
+        chunk = stream.read(CHUNK_BYTES)
+        if not chunk:
+            break
+        text = decoder.decode(chunk)
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    pending.extend(parser.take())
+    if pending:
+        upserted += flush(pending)
+    return parser, upserted
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load TLE/3LE/OMM files into the satellite catalog")
+    parser.add_argument("files", nargs="+", help="Input files, or - for stdin")
+    parser.add_argument("--format", default="auto", choices=("auto",) + FORMATS, help="Input format (default: sniff)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Records per upsert transaction")
+    parser.add_argument("--db", type=Path, default=database.DB_PATH, help="SQLite database path")
+    parser.add_argument("--max-errors", type=int, default=20, help="Errors printed per file")
+    args = parser.parse_args()
+
+    database.DB_PATH = args.db
+    catalog = SatelliteCatalog()
+    with database.db_pool.writer() as conn:
+        catalog.init(conn)
+
+    failed = False
+    for name in args.files:
+        started = time.perf_counter()
+        if name == "-":
+            result, upserted = ingest(sys.stdin.buffer, catalog, args.format, max(1, args.batch_size))
+        else:
+            with open(name, "rb") as f:
+                result, upserted = ingest(f, catalog, args.format, max(1, args.batch_size))
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {upserted} satellites upserted ({result.format}), "
+              f"{result.error_count} errors, {elapsed:.2f}s")
+        for error in result.errors[:args.max_errors]:
+            where = f"line {error['line']}" if error["line"] is not None else f"set {error.get('set')}"
+            print(f"  {where}: {error['error']}")
+        if result.error_count > args.max_errors:
+            print(f"  ... {result.error_count - args.max_errors} more")
+        failed = failed or result.error_count > 0
+
+    print(f"Catalog now holds {len(catalog)} satellites")
+    database.db_pool.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_cli()